@@ -4,20 +4,33 @@ import os
 # Add parent directory to sys.path to allow importing backend modules
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import uuid, asyncio, json, redis, re  # type: ignore
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, HTTPException, BackgroundTasks  # type: ignore
+import uuid, asyncio, json, logging, redis, re, secrets, time  # type: ignore
+import redis.asyncio as aioredis  # type: ignore
+from fastapi import Depends, FastAPI, Header, WebSocket, WebSocketDisconnect, Request, HTTPException  # type: ignore
 from fastapi.middleware.cors import CORSMiddleware  # type: ignore
-from fastapi.responses import FileResponse, JSONResponse  # type: ignore
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse  # type: ignore
 from slowapi import Limiter  # type: ignore
 from slowapi.util import get_remote_address  # type: ignore
-from backend.worker import download_video_task   # type: ignore
-from backend.services.scraper import get_video_info  # type: ignore
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool  # type: ignore
+from pydantic import BaseModel  # type: ignore
+from typing import List, Optional
+from backend.worker import download_video_task, fill_batch, speculate, submit_download   # type: ignore
+from backend.services.scraper import get_video_info, get_playlist_entries  # type: ignore
 from backend.services.video_analyzer import analyze_video_comprehensive  # type: ignore
+from backend.services import batch, cookie_pool, inflight, info_cache, object_store, progress, proxy_pool, queue_tracker, rate_governor, storage_accountant  # type: ignore
+from backend.services.download_engine import build_stream_command, sniff_container, STREAM_CHUNK_SIZE  # type: ignore
+from backend.services.zip_stream import ZipStream  # type: ignore
+from backend.services.clips import chapters_from_description, resolve_clip  # type: ignore
+from backend.services.file_delivery import (  # type: ignore
+    RangeFileResponse, RangeObjectResponse, accel_redirect_response, content_disposition, media_type_for, renew_lease,
+    X_ACCEL_REDIRECT_PREFIX,
+)
 from dotenv import load_dotenv
 
 load_dotenv()
 
 app = FastAPI(title="Pro StreamDown API")
+logger = logging.getLogger(__name__)
 
 from backend.routers import convert_router, feedback_router, gif_router, audio_tools_router, compress_router # type: ignore
 app.include_router(convert_router)
@@ -40,9 +53,23 @@ async def global_exception_handler(request: Request, exc: Exception):
         content={"detail": "Internal Server Error", "error": str(exc)},
     )
 
+@app.exception_handler(storage_accountant.StorageFull)
+async def storage_full_handler(request: Request, exc: storage_accountant.StorageFull):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 r = redis.from_url(REDIS_URL, decode_responses=True)
+async_r = aioredis.from_url(REDIS_URL, decode_responses=True)
 limiter = Limiter(key_func=get_remote_address)
+progress_hub = progress.ProgressHub(REDIS_URL)
+
+@app.on_event("shutdown")
+async def _close_progress_hub():
+    await progress_hub.close()
 
 origins = os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
 
@@ -75,11 +102,20 @@ def _update_ytdlp() -> None:
 import threading
 threading.Thread(target=_update_ytdlp, daemon=True).start()
 
-from backend.services.validators import validate_url, sanitize_input # type: ignore
+from backend.services.validators import validate_url, validate_playlist_url, sanitize_input, canonical_video_id, detect_platform # type: ignore
 
 # --- INPUT VALIDATION ---
 # Moved to services/validators.py
 
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY", "")
+
+def require_admin_key(x_api_key: str = Header(default="")):
+    """Operational endpoints (/proxies, /rate-limits): X-API-Key must match ADMIN_API_KEY (they don't exist when it is unset)."""
+    if not ADMIN_API_KEY:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not secrets.compare_digest(x_api_key.encode(), ADMIN_API_KEY.encode()):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+
 def validate_url_dependency(url: str):
     """Ensure the URL belongs to a supported platform"""
     if not validate_url(url):
@@ -98,44 +134,140 @@ async def analyze(request: Request, url: str):
         raise HTTPException(status_code=400, detail="Unsupported platform. Please use YouTube, X, TikTok, FB, or IG.")
     cache_key = f"meta:{url}"
     cached = r.get(cache_key)
-    if cached: return json.loads(cached)
-    
-    data = get_video_info(url)
-    if "error" in data: raise HTTPException(status_code=400, detail=data["error"])
+    if cached:
+        data = json.loads(cached)
+    else:
+        data = await asyncio.to_thread(get_video_info, url)
+        if "error" in data: raise HTTPException(status_code=400, detail=data["error"])
+        r.setex(cache_key, 3600, json.dumps(data))
     
-    r.setex(cache_key, 3600, json.dumps(data))
+    # Optionally start fetching the likely pick before the user clicks
+    try:
+        # Redis and Celery round-trips: keep them off the event loop
+        await asyncio.to_thread(speculate, url, data)
+    except Exception as e:
+        logger.warning(f"Prefetch skipped: {e}")
     return data
 
+@app.get("/rate-limits", dependencies=[Depends(require_admin_key)])
+async def rate_limits():
+    """Token-bucket levels and wait statistics of the platform rate governor."""
+    return await asyncio.to_thread(rate_governor.snapshot)
+
+@app.get("/proxies", dependencies=[Depends(require_admin_key)])
+async def proxies():
+    """Health scores and quarantine state of the outbound proxy pool (credentials redacted)."""
+    return await asyncio.to_thread(proxy_pool.snapshot)
+
 @app.get("/download/start")
 @limiter.limit("5/minute")
-async def start_download(request: Request, url: str, format_id: str = "best"):
+async def start_download(request: Request, url: str, format_id: str = "best", with_audio: bool = False,
+                         start: Optional[str] = None, end: Optional[str] = None, chapter: Optional[str] = None):
+    """
+    with_audio=true also cuts the MP3 from the same fetch; a later format_id=mp3 request gets it from the cache.
+    start/end ("90", "1:30", "1:02:03") or a chapter title download only that part of the video.
+    """
     validate_url(url)
+    try:
+        chapters = await asyncio.to_thread(_chapters, url) if chapter else None
+        clip = resolve_clip(start, end, chapter, chapters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     task_id = str(uuid.uuid4())
-    
-    # FIXED: Proper extension handling
+    # Admission does blocking Redis round-trips, cache links and statvfs: keep them off the event loop
+    return await asyncio.to_thread(submit_download, task_id, url, format_id, get_remote_address(request),
+                                   with_audio=with_audio, clip=clip)
+
+def _chapters(url: str) -> list:
+    """Chapters from the extraction /analyze cached, else parsed from the video description."""
+    info = info_cache.load(url) or {}
+    if info.get("chapters"):
+        return info["chapters"]
+    meta = r.get(f"meta:{url}")
+    description = info.get("description") or (json.loads(meta).get("description") if meta else None)
+    return chapters_from_description(description)
+
+@app.get("/download/stream")
+@limiter.limit("5/minute")
+async def stream_download(request: Request, url: str, format_id: str = "best", title: str = "video"):
+    """
+    Pipe a progressive (single-file) format straight from the source to the
+    client via yt-dlp's stdout. Nothing is staged in temp_downloads.
+    """
+    if not validate_url(url):
+        raise HTTPException(status_code=400, detail="Unsupported platform. Please use YouTube, X, TikTok, FB, or IG.")
     if format_id == "mp3":
-        output_path = f"temp_downloads/{task_id}.mp3"
-    else:
-        output_path = f"temp_downloads/{task_id}.mp4"
+        raise HTTPException(status_code=400, detail="MP3 requires conversion. Use /download/start instead.")
+    proxy = await asyncio.to_thread(proxy_pool.choose)
+    # Same account pool (and rotation) as extraction and queued downloads
+    jar = await asyncio.to_thread(cookie_pool.choose, url)
+    if not await asyncio.to_thread(rate_governor.acquire, detect_platform(url), proxy_pool.egress_id(proxy)):
+        raise HTTPException(status_code=429, detail="Rate limited. Please try again in a few minutes.")
+    
+    started = time.time()
+    process = await asyncio.create_subprocess_exec(
+        *build_stream_command(url, format_id, proxy, jar.path if jar else None),
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = process.stdout, process.stderr
+    assert stdout is not None and stderr is not None
+    # --quiet leaves only errors on stderr; collect them for the proxy's health record
+    errors = asyncio.create_task(stderr.read())
+    
+    # Wait for the first bytes so a non-progressive format fails with a clean 400
+    head = await stdout.read(STREAM_CHUNK_SIZE)
+    if not head:
+        await process.wait()
+        error = proxy_pool.scrub((await errors).decode("utf-8", "replace"))
+        await asyncio.to_thread(proxy_pool.report, proxy, error)
+        await asyncio.to_thread(cookie_pool.report, jar, error)
+        raise HTTPException(status_code=400, detail="This format is not available as a single file. Use /download/start instead.")
+    await asyncio.to_thread(proxy_pool.report, proxy, None, time.time() - started)
+    await asyncio.to_thread(cookie_pool.report, jar)
+    
+    ext, media_type = sniff_container(head)
+    safe_title = str(re.sub(r'[\\/*?:"<>|]', "", title))[:50]  # type: ignore
     
-    download_video_task.apply_async(args=[url, format_id, output_path], task_id=task_id)
-    return {"task_id": task_id, "status": "started"}
+    async def body():
+        try:
+            yield head
+            while True:
+                chunk = await stdout.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+            # Source stream broke off mid-transfer
+            if await process.wait() != 0:
+                error = proxy_pool.scrub((await errors).decode("utf-8", "replace"))
+                await asyncio.to_thread(proxy_pool.report, proxy, error)
+                await asyncio.to_thread(cookie_pool.report, jar, error)
+        finally:
+            # Client went away or stream ended: never leave yt-dlp running
+            if process.returncode is None:
+                process.kill()
+            await process.wait()
+            errors.cancel()
+    
+    return StreamingResponse(
+        body(),
+        media_type=media_type,
+        headers={"Content-Disposition": content_disposition(safe_title + ext)},
+    )
 
 @app.get("/download/status/{task_id}")
 async def check_status(task_id: str):
     """REST endpoint to check status"""
-    result = download_video_task.AsyncResult(task_id)
+    result = download_video_task.AsyncResult(inflight.resolve(task_id))
     
-    if result.state == 'PENDING':
-        # Estimate queue position (simple FIFO approximation)
-        # In a real production app with Celery, accurate position is hard.
-        # We'll calculate it by counting how many tasks are unresolved in our specific Redis tracking if we had one.
-        # For now, we'll return a generic "Waiting in queue" message, or if possible,
-        # we can check Redis queue length.
+    if result.state in ('PENDING', 'RETRY'):
+        # Workers publish progress instead of updating the Celery result; RETRY = back in the
+        # queue because the node had no free download slot
+        latest = progress.last(result.id)
+        if latest and not progress.is_terminal(latest):
+            return {"status": "downloading", **latest}
         try:
-            # Celery default queue is 'celery'
-            queue_len = r.llen("celery")
-            return {"status": "queued", "progress": 0, "queue_position": queue_len if queue_len else 1}
+            return {"status": "queued", "progress": 0, **(queue_tracker.estimate(result.id) or {})}
         except Exception as e:
             print(f"[WARNING] Redis queue check failed: {e}")
             return {"status": "queued", "progress": 0}
@@ -149,73 +281,230 @@ async def check_status(task_id: str):
     else:
         return {"status": result.state}
 
-@app.get("/download/file/{task_id}")
-async def get_actual_file(task_id: str, background_tasks: BackgroundTasks, title: str = "video"):
-    """File download with proper extension handling"""
-    file_path_mp4 = f"temp_downloads/{task_id}.mp4"
-    file_path_mp3 = f"temp_downloads/{task_id}.mp3"
-    
-    safe_title = str(re.sub(r'[\\/*?:"<>|]', "", title))[:50]  # type: ignore
+def _safe_filename(title: str) -> str:
+    return str(re.sub(r'[\\/*?:"<>|]', "", title))[:50]  # type: ignore
+
+def _finished_file(task_id: str):
+    """(path, mime) of a finished download, or (None, None)."""
+    # The worker records the final path and mime type in the task result
+    result = download_video_task.AsyncResult(task_id)
+    if result.state == 'SUCCESS' and isinstance(result.result, dict):
+        recorded = result.result.get("path")
+        if recorded and os.path.exists(recorded):
+            return recorded, result.result.get("mime")
+        key = result.result.get("object_key")
+        local = object_store.get_store().local_path(key) if key else None
+        if local:
+            return local, result.result.get("mime")
     
-    # Check for various file extensions (prioritizing video then audio)
-    # We must support MKV/WEBM for 4K content that shouldn't be forced into MP4
-    possible_files = [
-        (f"temp_downloads/{task_id}.mp4", ".mp4", "video/mp4"),
-        (f"temp_downloads/{task_id}.mkv", ".mkv", "video/x-matroska"),
-        (f"temp_downloads/{task_id}.webm", ".webm", "video/webm"),
-        (f"temp_downloads/{task_id}.mp3", ".mp3", "audio/mpeg"),
-    ]
+    # Results from older workers: probe the known extensions
+    for ext in (".mp4", ".mkv", ".webm", ".mp3"):
+        path = f"temp_downloads/{task_id}{ext}"
+        if os.path.exists(path):
+            return path, None
+    return None, None
+
+def _stored_object(task_id: str):
+    """(key, (size, etag, mtime), mime) of a finished download held in a remote object store, or None."""
+    store = object_store.get_store()
+    if not store.remote:
+        return None
+    result = download_video_task.AsyncResult(task_id)
+    if result.state != 'SUCCESS' or not isinstance(result.result, dict) or not result.result.get("object_key"):
+        return None
+    key = result.result["object_key"]
+    stat = store.stat(key)
+    return (key, stat, result.result.get("mime")) if stat else None
+
+@app.api_route("/download/file/{task_id}", methods=["GET", "HEAD"])
+async def get_actual_file(request: Request, task_id: str, title: str = "video"):
+    """
+    Serve a finished download. Supports Range/If-Range so interrupted or
+    parallel-chunk downloads can resume; the file stays available until its
+    lease expires instead of being deleted after the first response.
+    """
+    # Coalesced clients read the file produced by the job they attached to
+    task_id = inflight.resolve(task_id)
     
-    file_path = None
-    filename = None
-    media_type = None
+    safe_title = _safe_filename(title)
+    file_path, media_type = _finished_file(task_id)
     
-    for path, ext, mime in possible_files:
-        if os.path.exists(path):
-            file_path = path
-            filename = f"{safe_title}{ext}"
-            media_type = mime
-            break
-            
     if not file_path:
-        raise HTTPException(status_code=404, detail="File not found")
+        # Produced on another node: hand out a presigned URL or proxy it from the object store
+        stored = await run_in_threadpool(_stored_object, task_id)
+        if not stored:
+            raise HTTPException(status_code=404, detail="File not found")
+        key, stat, media_type = stored
+        store = object_store.get_store()
+        filename = f"{safe_title}{os.path.splitext(key)[1]}"
+        url = store.presigned_url(key, filename)
+        if url:
+            return RedirectResponse(url, status_code=307)
+        return RangeObjectResponse(store, key, stat, request.headers, filename, media_type, method=request.method)
+    
+    media_type = media_type or media_type_for(file_path)
+    filename = f"{safe_title}{os.path.splitext(file_path)[1]}"
+    renew_lease(file_path)
+    
+    if X_ACCEL_REDIRECT_PREFIX:
+        return accel_redirect_response(file_path, filename, media_type)
+    return RangeFileResponse(file_path, request.headers, filename, media_type, method=request.method)
+
+# --- Batch / playlist downloads ---
+
+# Stop waiting for stragglers after this long; the ZIP then holds what finished
+BATCH_ZIP_MAX_WAIT = int(os.getenv("BATCH_ZIP_MAX_WAIT", "3600"))
+
+class BatchRequest(BaseModel):
+    urls: List[str] = []
+    playlist: Optional[str] = None
+    format_id: str = "best"
+
+@app.post("/download/batch")
+@limiter.limit("2/minute")
+async def start_batch(request: Request, body: BatchRequest):
+    """
+    Download several videos (a list of URLs or a playlist) as one batch. Items
+    run BATCH_PARALLELISM at a time; progress is at /download/batch/{id} and
+    /download/batch/{id}/zip streams a ZIP that grows as items finish.
+    """
+    if body.playlist:
+        if not validate_playlist_url(body.playlist):
+            raise HTTPException(status_code=400, detail="Unsupported playlist URL.")
+        listing = await asyncio.to_thread(get_playlist_entries, body.playlist, batch.BATCH_MAX_ITEMS)
+        if "error" in listing:
+            raise HTTPException(status_code=400, detail=listing["error"])
+        entries = [e for e in listing["entries"] if validate_url(e["url"])]
+        title = listing["title"]
+    else:
+        if len(body.urls) > batch.BATCH_MAX_ITEMS:
+            raise HTTPException(status_code=400, detail=f"Maximum {batch.BATCH_MAX_ITEMS} URLs per batch.")
+        for url in body.urls:
+            if not validate_url(url):
+                raise HTTPException(status_code=400, detail=f"Unsupported URL: {sanitize_input(url)[:100]}")
+        entries = [{"url": url, "title": ""} for url in body.urls]
+        title = "batch"
+    
+    # The same video listed twice is downloaded once
+    items, seen = [], set()
+    for entry in entries:
+        key = canonical_video_id(entry["url"])
+        if key in seen:
+            continue
+        seen.add(key)
+        items.append({"task_id": str(uuid.uuid4()), "url": entry["url"], "title": entry["title"]})
+    if not items:
+        raise HTTPException(status_code=400, detail="No downloadable URLs in batch.")
+    
+    batch_id = str(uuid.uuid4())
+    await asyncio.to_thread(batch.create, batch_id, items, body.format_id, get_remote_address(request),
+                            _safe_filename(title) or "batch")
+    await asyncio.to_thread(fill_batch, batch_id)
+    return {"batch_id": batch_id, "total": len(items), "items": items}
+
+@app.get("/download/batch/{batch_id}")
+async def batch_status(batch_id: str):
+    """Aggregate and per-item progress of a batch."""
+    if not batch.info(batch_id):
+        raise HTTPException(status_code=404, detail="Batch not found")
+    done = set(batch.completed(batch_id))
+    failed = batch.failed(batch_id)
+    
+    items = []
+    for item in batch.items(batch_id):
+        task_id = item["task_id"]
+        if task_id in failed:
+            state = {"status": "failed", "progress": 100}
+        elif task_id in done:
+            state = {"status": "completed", "progress": 100}
+        else:
+            latest = progress.last(task_id) or {}
+            state = {"status": "downloading" if latest else "queued", "progress": float(latest.get("progress", 0))}
+        items.append({**item, **state})
+    
+    return {
+        "batch_id": batch_id,
+        "total": len(items),
+        **batch.counts(batch_id),
+        "progress": batch.aggregate_progress([i["progress"] for i in items]),
+        "items": items,
+    }
+
+@app.get("/download/batch/{batch_id}/zip")
+async def batch_zip(batch_id: str):
+    """Stream a ZIP of the batch, adding each video as soon as it finishes."""
+    meta = batch.info(batch_id)
+    if not meta:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    items = {item["task_id"]: item for item in batch.items(batch_id)}
     
+    async def generate():
+        archive = ZipStream()
+        handled = set()
+        give_up = time.time() + BATCH_ZIP_MAX_WAIT
+        while True:
+            for task_id in batch.completed(batch_id):
+                if task_id in handled:
+                    continue
+                handled.add(task_id)
+                name = _safe_filename(items[task_id]["title"]) or task_id
+                file_path, _ = _finished_file(task_id)
+                if file_path:
+                    renew_lease(file_path)
+                    member = archive.add_file(file_path, name + os.path.splitext(file_path)[1])
+                else:
+                    stored = await run_in_threadpool(_stored_object, task_id)
+                    if not stored:
+                        continue  # failed, or expired before the client got here
+                    key, (size, _, _), _ = stored
+                    chunks = object_store.get_store().iter_range(key, 0, size)
+                    member = archive.add_stream(chunks, name + os.path.splitext(key)[1], size)
+                async for chunk in iterate_in_threadpool(member):
+                    yield chunk
+            if len(handled) >= len(items) or time.time() > give_up:
+                break
+            await asyncio.sleep(1.0)
+        yield archive.close()
     
-    def remove_file():
-        if not file_path: return
-        try: os.remove(file_path)
-        except: pass
+    return StreamingResponse(
+        generate(),
+        media_type="application/zip",
+        headers={"Content-Disposition": content_disposition(f"{meta.get('title') or 'batch'}.zip")},
+    )
+
+def _progress_snapshot(job_id: str) -> dict:
+    """Current progress of a job, for clients that (re)connect mid-download."""
+    result = download_video_task.AsyncResult(job_id)
+    if result.state == 'SUCCESS':
+        return {"progress": 100, "status": "Finished"}
+    if result.state == 'FAILURE':
+        return {"status": "Error", "message": str(result.info)}
+    latest = progress.last(job_id)
+    if latest:
+        return latest
+    return {"progress": 0, "status": "Queued", **(queue_tracker.estimate(job_id) or {})}
 
-    response = FileResponse(path=file_path, filename=filename, media_type=media_type)
-    background_tasks.add_task(remove_file)
-    return response
+# Safety net for a missed pub/sub message; also detects dead sockets
+PROGRESS_RESYNC_SECONDS = 15
 
 @app.websocket("/ws/progress/{task_id}")
 async def websocket_progress(websocket: WebSocket, task_id: str):
     await websocket.accept()
+    job_id = inflight.resolve(task_id)
+    queue = await progress_hub.subscribe(job_id)
     try:
-        max_wait = 300
-        start = asyncio.get_event_loop().time()
-        
+        event = _progress_snapshot(job_id)
         while True:
-            if asyncio.get_event_loop().time() - start > max_wait:
-                await websocket.send_json({"status": "Error", "message": "Timeout"})
+            if progress.is_terminal(event):
+                if event["status"] == "Finished":
+                    event = {**event, "task_id": task_id}
+                await websocket.send_json(event)
                 break
-            
-            result = download_video_task.AsyncResult(task_id)
-            
-            if result.state == 'PENDING':
-                await websocket.send_json({"progress": 0, "status": "Queued"})
-            elif result.state == 'PROGRESS':
-                await websocket.send_json(result.info)
-            elif result.state == 'SUCCESS':
-                await websocket.send_json({"progress": 100, "status": "Finished", "task_id": task_id})
-                break
-            elif result.state == 'FAILURE':
-                await websocket.send_json({"status": "Error", "message": str(result.info)})
-                break
-            
-            await asyncio.sleep(0.5)
+            await websocket.send_json(event)
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=PROGRESS_RESYNC_SECONDS)
+            except asyncio.TimeoutError:
+                event = _progress_snapshot(job_id)
     except WebSocketDisconnect:
         pass
     except Exception as e:
@@ -223,6 +512,54 @@ async def websocket_progress(websocket: WebSocket, task_id: str):
             await websocket.send_json({"status": "Error", "message": str(e)})
         except:
             pass
+    finally:
+        await progress_hub.unsubscribe(job_id, queue)
+
+SSE_HEARTBEAT_SECONDS = 15
+
+def _sse(event: dict, event_id: str = "") -> str:
+    prefix = f"id: {event_id}\n" if event_id else ""
+    return f"{prefix}data: {json.dumps(event)}\n\n"
+
+@app.get("/download/events/{task_id}")
+async def download_events(request: Request, task_id: str):
+    """
+    Server-Sent Events progress stream backed by the task's Redis Stream.
+    Reconnecting clients send Last-Event-ID and only receive what they missed.
+    """
+    job_id = inflight.resolve(task_id)
+    stream_key = progress.STREAM_PREFIX + job_id
+    
+    async def events():
+        last_id = request.headers.get("last-event-id") or "0"
+        yield "retry: 3000\n\n"
+        while True:
+            if await request.is_disconnected():
+                break
+            entries = await async_r.xread({stream_key: last_id}, count=100, block=SSE_HEARTBEAT_SECONDS * 1000)
+            if not entries:
+                # Quiet period: keep proxies from closing the connection and make
+                # sure a job that ended without publishing (e.g. a crash) is reported
+                snapshot = _progress_snapshot(job_id)
+                if progress.is_terminal(snapshot):
+                    yield _sse({**snapshot, "task_id": task_id})
+                    break
+                yield ": keepalive\n\n"
+                continue
+            for _, items in entries:
+                for entry_id, fields in items:
+                    last_id = entry_id
+                    event = json.loads(fields["data"])
+                    if progress.is_terminal(event):
+                        yield _sse({**event, "task_id": task_id}, entry_id)
+                        return
+                    yield _sse(event, entry_id)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.get("/analyze-video")
 @limiter.limit("10/minute")
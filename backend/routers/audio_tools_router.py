@@ -13,6 +13,8 @@ from dotenv import load_dotenv # type: ignore
 from slowapi import Limiter # type: ignore
 from slowapi.util import get_remote_address # type: ignore
 
+from backend.services import expiry_index, storage_accountant # type: ignore
+
 load_dotenv()
 
 limiter = Limiter(key_func=get_remote_address)
@@ -96,6 +98,7 @@ def _run_audio_task(task_id: str, input_path: str, output_path: str, effects: di
         run_audio_pipeline(input_path, output_path, effects, progress_cb)
 
         if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+            expiry_index.register(output_path)
             _set_task(task_id, status="SUCCESS", progress=100, message="Complete!", path=output_path)
             print(f"[INFO] Task {task_id} SUCCESS: {output_path}")
         else:
@@ -107,6 +110,7 @@ def _run_audio_task(task_id: str, input_path: str, output_path: str, effects: di
     finally:
         # Clean up input file
         cleanup_file(input_path)
+        storage_accountant.release(str(OUTPUT_DIR), task_id)
 
 
 @router.post("/process-audio")
@@ -131,6 +135,9 @@ async def process_audio(
         await file.seek(0)
 
         file_id = str(uuid.uuid4())
+        # Input + processed MP3; released when the pipeline thread finishes
+        storage_accountant.reserve(str(OUTPUT_DIR), storage_accountant.upload_estimate(str(len(contents))),
+                                   reservation_id=file_id, ttl=storage_accountant.UPLOAD_RESERVATION_TTL)
         original_stem = Path(file.filename).stem if file.filename else "audio"
         input_filename = f"{file_id}_{file.filename}"
         input_path = UPLOAD_DIR / input_filename
@@ -138,6 +145,7 @@ async def process_audio(
         # Save file
         with open(input_path, "wb") as buffer:
             shutil.copyfileobj(file.file, buffer)
+        expiry_index.register(input_path)
 
         # Validate Duration (Hard Limit 3 mins)
         duration_sec = await get_audio_duration(str(input_path))
@@ -170,10 +178,14 @@ async def process_audio(
             "message": "File received! Processing started."
         }
 
-    except HTTPException:
+    except (HTTPException, storage_accountant.StorageFull):
+        if 'file_id' in locals():
+            storage_accountant.release(str(OUTPUT_DIR), file_id)
         raise
     except Exception as e:
         cleanup_file(str(input_path)) if 'input_path' in locals() else None
+        if 'file_id' in locals():
+            storage_accountant.release(str(OUTPUT_DIR), file_id)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -228,6 +240,10 @@ async def download_result(task_id: str):
 async def extract_from_video(request: Request, background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     input_path: Path | None = None
     output_path: Path | None = None
+    reservation = storage_accountant.reserve(
+        str(UPLOAD_DIR), storage_accountant.upload_estimate(request.headers.get("content-length"), factor=3.0),
+        ttl=storage_accountant.UPLOAD_RESERVATION_TTL,
+    )
     try:
         file_id = str(uuid.uuid4())
         input_filename = f"{file_id}_{file.filename}"
@@ -235,9 +251,11 @@ async def extract_from_video(request: Request, background_tasks: BackgroundTasks
 
         with open(input_path, "wb") as buffer:
             shutil.copyfileobj(file.file, buffer)
+        expiry_index.register(input_path)
 
         output_filename = f"extracted_{file_id}.wav"
         output_path = UPLOAD_DIR / output_filename
+        expiry_index.register(output_path)
 
         cmd = [
             FFMPEG_PATH, "-y",
@@ -261,3 +279,5 @@ async def extract_from_video(request: Request, background_tasks: BackgroundTasks
         if output_path:
             cleanup_file(str(output_path))
         raise HTTPException(status_code=500, detail=f"Extraction failed: {str(e)}")
+    finally:
+        storage_accountant.release(str(UPLOAD_DIR), reservation)
@@ -1,14 +1,17 @@
 """
 Compression router for images and videos.
 """
-from fastapi import APIRouter, UploadFile, File, BackgroundTasks, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, UploadFile, File, BackgroundTasks, HTTPException, Request
+from fastapi.responses import FileResponse, StreamingResponse
 from pathlib import Path
 from typing import List
 import uuid
 import os
 
 from backend.services.compressor import ImageCompressor, VideoCompressor
+from backend.services import expiry_index, storage_accountant  # type: ignore
+from backend.services.file_delivery import content_disposition  # type: ignore
+from backend.services.zip_stream import stream_zip  # type: ignore
 
 router = APIRouter(prefix="/compress", tags=["Compression"])
 
@@ -34,6 +37,7 @@ def cleanup_files(files: list):
 
 @router.post("/image")
 async def compress_images(
+    request: Request,
     background_tasks: BackgroundTasks,
     files: List[UploadFile] = File(...)
 ):
@@ -44,6 +48,10 @@ async def compress_images(
     temp_inputs: list[Path] = []
     compressed_files: list[Path] = []
 
+    reservation = storage_accountant.reserve(
+        str(UPLOAD_DIR), storage_accountant.upload_estimate(request.headers.get("content-length")),
+        ttl=storage_accountant.UPLOAD_RESERVATION_TTL,
+    )
     try:
         # Read all files and validate sizes
         file_contents: list[tuple[UploadFile, bytes]] = []
@@ -68,9 +76,11 @@ async def compress_images(
             input_path = UPLOAD_DIR / f"{uid}_{file.filename}"
             input_path.write_bytes(content if isinstance(content, bytes) else bytes(content)) # type: ignore
             temp_inputs.append(input_path)
+            expiry_index.register(input_path)
 
             compressed = compressor.compress(input_path)
             compressed_files.append(compressed)
+            expiry_index.register(compressed)
 
         if len(compressed_files) == 1:
             final = compressed_files[0]
@@ -81,11 +91,12 @@ async def compress_images(
                 str(final), media_type=media_type, filename=final.name
             )
         else:
-            from backend.services.converter import BaseConverter
-            zip_path = BaseConverter.create_zip(compressed_files, "compressed_images")
-            background_tasks.add_task(cleanup_files, temp_inputs + compressed_files + [zip_path])
-            return FileResponse(
-                str(zip_path), media_type="application/zip", filename="compressed_images.zip"
+            # Streamed straight from the compressed files; no archive is written to disk
+            background_tasks.add_task(cleanup_files, temp_inputs + compressed_files)
+            return StreamingResponse(
+                stream_zip((str(f), f.name) for f in compressed_files),
+                media_type="application/zip",
+                headers={"Content-Disposition": content_disposition("compressed_images.zip")},
             )
 
     except HTTPException:
@@ -93,10 +104,13 @@ async def compress_images(
     except Exception as e:
         cleanup_files(temp_inputs + compressed_files)
         raise HTTPException(500, f"Image compression failed: {str(e)}")
+    finally:
+        storage_accountant.release(str(UPLOAD_DIR), reservation)
 
 
 @router.post("/video")
 async def compress_video(
+    request: Request,
     background_tasks: BackgroundTasks,
     files: List[UploadFile] = File(...)
 ):
@@ -107,6 +121,10 @@ async def compress_video(
     temp_inputs: list[Path] = []
     compressed_files: list[Path] = []
 
+    reservation = storage_accountant.reserve(
+        str(UPLOAD_DIR), storage_accountant.upload_estimate(request.headers.get("content-length")),
+        ttl=storage_accountant.UPLOAD_RESERVATION_TTL,
+    )
     try:
         # Read all files and validate sizes
         file_contents: list[tuple[UploadFile, bytes]] = []
@@ -127,9 +145,11 @@ async def compress_video(
             input_path = UPLOAD_DIR / f"{uid}_{file.filename}"
             input_path.write_bytes(content if isinstance(content, bytes) else bytes(content)) # type: ignore
             temp_inputs.append(input_path)
+            expiry_index.register(input_path)
 
             compressed = compressor.compress(input_path)
             compressed_files.append(compressed)
+            expiry_index.register(compressed)
 
         if len(compressed_files) == 1:
             final = compressed_files[0]
@@ -139,11 +159,12 @@ async def compress_video(
                 str(final), media_type=f"video/{ext}", filename=final.name
             )
         else:
-            from backend.services.converter import BaseConverter
-            zip_path = BaseConverter.create_zip(compressed_files, "compressed_videos")
-            background_tasks.add_task(cleanup_files, temp_inputs + compressed_files + [zip_path])
-            return FileResponse(
-                str(zip_path), media_type="application/zip", filename="compressed_videos.zip"
+            # Streamed straight from the compressed files; no archive is written to disk
+            background_tasks.add_task(cleanup_files, temp_inputs + compressed_files)
+            return StreamingResponse(
+                stream_zip((str(f), f.name) for f in compressed_files),
+                media_type="application/zip",
+                headers={"Content-Disposition": content_disposition("compressed_videos.zip")},
             )
 
     except HTTPException:
@@ -151,3 +172,5 @@ async def compress_video(
     except Exception as e:
         cleanup_files(temp_inputs + compressed_files)
         raise HTTPException(500, f"Video compression failed: {str(e)}")
+    finally:
+        storage_accountant.release(str(UPLOAD_DIR), reservation)
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks, Request
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from typing import List, Optional
 import shutil
 import os
@@ -8,7 +8,10 @@ import uuid
 from slowapi import Limiter  # type: ignore
 from slowapi.util import get_remote_address  # type: ignore
 
-from backend.services.converter import ImageConverter, AudioConverter, DocumentConverter, BaseConverter, UPLOAD_DIR, OUTPUT_DIR
+from backend.services.converter import ImageConverter, AudioConverter, DocumentConverter, UPLOAD_DIR, OUTPUT_DIR
+from backend.services import expiry_index, storage_accountant  # type: ignore
+from backend.services.file_delivery import content_disposition  # type: ignore
+from backend.services.zip_stream import stream_zip  # type: ignore
 
 router = APIRouter()
 limiter = Limiter(key_func=get_remote_address)
@@ -45,6 +48,10 @@ async def convert_images(
     temp_inputs = []
     combined_size = 0
 
+    reservation = storage_accountant.reserve(
+        str(UPLOAD_DIR), storage_accountant.upload_estimate(request.headers.get("content-length")),
+        ttl=storage_accountant.UPLOAD_RESERVATION_TTL,
+    )
     try:
         for file in files:
             content = await file.read()
@@ -61,10 +68,12 @@ async def convert_images(
             with open(input_path, "wb") as buffer:
                 buffer.write(content)
             temp_inputs.append(input_path)
+            expiry_index.register(input_path)
 
             # Convert
             output_path = image_converter.convert(input_path, target_format)
             converted_files.append(output_path)
+            expiry_index.register(output_path)
 
         # Response
         if len(converted_files) == 1:
@@ -78,10 +87,13 @@ async def convert_images(
             background_tasks.add_task(cleanup_files, temp_inputs + converted_files)
             return FileResponse(final_file, media_type=media_type, filename=filename)
         else:
-            # Zip multiple files
-            zip_path = BaseConverter.create_zip(converted_files, "images_converted")
-            background_tasks.add_task(cleanup_files, temp_inputs + converted_files + [zip_path])
-            return FileResponse(zip_path, media_type="application/zip", filename="converted_images.zip")
+            # Zip multiple files, streamed straight from the converted files (nothing written to disk)
+            background_tasks.add_task(cleanup_files, temp_inputs + converted_files)
+            return StreamingResponse(
+                stream_zip((str(f), f.name) for f in converted_files),
+                media_type="application/zip",
+                headers={"Content-Disposition": content_disposition("converted_images.zip")},
+            )
 
     except HTTPException:
         raise
@@ -89,6 +101,8 @@ async def convert_images(
         # Cleanup on error
         cleanup_files(temp_inputs + converted_files)
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        storage_accountant.release(str(UPLOAD_DIR), reservation)
 
 
 @router.post("/convert/audio")
@@ -106,6 +120,10 @@ async def convert_audio(
     temp_inputs = []
     combined_size = 0
 
+    reservation = storage_accountant.reserve(
+        str(UPLOAD_DIR), storage_accountant.upload_estimate(request.headers.get("content-length")),
+        ttl=storage_accountant.UPLOAD_RESERVATION_TTL,
+    )
     try:
         for file in files:
             content = await file.read()
@@ -121,24 +139,32 @@ async def convert_audio(
             with open(input_path, "wb") as buffer:
                 buffer.write(content)
             temp_inputs.append(input_path)
+            expiry_index.register(input_path)
 
             output_path = audio_converter.convert(input_path, target_format)
             converted_files.append(output_path)
+            expiry_index.register(output_path)
 
         if len(converted_files) == 1:
             final_file = converted_files[0]
             background_tasks.add_task(cleanup_files, temp_inputs + converted_files)
             return FileResponse(final_file, media_type=f"audio/{target_format}", filename=final_file.name)
         else:
-            zip_path = BaseConverter.create_zip(converted_files, "audios_converted")
-            background_tasks.add_task(cleanup_files, temp_inputs + converted_files + [zip_path])
-            return FileResponse(zip_path, media_type="application/zip", filename="converted_audio.zip")
+            # Streamed straight from the converted files; no archive is written to disk
+            background_tasks.add_task(cleanup_files, temp_inputs + converted_files)
+            return StreamingResponse(
+                stream_zip((str(f), f.name) for f in converted_files),
+                media_type="application/zip",
+                headers={"Content-Disposition": content_disposition("converted_audio.zip")},
+            )
 
     except HTTPException:
         raise
     except Exception as e:
         cleanup_files(temp_inputs + converted_files)
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        storage_accountant.release(str(UPLOAD_DIR), reservation)
 
 
 @router.post("/convert/document")
@@ -156,6 +182,10 @@ async def convert_document(
     temp_inputs = []
     combined_size = 0
 
+    reservation = storage_accountant.reserve(
+        str(UPLOAD_DIR), storage_accountant.upload_estimate(request.headers.get("content-length")),
+        ttl=storage_accountant.UPLOAD_RESERVATION_TTL,
+    )
     try:
         for file in files:
             content = await file.read()
@@ -171,21 +201,29 @@ async def convert_document(
             with open(input_path, "wb") as buffer:
                 buffer.write(content)
             temp_inputs.append(input_path)
+            expiry_index.register(input_path)
 
             output_path = doc_converter.convert(input_path, target_format)
             converted_files.append(output_path)
+            expiry_index.register(output_path)
 
         if len(converted_files) == 1:
             final_file = converted_files[0]
             background_tasks.add_task(cleanup_files, temp_inputs + converted_files)
             return FileResponse(final_file, filename=final_file.name)
         else:
-            zip_path = BaseConverter.create_zip(converted_files, "docs_converted")
-            background_tasks.add_task(cleanup_files, temp_inputs + converted_files + [zip_path])
-            return FileResponse(zip_path, media_type="application/zip", filename="converted_docs.zip")
+            # Streamed straight from the converted files; no archive is written to disk
+            background_tasks.add_task(cleanup_files, temp_inputs + converted_files)
+            return StreamingResponse(
+                stream_zip((str(f), f.name) for f in converted_files),
+                media_type="application/zip",
+                headers={"Content-Disposition": content_disposition("converted_docs.zip")},
+            )
 
     except HTTPException:
         raise
     except Exception as e:
         cleanup_files(temp_inputs + converted_files)
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        storage_accountant.release(str(UPLOAD_DIR), reservation)
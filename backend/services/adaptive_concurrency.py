@@ -0,0 +1,179 @@
+"""
+AIMD controller for the number of downloads running at once on a node.
+
+The Celery pool is sized for the most this node should ever run; this module
+decides how many of those processes may actually be downloading. Every
+AIMD_INTERVAL seconds (checked lazily by whichever job touches it) it looks
+at the last window and adjusts the limit:
+
+  - congestion (too many 429s/timeouts, or per-job speed collapsing without
+    any gain in total throughput) -> limit *= AIMD_DECREASE
+  - slots saturated and no congestion -> limit += 1
+  - otherwise hold
+
+  aimd:<node>        hash  limit, throughput, per_job (last window)
+  aimd:<node>:stats  hash  bytes, ok, errors, throttled for the current window
+  aimd:<node>:slots  hash  task_id -> lease deadline
+"""
+import logging
+import os
+import random
+import socket
+import time
+import uuid
+from typing import Optional
+
+from backend.services.redis_client import get_redis  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+AIMD_MIN_SLOTS = int(os.getenv("AIMD_MIN_SLOTS", "1"))
+AIMD_MAX_SLOTS = int(os.getenv("AIMD_MAX_SLOTS", "32"))
+AIMD_INITIAL_SLOTS = float(os.getenv("AIMD_INITIAL_SLOTS", "4"))
+AIMD_INTERVAL = float(os.getenv("AIMD_INTERVAL", "15"))
+AIMD_DECREASE = float(os.getenv("AIMD_DECREASE", "0.5"))
+AIMD_ERROR_THRESHOLD = float(os.getenv("AIMD_ERROR_THRESHOLD", "0.1"))
+SLOT_LEASE_SECONDS = int(os.getenv("AIMD_SLOT_LEASE_SECONDS", "7200"))
+# A job waits this long for a slot in-process, then goes back to the broker
+AIMD_MAX_WAIT = float(os.getenv("AIMD_MAX_WAIT", "30"))
+AIMD_RETRY_BASE = float(os.getenv("AIMD_RETRY_BASE", "15"))
+AIMD_RETRY_MAX = float(os.getenv("AIMD_RETRY_MAX", "300"))
+AIMD_MAX_RETRIES = int(os.getenv("AIMD_MAX_RETRIES", "20"))
+NODE_NAME = os.getenv("NODE_NAME") or socket.gethostname()
+
+THROTTLE_MARKERS = ("429", "too many requests", "timed out", "timeout", "rate limit", "rate-limit")
+
+# KEYS[1] slots hash; ARGV: task_id, limit, now, deadline. 1 if a slot was taken.
+_ACQUIRE_SCRIPT = """
+local running = 0
+local entries = redis.call('hgetall', KEYS[1])
+for i = 1, #entries, 2 do
+    if tonumber(entries[i + 1]) < tonumber(ARGV[3]) then
+        redis.call('hdel', KEYS[1], entries[i])
+    elseif entries[i] ~= ARGV[1] then
+        running = running + 1
+    end
+end
+if running >= tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('hset', KEYS[1], ARGV[1], ARGV[4])
+return 1
+"""
+
+
+def _state_key() -> str:
+    return f"aimd:{NODE_NAME}"
+
+
+def _stats_key() -> str:
+    return f"aimd:{NODE_NAME}:stats"
+
+
+def _slots_key() -> str:
+    return f"aimd:{NODE_NAME}:slots"
+
+
+def is_throttle_error(message: Optional[str]) -> bool:
+    message = (message or "").lower()
+    return any(marker in message for marker in THROTTLE_MARKERS)
+
+
+def aimd_step(limit: float, running: int, throughput: float, prev_throughput: float,
+              per_job: float, prev_per_job: float, error_rate: float) -> float:
+    """Next slot limit from one window of measurements (bytes/s, error fraction)."""
+    congested = error_rate > AIMD_ERROR_THRESHOLD or (
+        prev_per_job > 0 and per_job < prev_per_job * 0.6 and throughput <= prev_throughput
+    )
+    if congested:
+        limit = limit * AIMD_DECREASE
+    elif running >= int(limit):
+        limit = limit + 1
+    return float(min(AIMD_MAX_SLOTS, max(AIMD_MIN_SLOTS, limit)))
+
+
+def current_limit() -> int:
+    raw = get_redis().hget(_state_key(), "limit")
+    return int(float(raw)) if raw else int(AIMD_INITIAL_SLOTS)
+
+
+def record_bytes(count: int) -> None:
+    if count > 0:
+        get_redis().hincrby(_stats_key(), "bytes", count)
+
+
+def record_outcome(succeeded: bool, throttled: bool = False) -> None:
+    pipe = get_redis().pipeline()
+    pipe.hincrby(_stats_key(), "ok" if succeeded else "errors", 1)
+    if throttled:
+        pipe.hincrby(_stats_key(), "throttled", 1)
+    pipe.execute()
+
+
+def maybe_adjust() -> None:
+    """Close the current window and move the limit if AIMD_INTERVAL has passed."""
+    r = get_redis()
+    state = r.hgetall(_state_key())
+    now = time.time()
+    updated_at = float(state.get("updated_at", 0))
+    if now - updated_at < AIMD_INTERVAL:
+        return
+    if not r.set(f"aimd:{NODE_NAME}:lock", uuid.uuid4().hex, nx=True, px=max(1000, int(AIMD_INTERVAL * 1000))):
+        return
+
+    pipe = r.pipeline()
+    pipe.hgetall(_stats_key())
+    pipe.delete(_stats_key())
+    stats, _ = pipe.execute()
+
+    running = r.hlen(_slots_key())
+    elapsed = max(now - updated_at if updated_at else AIMD_INTERVAL, 1.0)
+    throughput = int(stats.get("bytes", 0)) / elapsed
+    per_job = throughput / running if running else 0.0
+    finished = int(stats.get("ok", 0)) + int(stats.get("errors", 0))
+    error_rate = int(stats.get("throttled", 0)) / finished if finished else 0.0
+
+    limit = float(state.get("limit", AIMD_INITIAL_SLOTS))
+    new_limit = aimd_step(limit, running, throughput, float(state.get("throughput", 0)),
+                          per_job, float(state.get("per_job", 0)), error_rate)
+    if int(new_limit) != int(limit):
+        logger.info(f"Download slots on {NODE_NAME}: {int(limit)} -> {int(new_limit)} "
+                    f"({throughput / 1e6:.1f} MB/s, throttle rate {error_rate:.0%})")
+    r.hset(_state_key(), mapping={
+        "limit": new_limit,
+        "throughput": round(throughput, 1),
+        "per_job": round(per_job, 1) if running else state.get("per_job", 0),
+        "updated_at": now,
+    })
+
+
+def acquire(task_id: str, on_wait=None, max_wait: float = AIMD_MAX_WAIT) -> bool:
+    """
+    Wait up to max_wait seconds for a free download slot on this node.
+    False means the node is still full; the caller should give the job back
+    to the broker (see retry_countdown) instead of holding a process.
+    """
+    r = get_redis()
+    deadline = time.time() + max_wait
+    waited = False
+    while True:
+        maybe_adjust()
+        now = time.time()
+        if r.eval(_ACQUIRE_SCRIPT, 1, _slots_key(), task_id, current_limit(), now, now + SLOT_LEASE_SECONDS):
+            return True
+        if now >= deadline:
+            return False
+        if not waited and on_wait:
+            on_wait()
+        waited = True
+        time.sleep(min(1.0, max(0.0, deadline - now)))
+
+
+def retry_countdown(retries: int) -> float:
+    """Seconds before a job that found no slot is tried again: exponential with jitter, capped."""
+    delay = min(AIMD_RETRY_MAX, AIMD_RETRY_BASE * 2 ** retries)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def release(task_id: str) -> None:
+    get_redis().hdel(_slots_key(), task_id)
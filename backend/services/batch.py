@@ -0,0 +1,149 @@
+"""
+Batch (multi-URL / playlist) download bookkeeping.
+
+A batch is a list of ordinary download jobs that share one id. At most
+BATCH_PARALLELISM of them are admitted at a time; when one ends the worker
+admits the next, so a 50-item playlist doesn't flood the queue.
+
+  batch:<id>          hash  title, format_id, client, total, created
+  batch:<id>:items    list  item JSON {task_id, url, title}, in request order
+  batch:<id>:pending  list  task_ids not yet admitted
+  batch:<id>:running  set   task_ids admitted and not finished
+  batch:<id>:done     list  task_ids finished, in completion order
+  batch:<id>:failed   set   task_ids that failed
+  batch:<id>:resume   str   set while a delayed refill is scheduled
+  batch:item:<task>   str   batch id of a job
+"""
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from backend.services.redis_client import get_redis  # type: ignore
+
+BATCH_PARALLELISM = int(os.getenv("BATCH_PARALLELISM", "4"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50"))
+BATCH_TTL = int(os.getenv("BATCH_TTL", "21600"))
+
+PREFIX = "batch:"
+ITEM_PREFIX = "batch:item:"
+
+# KEYS: pending list, running set; ARGV: parallelism, ttl
+_TAKE_NEXT_SCRIPT = """
+if redis.call('scard', KEYS[2]) >= tonumber(ARGV[1]) then
+    return false
+end
+local task_id = redis.call('lpop', KEYS[1])
+if task_id then
+    redis.call('sadd', KEYS[2], task_id)
+    redis.call('expire', KEYS[2], ARGV[2])
+end
+return task_id
+"""
+
+
+def _key(batch_id: str, part: str = "") -> str:
+    return f"{PREFIX}{batch_id}{':' + part if part else ''}"
+
+
+def create(batch_id: str, items: List[Dict[str, Any]], format_id: str, client: str, title: str = "batch") -> None:
+    """Record a batch; items are dicts with task_id, url and title."""
+    r = get_redis()
+    pipe = r.pipeline()
+    pipe.hset(_key(batch_id), mapping={
+        "title": title,
+        "format_id": format_id,
+        "client": client,
+        "total": len(items),
+        "created": time.time(),
+    })
+    pipe.rpush(_key(batch_id, "items"), *[json.dumps(item) for item in items])
+    pipe.rpush(_key(batch_id, "pending"), *[item["task_id"] for item in items])
+    for item in items:
+        pipe.set(ITEM_PREFIX + item["task_id"], batch_id, ex=BATCH_TTL)
+    for part in ("", "items", "pending"):
+        pipe.expire(_key(batch_id, part), BATCH_TTL)
+    pipe.execute()
+
+
+def info(batch_id: str) -> Optional[Dict[str, str]]:
+    meta = get_redis().hgetall(_key(batch_id))
+    return meta or None
+
+
+def items(batch_id: str) -> List[Dict[str, Any]]:
+    return [json.loads(raw) for raw in get_redis().lrange(_key(batch_id, "items"), 0, -1)]
+
+
+def batch_of(task_id: str) -> Optional[str]:
+    return get_redis().get(ITEM_PREFIX + task_id)
+
+
+def take_next(batch_id: str) -> Optional[str]:
+    """Pop the next pending task_id if the batch has a free slot, marking it running."""
+    return get_redis().eval(_TAKE_NEXT_SCRIPT, 2, _key(batch_id, "pending"), _key(batch_id, "running"),
+                            BATCH_PARALLELISM, BATCH_TTL)
+
+
+def requeue(batch_id: str, task_id: str) -> None:
+    """Give back an admitted item that couldn't start; it is taken next."""
+    pipe = get_redis().pipeline()
+    pipe.srem(_key(batch_id, "running"), task_id)
+    pipe.lpush(_key(batch_id, "pending"), task_id)
+    pipe.expire(_key(batch_id, "pending"), BATCH_TTL)
+    pipe.execute()
+
+
+def schedule_resume(batch_id: str, delay: int) -> bool:
+    """True if no refill of this batch is scheduled within delay seconds yet (the caller schedules one)."""
+    return bool(get_redis().set(_key(batch_id, "resume"), 1, nx=True, ex=max(1, int(delay))))
+
+
+def resumed(batch_id: str) -> None:
+    """The scheduled refill is running; a later refusal may schedule the next one."""
+    get_redis().delete(_key(batch_id, "resume"))
+
+
+def item_done(task_id: str, succeeded: bool = True) -> Optional[str]:
+    """Mark a job finished. Returns its batch id (None if it isn't part of a batch)."""
+    r = get_redis()
+    batch_id = batch_of(task_id)
+    if not batch_id:
+        return None
+    if not r.srem(_key(batch_id, "running"), task_id):
+        return batch_id  # already recorded
+    pipe = r.pipeline()
+    pipe.rpush(_key(batch_id, "done"), task_id)
+    pipe.expire(_key(batch_id, "done"), BATCH_TTL)
+    if not succeeded:
+        pipe.sadd(_key(batch_id, "failed"), task_id)
+        pipe.expire(_key(batch_id, "failed"), BATCH_TTL)
+    pipe.execute()
+    return batch_id
+
+
+def completed(batch_id: str) -> List[str]:
+    """Finished task_ids (succeeded or failed) in completion order."""
+    return get_redis().lrange(_key(batch_id, "done"), 0, -1)
+
+
+def failed(batch_id: str) -> set:
+    return get_redis().smembers(_key(batch_id, "failed"))
+
+
+def counts(batch_id: str) -> Dict[str, int]:
+    r = get_redis()
+    pipe = r.pipeline()
+    pipe.llen(_key(batch_id, "pending"))
+    pipe.scard(_key(batch_id, "running"))
+    pipe.llen(_key(batch_id, "done"))
+    pipe.scard(_key(batch_id, "failed"))
+    pending, running, done, failures = pipe.execute()
+    return {"pending": pending, "running": running, "completed": done - failures, "failed": failures}
+
+
+def aggregate_progress(item_progress: List[float]) -> float:
+    """Overall batch progress as the mean of its items' progress (0-100)."""
+    if not item_progress:
+        return 0.0
+    return round(sum(item_progress) / len(item_progress), 1)
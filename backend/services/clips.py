@@ -0,0 +1,93 @@
+"""
+Time-range (clip) downloads.
+
+A clip is a [start, end] pair in seconds (end None = to the end of the video),
+given directly as timestamps or resolved from a chapter name. yt-dlp then
+downloads only that section (--download-sections), cutting at keyframes, so
+30 seconds of a 2-hour stream costs 30 seconds of fragments.
+
+Clips are cached and coalesced separately from the full video: their cache /
+in-flight key is variant_id(format_id, clip).
+"""
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+Clip = Tuple[float, Optional[float]]
+
+# "0:00 Intro", "1:02:03 - Part two", "(12:30) Outro"
+_CHAPTER_LINE = re.compile(r"^\s*[\[(]?((?:\d{1,2}:)?\d{1,2}:\d{2})[\])]?\s*(?:[-–—:|]\s*)?(.+?)\s*$")
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[float]:
+    """'90', '1:30' or '01:02:03.5' -> seconds. None/'' -> None; raises ValueError if malformed."""
+    if value is None or str(value).strip() == "":
+        return None
+    parts = str(value).strip().split(":")
+    if len(parts) > 3:
+        raise ValueError(f"Invalid timestamp: {value}")
+    seconds = 0.0
+    for part in parts:
+        if not re.fullmatch(r"\d+(\.\d+)?", part):
+            raise ValueError(f"Invalid timestamp: {value}")
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def chapters_from_description(description: Optional[str]) -> List[Dict[str, Any]]:
+    """Chapter list ({title, start_time, end_time}) from timestamp lines in a description."""
+    chapters: List[Dict[str, Any]] = []
+    for line in (description or "").splitlines():
+        match = _CHAPTER_LINE.match(line)
+        if match:
+            chapters.append({"title": match.group(2), "start_time": parse_timestamp(match.group(1))})
+    chapters.sort(key=lambda c: c["start_time"])
+    for current, following in zip(chapters, chapters[1:]):
+        current["end_time"] = following["start_time"]
+    if chapters:
+        chapters[-1]["end_time"] = None
+    return chapters
+
+
+def find_chapter(chapters: List[Dict[str, Any]], name: str) -> Optional[Clip]:
+    """Range of the chapter whose title matches name (exact first, then substring; case-insensitive)."""
+    wanted = name.strip().lower()
+    for exact in (True, False):
+        for chapter in chapters:
+            title = (chapter.get("title") or "").strip().lower()
+            if (title == wanted) if exact else (wanted in title):
+                return float(chapter.get("start_time") or 0), chapter.get("end_time")
+    return None
+
+
+def resolve_clip(start: Optional[str] = None, end: Optional[str] = None, chapter: Optional[str] = None,
+                 chapters: Optional[List[Dict[str, Any]]] = None) -> Optional[Clip]:
+    """The requested clip, or None for the whole video. Raises ValueError for a bad request."""
+    if chapter:
+        clip = find_chapter(chapters or [], chapter)
+        if clip is None:
+            raise ValueError(f"Chapter not found: {chapter}")
+        return clip
+    start_s, end_s = parse_timestamp(start), parse_timestamp(end)
+    if start_s is None and end_s is None:
+        return None
+    start_s = start_s or 0.0
+    if end_s is not None and end_s <= start_s:
+        raise ValueError("end must be after start")
+    return start_s, end_s
+
+
+def variant_id(format_id: str, clip: Optional[Clip]) -> str:
+    """Cache / in-flight identity of a (format, clip) pair."""
+    if not clip:
+        return format_id
+    start, end = clip
+    return f"{format_id}@{start:g}-{'end' if end is None else f'{end:g}'}"
+
+
+def clip_fraction(clip: Optional[Clip], duration: Optional[float]) -> float:
+    """Share of the video a clip covers (1.0 when unknown), for size estimates."""
+    if not clip or not duration:
+        return 1.0
+    start, end = clip
+    end = duration if end is None else min(end, duration)
+    return max(0.0, min(1.0, (end - start) / duration))
@@ -0,0 +1,81 @@
+"""
+Per-node cap on concurrently open download connections.
+
+Fragment parallelism multiplies the connections each job opens, so the
+worker processes on one node share a budget (NODE_MAX_CONNECTIONS) kept in
+the Redis hash conngov:<node>: task_id -> "<connections>:<lease deadline>".
+A job asks for what its plan wants and gets whatever is left (at least 1,
+after waiting up to GOVERNOR_WAIT_SECONDS). Leases expire so a crashed
+worker can't leak its share.
+"""
+import os
+import socket
+import time
+
+from backend.services.redis_client import get_redis  # type: ignore
+
+NODE_MAX_CONNECTIONS = int(os.getenv("NODE_MAX_CONNECTIONS", "64"))
+GOVERNOR_WAIT_SECONDS = float(os.getenv("GOVERNOR_WAIT_SECONDS", "30"))
+GOVERNOR_LEASE_SECONDS = int(os.getenv("GOVERNOR_LEASE_SECONDS", "7200"))
+NODE_NAME = os.getenv("NODE_NAME") or socket.gethostname()
+
+KEY_PREFIX = "conngov:"
+
+# KEYS[1] node hash; ARGV: task_id, wanted, limit, now, deadline. Returns connections granted (0 = none free).
+_ACQUIRE_SCRIPT = """
+local used = 0
+local entries = redis.call('hgetall', KEYS[1])
+for i = 1, #entries, 2 do
+    local sep = string.find(entries[i + 1], ':')
+    local deadline = tonumber(string.sub(entries[i + 1], sep + 1))
+    if deadline < tonumber(ARGV[4]) then
+        redis.call('hdel', KEYS[1], entries[i])
+    elseif entries[i] ~= ARGV[1] then
+        used = used + tonumber(string.sub(entries[i + 1], 1, sep - 1))
+    end
+end
+local free = tonumber(ARGV[3]) - used
+if free <= 0 then
+    return 0
+end
+local granted = math.min(tonumber(ARGV[2]), free)
+redis.call('hset', KEYS[1], ARGV[1], granted .. ':' .. ARGV[5])
+return granted
+"""
+
+
+def _key() -> str:
+    return KEY_PREFIX + NODE_NAME
+
+
+def acquire(task_id: str, wanted: int) -> int:
+    """Reserve up to `wanted` connections for a job; returns the number granted (>= 1)."""
+    r = get_redis()
+    wanted = max(1, wanted)
+    give_up = time.time() + GOVERNOR_WAIT_SECONDS
+    while True:
+        now = time.time()
+        granted = int(r.eval(_ACQUIRE_SCRIPT, 1, _key(), task_id, wanted, NODE_MAX_CONNECTIONS,
+                             now, now + GOVERNOR_LEASE_SECONDS))
+        if granted:
+            return granted
+        if now >= give_up:
+            # Never block a job forever: run it single-connection
+            r.hset(_key(), task_id, f"1:{now + GOVERNOR_LEASE_SECONDS}")
+            return 1
+        time.sleep(0.5)
+
+
+def release(task_id: str) -> None:
+    get_redis().hdel(_key(), task_id)
+
+
+def in_use() -> int:
+    """Connections currently reserved on this node."""
+    total = 0
+    now = time.time()
+    for value in get_redis().hvals(_key()):
+        connections, _, deadline = value.partition(":")
+        if float(deadline) >= now:
+            total += int(connections)
+    return total
@@ -2,7 +2,6 @@ import os
 import shutil
 import subprocess
 import uuid
-import zipfile
 from pathlib import Path
 from typing import List, Tuple, Optional
 
@@ -28,16 +27,6 @@ class BaseConverter:
         unique_id = raw_uuid[0:8] # type: ignore
         safe_name = Path(original_filename).stem
         return OUTPUT_DIR / f"{safe_name}_{unique_id}.{extension.lstrip('.')}"
-    
-    @staticmethod
-    def create_zip(files: List[Path], zip_name: str = "converted_files.zip") -> Path:
-        """Zips a list of files and returns the zip path."""
-        zip_uuid = str(uuid.uuid4().hex)
-        zip_path = OUTPUT_DIR / f"{zip_name}_{zip_uuid[0:6]}.zip" # type: ignore
-        with zipfile.ZipFile(zip_path, 'w') as zf:
-            for file in files:
-                zf.write(file, arcname=file.name)
-        return zip_path
 
 
 class ImageConverter(BaseConverter):
@@ -0,0 +1,227 @@
+"""
+Pool of cookie jars (logged-in accounts) per platform, rotated per request.
+
+Jars are Netscape cookie files found in COOKIE_DIR (the working directory by
+default):
+
+  cookies_<platform>.txt            one account (the original layout)
+  cookies_<platform>_<account>.txt  more accounts for the same platform
+  cookies/<platform>/<account>.txt  same, in a directory per platform
+  cookies.txt                       fallback for every platform
+
+Files are parsed once and kept in memory; the directory is re-scanned at most
+every COOKIE_RELOAD_INTERVAL seconds, and a file whose mtime changed is
+re-read, so added, refreshed or removed accounts take effect without a
+restart. Jars that fail to parse, or whose cookies have all expired, are left
+out.
+
+Rotation and health are shared across processes in Redis:
+
+  cookies:rr:<platform>          int   round-robin counter
+  cookies:fail:<platform>        hash  account -> consecutive failures
+  cookies:cooldown:<account>     str   set with a TTL while the account rests
+
+An account that hits a login wall or a rate limit rests for
+COOKIE_COOLDOWN_SECONDS, doubling with each consecutive failure.
+"""
+import http.cookiejar
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from backend.services.redis_client import get_redis  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+COOKIE_DIR = os.getenv("COOKIE_DIR") or os.getcwd()
+COOKIE_RELOAD_INTERVAL = float(os.getenv("COOKIE_RELOAD_INTERVAL", "10"))
+COOKIE_COOLDOWN_SECONDS = int(os.getenv("COOKIE_COOLDOWN_SECONDS", "600"))
+COOKIE_COOLDOWN_MAX_SECONDS = int(os.getenv("COOKIE_COOLDOWN_MAX_SECONDS", "21600"))
+
+RR_PREFIX = "cookies:rr:"
+FAIL_PREFIX = "cookies:fail:"
+COOLDOWN_PREFIX = "cookies:cooldown:"
+
+GENERAL = "general"
+
+# URL host -> jar platform name (file names use "x" for X/Twitter)
+HOST_PLATFORMS = {
+    "facebook.com": "facebook",
+    "fb.watch": "facebook",
+    "fb.com": "facebook",
+    "instagram.com": "instagram",
+    "tiktok.com": "tiktok",
+    "x.com": "x",
+    "twitter.com": "x",
+    "youtube.com": "youtube",
+    "youtu.be": "youtube",
+}
+
+# Errors that mean the account (not the video) is the problem: login walls, bot checks, 429s
+ACCOUNT_FAILURE_MARKERS = ("login required", "you must log in", "log in to continue", "not a bot",
+                           "cookies are no longer valid", "checkpoint_required", "checkpoint required",
+                           "429", "too many requests", "rate limit", "rate-limit")
+# Per-video errors that also ask to sign in ("Private video. Sign in if you've been granted
+# access", "Sign in to confirm your age"); a healthy account hits these too
+VIDEO_FAILURE_MARKERS = ("private video", "granted access", "confirm your age", "age-restricted",
+                         "age restricted", "inappropriate for some users")
+
+_FILE_NAME = re.compile(r"^cookies_([a-z]+)(?:_([\w.-]+))?\.txt$")
+
+
+@dataclass
+class CookieJar:
+    """One account's cookie file, as handed to yt-dlp (cookiefile / --cookies)."""
+    platform: str
+    account: str
+    path: str
+    mtime: float
+    cookies: int
+
+
+def platform_for(url: str) -> str:
+    url = (url or "").lower()
+    for host, platform in HOST_PLATFORMS.items():
+        if host in url:
+            return platform
+    return GENERAL
+
+
+def is_account_failure(error: Optional[str]) -> bool:
+    """True if error says the account itself is blocked or throttled (so it should rest)."""
+    message = (error or "").lower()
+    if any(marker in message for marker in VIDEO_FAILURE_MARKERS):
+        return False
+    return any(marker in message for marker in ACCOUNT_FAILURE_MARKERS)
+
+
+def _jar_files(directory: str) -> Dict[str, str]:
+    """path -> platform for every cookie file in the layouts above."""
+    found: Dict[str, str] = {}
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                match = _FILE_NAME.match(entry.name)
+                if match:
+                    found[entry.path] = match.group(1)
+                elif entry.name == "cookies.txt":
+                    found[entry.path] = GENERAL
+    except FileNotFoundError:
+        return found
+    nested = os.path.join(directory, "cookies")
+    if os.path.isdir(nested):
+        for platform in os.listdir(nested):
+            platform_dir = os.path.join(nested, platform)
+            if os.path.isdir(platform_dir):
+                for name in os.listdir(platform_dir):
+                    if name.endswith(".txt"):
+                        found[os.path.join(platform_dir, name)] = platform
+    return found
+
+
+def _load(path: str, platform: str, mtime: float) -> Optional[CookieJar]:
+    jar = http.cookiejar.MozillaCookieJar(path)
+    try:
+        jar.load(ignore_discard=True, ignore_expires=True)
+    except (OSError, http.cookiejar.LoadError) as e:
+        logger.warning(f"Skipping unreadable cookie file {path}: {e}")
+        return None
+    now = time.time()
+    live = sum(1 for cookie in jar if not cookie.expires or cookie.expires > now)
+    if not live:
+        logger.warning(f"Skipping cookie file {path}: every cookie has expired")
+        return None
+    account = f"{platform}:{os.path.splitext(os.path.basename(path))[0]}"
+    return CookieJar(platform, account, path, mtime, live)
+
+
+class CookiePool:
+    def __init__(self, directory: str = COOKIE_DIR):
+        self.directory = directory
+        self._jars: Dict[str, CookieJar] = {}
+        self._scanned = 0.0
+        self._lock = threading.Lock()
+        self._local_rr = 0
+
+    def reload(self, force: bool = False) -> None:
+        """Pick up added, changed and removed files (mtime-based)."""
+        if not force and time.time() - self._scanned < COOKIE_RELOAD_INTERVAL:
+            return
+        with self._lock:
+            jars: Dict[str, CookieJar] = {}
+            for path, platform in _jar_files(self.directory).items():
+                try:
+                    mtime = os.stat(path).st_mtime
+                except FileNotFoundError:
+                    continue
+                current = self._jars.get(path)
+                if current and current.mtime == mtime:
+                    jars[path] = current
+                    continue
+                jar = _load(path, platform, mtime)
+                if jar:
+                    logger.info(f"Loaded cookies for {jar.account} ({jar.cookies} cookies)")
+                    jars[path] = jar
+            self._jars = jars
+            self._scanned = time.time()
+
+    def jars(self, platform: str) -> List[CookieJar]:
+        self.reload()
+        return sorted((j for j in self._jars.values() if j.platform == platform), key=lambda j: j.path)
+
+    def choose(self, url: str) -> Optional[CookieJar]:
+        """Next account for url's platform (round-robin, skipping resting ones), else the general jar."""
+        platform = platform_for(url)
+        candidates = self.jars(platform) if platform != GENERAL else []
+        if not candidates:
+            general = self.jars(GENERAL)
+            return general[0] if general else None
+        try:
+            r = get_redis()
+            pipe = r.pipeline()
+            for jar in candidates:
+                pipe.exists(COOLDOWN_PREFIX + jar.account)
+            resting = pipe.execute()
+            ready = [jar for jar, rest in zip(candidates, resting) if not rest] or candidates
+            turn = r.incr(RR_PREFIX + platform)
+        except Exception as e:
+            logger.warning(f"Cookie rotation state unavailable, rotating locally: {e}")
+            ready = candidates
+            self._local_rr += 1
+            turn = self._local_rr
+        return ready[turn % len(ready)]
+
+    def report(self, jar: Optional[CookieJar], error: Optional[str] = None) -> None:
+        """Record how a request with jar went (error None = success)."""
+        if jar is None or jar.platform == GENERAL:
+            return
+        try:
+            r = get_redis()
+            if error is None:
+                r.hdel(FAIL_PREFIX + jar.platform, jar.account)
+                return
+            if not is_account_failure(error):
+                return
+            failures = r.hincrby(FAIL_PREFIX + jar.platform, jar.account, 1)
+            seconds = min(COOKIE_COOLDOWN_SECONDS * 2 ** (failures - 1), COOKIE_COOLDOWN_MAX_SECONDS)
+            r.set(COOLDOWN_PREFIX + jar.account, error[:200], ex=int(seconds))
+            logger.warning(f"Cookie account {jar.account} resting for {int(seconds)}s after: {error[:120]}")
+        except Exception as e:
+            logger.warning(f"Could not record cookie account outcome: {e}")
+
+
+_pool = CookiePool()
+
+
+def choose(url: str) -> Optional[CookieJar]:
+    return _pool.choose(url)
+
+
+def report(jar: Optional[CookieJar], error: Optional[str] = None) -> None:
+    _pool.report(jar, error)
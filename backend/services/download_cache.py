@@ -0,0 +1,260 @@
+"""
+Content-addressed cache of finished downloads, shared across users.
+
+Entries are keyed by canonical video id + format spec, stored as files under
+DOWNLOAD_CACHE_DIR and indexed in Redis:
+  dlcache:entry:<key>   hash  path, size, ext, video_id, format_id, node, hits, refs
+  dlcache:lru:<node>    zset  key -> last access time
+  dlcache:lfu:<node>    zset  key -> hit count
+  dlcache:bytes:<node>  int   total bytes on that node's disk
+  dlcache:video:<id>    set   keys of every cached format of one video
+Files are hard-linked into temp_downloads on a hit, so serving a cached video
+costs no yt-dlp run, no ffmpeg run and no copy.
+
+The index is cluster-wide but files live on the disk of the node that stored
+them (DOWNLOAD_CACHE_NODE; processes sharing one cache volume use the same
+name). Only the owning node evicts or drops an entry; on any other node a
+missing file is just a miss, and the job downloads normally.
+"""
+import hashlib
+import logging
+import os
+import shutil
+import socket
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from backend.services.redis_client import get_redis  # type: ignore
+from backend.services.validators import canonical_video_id  # type: ignore
+from backend.services.file_delivery import media_type_for, renew_lease  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+CACHE_ENABLED = os.getenv("DOWNLOAD_CACHE_ENABLED", "1") != "0"
+CACHE_DIR = Path(os.getenv("DOWNLOAD_CACHE_DIR", "download_cache"))
+CACHE_MAX_BYTES = int(os.getenv("DOWNLOAD_CACHE_MAX_BYTES", str(20 * 1024 ** 3)))  # 20 GB
+CACHE_POLICY = os.getenv("DOWNLOAD_CACHE_POLICY", "lru").lower()  # "lru" or "lfu"
+CACHE_NODE = os.getenv("DOWNLOAD_CACHE_NODE") or os.getenv("NODE_NAME") or socket.gethostname()
+
+ENTRY_PREFIX = "dlcache:entry:"
+LRU_KEY = f"dlcache:lru:{CACHE_NODE}"
+LFU_KEY = f"dlcache:lfu:{CACHE_NODE}"
+BYTES_KEY = f"dlcache:bytes:{CACHE_NODE}"
+VIDEO_PREFIX = "dlcache:video:"
+
+# Containers an audio-only variant can be derived from
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".webm")
+
+# How many eviction candidates to inspect per round
+EVICT_BATCH = 20
+
+
+def cache_key(url: str, format_id: str) -> str:
+    """Content address for a (video, format) pair."""
+    raw = f"{canonical_video_id(url)}|{format_id}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def _link_or_copy(src: str, dst: str) -> None:
+    """Hard-link src to dst, falling back to a copy across filesystems."""
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _is_local(entry: Dict[str, Any]) -> bool:
+    return entry.get("node", CACHE_NODE) == CACHE_NODE
+
+
+def _drop(key: str, entry: Dict[str, Any]) -> None:
+    """Remove one of this node's entries from the index and its file from disk."""
+    r = get_redis()
+    pipe = r.pipeline()
+    pipe.delete(ENTRY_PREFIX + key)
+    pipe.zrem(LRU_KEY, key)
+    pipe.zrem(LFU_KEY, key)
+    pipe.decrby(BYTES_KEY, int(entry.get("size") or 0))
+    if entry.get("video_id"):
+        pipe.srem(VIDEO_PREFIX + entry["video_id"], key)
+    pipe.execute()
+    try:
+        os.remove(entry["path"])
+    except (OSError, KeyError):
+        pass
+
+
+def lookup(url: str, format_id: str) -> Optional[Dict[str, Any]]:
+    """Return the cache entry for (url, format_id) and record the hit, or None."""
+    if not CACHE_ENABLED:
+        return None
+    key = cache_key(url, format_id)
+    r = get_redis()
+    entry = r.hgetall(ENTRY_PREFIX + key)
+    if not entry:
+        return None
+    if not os.path.exists(entry.get("path", "")):
+        # Our own file went missing: forget it. Another node's file: just a miss here.
+        if _is_local(entry):
+            _drop(key, entry)
+        return None
+
+    pipe = r.pipeline()
+    pipe.zadd(LRU_KEY, {key: time.time()})
+    pipe.zincrby(LFU_KEY, 1, key)
+    pipe.hincrby(ENTRY_PREFIX + key, "hits", 1)
+    pipe.execute()
+    entry["key"] = key
+    return entry
+
+
+def exists(url: str, format_id: str) -> bool:
+    """Whether (url, format_id) is cached and readable here, without counting a hit."""
+    if not CACHE_ENABLED:
+        return False
+    entry = get_redis().hgetall(ENTRY_PREFIX + cache_key(url, format_id))
+    return bool(entry) and os.path.exists(entry.get("path", ""))
+
+
+def find_video_source(url: str) -> Optional[Dict[str, Any]]:
+    """
+    The largest cached video container of url in any format, or None. Audio-only
+    variants (MP3) can be cut from it locally instead of fetched again.
+    """
+    if not CACHE_ENABLED:
+        return None
+    r = get_redis()
+    best = None
+    video_key = VIDEO_PREFIX + canonical_video_id(url)
+    for key in r.smembers(video_key):
+        entry = r.hgetall(ENTRY_PREFIX + key)
+        if not entry:
+            r.srem(video_key, key)
+            continue
+        if entry.get("ext") not in VIDEO_EXTENSIONS or "@" in entry.get("format_id", ""):
+            continue  # audio-only, or a clip (variant "<format>@<start>-<end>")
+        if not os.path.exists(entry.get("path", "")):
+            continue
+        if best is None or int(entry.get("size") or 0) > int(best.get("size") or 0):
+            entry["key"] = key
+            best = entry
+    return best
+
+
+def acquire(key: str) -> None:
+    """Pin an entry so eviction leaves it alone while it is being read."""
+    get_redis().hincrby(ENTRY_PREFIX + key, "refs", 1)
+
+
+def release(key: str) -> None:
+    """Unpin an entry taken with acquire()."""
+    get_redis().hincrby(ENTRY_PREFIX + key, "refs", -1)
+
+
+def materialize(url: str, format_id: str, dest_base: str) -> Optional[Dict[str, Any]]:
+    """
+    Link a cached file to dest_base + <ext> and return a task result dict,
+    or None on a miss.
+    """
+    try:
+        entry = lookup(url, format_id)
+        if not entry:
+            return None
+        key = entry["key"]
+        acquire(key)
+        try:
+            dest = f"{dest_base}{entry['ext']}"
+            os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+            _link_or_copy(entry["path"], dest)
+            # The link shares the cache file's old timestamps; start a fresh lease
+            renew_lease(dest)
+        finally:
+            release(key)
+        logger.info(f"Download cache hit for {entry.get('video_id')} [{format_id}]")
+        return {
+            "status": "success",
+            "path": dest,
+            "mime": media_type_for(dest),
+            "size": os.path.getsize(dest),
+            "cached": True,
+        }
+    except Exception as e:
+        logger.warning(f"Download cache lookup failed, downloading normally: {e}")
+        return None
+
+
+def store(url: str, format_id: str, path: str) -> Optional[str]:
+    """Add a finished download to the cache. Returns the cache key."""
+    if not CACHE_ENABLED or not os.path.exists(path):
+        return None
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        key = cache_key(url, format_id)
+        ext = os.path.splitext(path)[1]
+        cached_path = str(CACHE_DIR / f"{key}{ext}")
+        staged_path = f"{cached_path}.{os.getpid()}.part"
+        _link_or_copy(path, staged_path)
+
+        r = get_redis()
+        # hsetnx on the path field doubles as a claim: first writer wins
+        if not r.hsetnx(ENTRY_PREFIX + key, "path", cached_path):
+            os.remove(staged_path)
+            return key
+        os.replace(staged_path, cached_path)
+
+        size = os.path.getsize(cached_path)
+        pipe = r.pipeline()
+        pipe.hset(ENTRY_PREFIX + key, mapping={
+            "size": size,
+            "ext": ext,
+            "video_id": canonical_video_id(url),
+            "format_id": format_id,
+            "node": CACHE_NODE,
+            "created": time.time(),
+            "hits": 0,
+            "refs": 0,
+        })
+        pipe.zadd(LRU_KEY, {key: time.time()})
+        pipe.zadd(LFU_KEY, {key: 0})
+        pipe.sadd(VIDEO_PREFIX + canonical_video_id(url), key)
+        pipe.incrby(BYTES_KEY, size)
+        pipe.execute()
+
+        evict()
+        return key
+    except Exception as e:
+        logger.warning(f"Could not add {path} to download cache: {e}")
+        return None
+
+
+def evict() -> int:
+    """Evict this node's unpinned entries until its cache fits CACHE_MAX_BYTES."""
+    r = get_redis()
+    order_key = LFU_KEY if CACHE_POLICY == "lfu" else LRU_KEY
+    evicted = 0
+    while int(r.get(BYTES_KEY) or 0) > CACHE_MAX_BYTES:
+        candidates = r.zrange(order_key, 0, EVICT_BATCH - 1)
+        if not candidates:
+            break
+        progressed = False
+        for key in candidates:
+            entry = r.hgetall(ENTRY_PREFIX + key)
+            if not entry:
+                r.zrem(LRU_KEY, key)
+                r.zrem(LFU_KEY, key)
+                progressed = True
+                continue
+            if int(entry.get("refs") or 0) > 0:
+                continue
+            _drop(key, entry)
+            evicted += 1
+            progressed = True
+            if int(r.get(BYTES_KEY) or 0) <= CACHE_MAX_BYTES:
+                break
+        if not progressed:
+            # Everything left is pinned; try again on the next store
+            break
+    return evicted
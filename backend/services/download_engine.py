@@ -0,0 +1,388 @@
+"""
+Download engines for download_video_task.
+
+A download is described by a plan dict (format spec, output template, audio
+extraction, ffmpeg options) and executed by one of two engines:
+  - "inprocess": drives yt_dlp.YoutubeDL inside the worker process and reports
+    exact byte counts, speed and ETA through yt-dlp's progress hooks.
+  - "subprocess": runs the yt-dlp CLI and scrapes its [download] lines.
+Both report progress through the same on_progress(event) callback, where
+event is a dict with at least "progress" (0-100) and "status".
+"""
+import logging
+import os
+import shlex
+import shutil
+import subprocess
+from typing import Any, Callable, Dict, Optional
+
+from backend.services.proxy_pool import scrub  # type: ignore
+from backend.services.validators import detect_platform  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+try:
+    import yt_dlp  # type: ignore
+    HAS_YTDLP_MODULE = True
+except ImportError:
+    HAS_YTDLP_MODULE = False
+
+DOWNLOAD_ENGINE = os.getenv("DOWNLOAD_ENGINE", "inprocess").lower()  # "inprocess" or "subprocess"
+# Re-encode around clip boundaries so clips start on a keyframe (exact cuts, a little CPU)
+CLIP_FORCE_KEYFRAMES = os.getenv("CLIP_FORCE_KEYFRAMES", "1") != "0"
+
+# DASH/HLS fragments fetched in parallel per job, by platform. Override with
+# DOWNLOAD_FRAGMENT_CONCURRENCY="youtube=8,tiktok=1,other=4".
+DEFAULT_FRAGMENT_CONCURRENCY = {
+    "youtube": 8,
+    "twitter": 4,
+    "facebook": 4,
+    "instagram": 4,
+    "tiktok": 1,
+    "other": 4,
+}
+
+# Optional external downloader (only "aria2c" is supported) and its connections per file
+EXTERNAL_DOWNLOADER = os.getenv("EXTERNAL_DOWNLOADER", "").lower() or None
+ARIA2C_CONNECTIONS = int(os.getenv("ARIA2C_CONNECTIONS", "4"))
+
+
+def _parse_concurrency(raw: str) -> Dict[str, int]:
+    table = dict(DEFAULT_FRAGMENT_CONCURRENCY)
+    for item in raw.split(","):
+        platform, sep, value = item.strip().partition("=")
+        if sep and value.strip().isdigit():
+            table[platform.strip().lower()] = max(1, int(value))
+    return table
+
+
+FRAGMENT_CONCURRENCY = _parse_concurrency(os.getenv("DOWNLOAD_FRAGMENT_CONCURRENCY", ""))
+
+
+def fragment_concurrency_for(url: str) -> int:
+    return FRAGMENT_CONCURRENCY.get(detect_platform(url), FRAGMENT_CONCURRENCY.get("other", 1))
+
+
+def _external_downloader() -> Optional[str]:
+    if EXTERNAL_DOWNLOADER == "aria2c" and shutil.which("aria2c"):
+        return "aria2c"
+    return None
+
+
+def plan_connections(plan: Dict[str, Any]) -> int:
+    """Upper bound on the connections a plan opens at once."""
+    fragments = plan.get("concurrent_fragments") or 1
+    if plan.get("external_downloader"):
+        return max(fragments, plan.get("downloader_connections") or 1)
+    return fragments
+
+
+def limit_connections(plan: Dict[str, Any], budget: int) -> Dict[str, Any]:
+    """Scale a plan's parallelism down to the connections granted by the governor."""
+    budget = max(1, budget)
+    plan["concurrent_fragments"] = min(plan.get("concurrent_fragments") or 1, budget)
+    if plan.get("external_downloader"):
+        plan["downloader_connections"] = min(plan.get("downloader_connections") or 1, budget)
+    return plan
+
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+# Postprocessor names (as reported by yt-dlp hooks) -> (progress, status)
+POSTPROCESSOR_STAGES = {
+    "Merger": (95, "Processing"),
+    "FFmpegMerger": (95, "Processing"),
+    "ExtractAudio": (90, "Converting"),
+    "FFmpegExtractAudio": (90, "Converting"),
+    "VideoConvertor": (90, "Converting"),
+    "FFmpegVideoConvertor": (90, "Converting"),
+}
+
+
+def is_youtube_url(url: str) -> bool:
+    url_lower = url.lower()
+    return "youtube.com" in url_lower or "youtu.be" in url_lower
+
+
+def build_download_plan(url: str, format_id: str, output_path: str,
+                        ffmpeg_location: Optional[str] = None, clip=None) -> Dict[str, Any]:
+    """Translate a (url, format_id[, clip]) request into engine-independent options."""
+    plan: Dict[str, Any] = {
+        "url": url,
+        "format_id": format_id,
+        "output_path": output_path,
+        "ffmpeg_location": ffmpeg_location,
+        "extract_audio": False,
+        "merge_output_format": None,
+        "postprocessor_args": None,
+        "codec_check": False,
+        "concurrent_fragments": fragment_concurrency_for(url),
+        "external_downloader": _external_downloader(),
+        "downloader_connections": ARIA2C_CONNECTIONS,
+        "clip": list(clip) if clip else None,
+        "proxy": None,
+        "cookiefile": None,
+    }
+    if clip:
+        # Sections are fetched by yt-dlp's ffmpeg downloader, which reads only the needed range
+        plan["external_downloader"] = None
+
+    if format_id == "mp3":
+        # Audio extraction
+        plan["format"] = "bestaudio/best"
+        plan["extract_audio"] = True
+        plan["outtmpl"] = output_path.replace('.mp3', '.%(ext)s')
+        return plan
+
+    # Video download — platform-aware format selection
+    is_youtube = is_youtube_url(url)
+    if format_id == "best":
+        if is_youtube:
+            # YouTube: prefer mp4/avc1 for compatibility
+            plan["format"] = "bestvideo[height<=1080][ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best"
+        else:
+            # Non-YouTube (FB/IG/X/TikTok): prefer H.264, flexible audio
+            plan["format"] = "bestvideo[height<=1080][vcodec^=avc1]+bestaudio/bestvideo[height<=1080]+bestaudio/best"
+        plan["outtmpl"] = output_path
+    else:
+        if is_youtube:
+            # YouTube specific format: trust the format_id, prefer m4a audio
+            plan["format"] = f"{format_id}+bestaudio[ext=m4a]/bestaudio/best"
+        else:
+            # Non-YouTube: use flexible audio matching (X/Twitter doesn't use m4a)
+            plan["format"] = f"{format_id}+bestaudio/best"
+        plan["outtmpl"] = f"{os.path.splitext(output_path)[0]}.%(ext)s"
+    plan["merge_output_format"] = "mp4"
+    # Non-YouTube codec compatibility (VP9/AV1/Opus) is fixed after download by the
+    # remux-first policy in media_probe rather than re-encoding everything.
+    # YouTube: no check needed — m4a audio is already AAC-compatible with MP4
+    plan["codec_check"] = not is_youtube
+    return plan
+
+
+def build_cli_command(plan: Dict[str, Any]) -> list:
+    """yt-dlp CLI arguments for a plan."""
+    cmd = ["yt-dlp"]
+    if plan.get("ffmpeg_location"):
+        cmd.extend(["--ffmpeg-location", plan["ffmpeg_location"]])
+    cmd.extend(["-f", plan["format"]])
+    if (plan.get("concurrent_fragments") or 1) > 1:
+        cmd.extend(["-N", str(plan["concurrent_fragments"])])
+    if plan.get("external_downloader"):
+        cmd.extend(["--downloader", plan["external_downloader"],
+                    "--downloader-args", f"{plan['external_downloader']}:{shlex.join(_downloader_args(plan))}"])
+    if plan.get("extract_audio"):
+        cmd.extend(["--extract-audio", "--audio-format", "mp3", "--audio-quality", "0"])
+    if plan.get("merge_output_format"):
+        cmd.extend(["--merge-output-format", plan["merge_output_format"]])
+    cmd.extend(["--newline", "-o", plan["outtmpl"]])
+    if plan.get("postprocessor_args"):
+        cmd.extend(["--postprocessor-args", f"ffmpeg:{plan['postprocessor_args']}"])
+    if plan.get("proxy"):
+        cmd.extend(["--proxy", plan["proxy"]])
+    if plan.get("cookiefile"):
+        cmd.extend(["--cookies", plan["cookiefile"]])
+    if plan.get("clip"):
+        cmd.extend(["--download-sections", section_spec(plan["clip"])])
+        if CLIP_FORCE_KEYFRAMES:
+            cmd.append("--force-keyframes-at-cuts")
+    if plan.get("info_json"):
+        # Start from the /analyze extraction; yt-dlp re-extracts from webpage_url if it went stale
+        cmd.extend(["--load-info-json", plan["info_json"]])
+    else:
+        cmd.append(plan["url"])
+    return cmd
+
+
+def section_spec(clip) -> str:
+    """--download-sections value for a [start, end] clip (end None = to the end)."""
+    start, end = clip
+    return f"*{start:g}-{'inf' if end is None else f'{end:g}'}"
+
+
+def _downloader_args(plan: Dict[str, Any]) -> list:
+    connections = plan.get("downloader_connections") or 1
+    return [f"-x{connections}", f"-s{connections}", f"-j{plan.get('concurrent_fragments') or 1}", "-k1M"]
+
+
+def build_ydl_options(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """YoutubeDL options equivalent to build_cli_command()."""
+    opts: Dict[str, Any] = {
+        "format": plan["format"],
+        "outtmpl": plan["outtmpl"],
+        "quiet": True,
+        "no_warnings": True,
+        "noprogress": True,
+        "no_color": True,
+    }
+    if plan.get("ffmpeg_location"):
+        opts["ffmpeg_location"] = plan["ffmpeg_location"]
+    if (plan.get("concurrent_fragments") or 1) > 1:
+        opts["concurrent_fragment_downloads"] = plan["concurrent_fragments"]
+    if plan.get("external_downloader"):
+        opts["external_downloader"] = {"default": plan["external_downloader"]}
+        opts["external_downloader_args"] = {plan["external_downloader"]: _downloader_args(plan)}
+    if plan.get("merge_output_format"):
+        opts["merge_output_format"] = plan["merge_output_format"]
+    if plan.get("extract_audio"):
+        opts["postprocessors"] = [{
+            "key": "FFmpegExtractAudio",
+            "preferredcodec": "mp3",
+            "preferredquality": "0",
+        }]
+    if plan.get("postprocessor_args"):
+        opts["postprocessor_args"] = {"ffmpeg": shlex.split(plan["postprocessor_args"])}
+    if plan.get("proxy"):
+        opts["proxy"] = plan["proxy"]
+    if plan.get("cookiefile"):
+        opts["cookiefile"] = plan["cookiefile"]
+    if plan.get("clip") and HAS_YTDLP_MODULE:
+        start, end = plan["clip"]
+        opts["download_ranges"] = yt_dlp.utils.download_range_func(None, [(start, float("inf") if end is None else end)])
+        opts["force_keyframes_at_cuts"] = CLIP_FORCE_KEYFRAMES
+    return opts
+
+
+def _run_subprocess(plan: Dict[str, Any], on_progress: ProgressCallback) -> bool:
+    """Run the yt-dlp CLI and scrape progress from its output."""
+    process = subprocess.Popen(
+        build_cli_command(plan),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        encoding='utf-8',
+        errors='replace'
+    )
+
+    # Explicitly check and use stdout
+    stdout = process.stdout
+    if stdout:
+        for line in stdout:
+            if "[download]" in line and "%" in line:
+                try:
+                    for part in line.split():
+                        if '%' in part:
+                            p_str = ''.join(c for c in part if c.isdigit() or c == '.')
+                            if p_str:
+                                on_progress({"progress": float(p_str), "status": "Downloading"})
+                            break
+                except ValueError:
+                    pass
+
+            if line.startswith("ERROR:"):
+                plan["error"] = scrub(line.strip())
+
+            if "[Merger]" in line or "Merging formats" in line:
+                on_progress({"progress": 95, "status": "Processing"})
+
+            if "ExtractAudio" in line or "Converting" in line:
+                on_progress({"progress": 90, "status": "Converting"})
+
+    process.wait()
+    return process.returncode == 0
+
+
+def _run_inprocess(plan: Dict[str, Any], on_progress: ProgressCallback) -> bool:
+    """Drive yt_dlp.YoutubeDL directly, using its native progress hooks."""
+
+    def progress_hook(d: Dict[str, Any]) -> None:
+        if d.get("status") != "downloading":
+            return
+        downloaded = d.get("downloaded_bytes") or 0
+        total = d.get("total_bytes") or d.get("total_bytes_estimate")
+        if total:
+            progress = downloaded * 100.0 / total
+        elif d.get("fragment_count"):
+            progress = (d.get("fragment_index") or 0) * 100.0 / d["fragment_count"]
+        else:
+            return
+        event: Dict[str, Any] = {
+            "progress": round(progress, 1),
+            "status": "Downloading",
+            "downloaded_bytes": downloaded,
+        }
+        if total:
+            event["total_bytes"] = int(total)
+        if d.get("speed"):
+            event["speed"] = int(d["speed"])
+        if d.get("eta") is not None:
+            event["eta"] = int(d["eta"])
+        on_progress(event)
+
+    def postprocessor_hook(d: Dict[str, Any]) -> None:
+        if d.get("status") != "started":
+            return
+        stage = POSTPROCESSOR_STAGES.get(d.get("postprocessor") or "")
+        if stage:
+            on_progress({"progress": stage[0], "status": stage[1]})
+
+    opts = build_ydl_options(plan)
+    opts["progress_hooks"] = [progress_hook]
+    opts["postprocessor_hooks"] = [postprocessor_hook]
+
+    try:
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            if plan.get("info_json"):
+                return ydl.download_with_info_file(plan["info_json"]) == 0
+            return ydl.download([plan["url"]]) == 0
+    except yt_dlp.utils.DownloadError as e:
+        plan["error"] = scrub(str(e))
+        logger.error(f"In-process download failed for {plan['url']}: {plan['error']}")
+        return False
+
+
+def run_download(plan: Dict[str, Any], on_progress: ProgressCallback) -> bool:
+    """Execute a plan with the configured engine. Returns True on success; on failure the
+    engine's error message (if any) is left in plan["error"]. A plan["info_json"] file is
+    consumed (deleted) by the run."""
+    try:
+        if DOWNLOAD_ENGINE == "inprocess" and HAS_YTDLP_MODULE:
+            return _run_inprocess(plan, on_progress)
+        return _run_subprocess(plan, on_progress)
+    finally:
+        if plan.get("info_json"):
+            try:
+                os.remove(plan["info_json"])
+            except OSError:
+                pass
+
+
+# --- Streaming delivery for progressive (single-file) formats ---
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def build_stream_command(url: str, format_id: str, proxy: Optional[str] = None,
+                         cookiefile: Optional[str] = None) -> list:
+    """
+    yt-dlp CLI arguments that write a single progressive file to stdout.
+    Only formats that already carry both video and audio qualify, so nothing
+    has to be merged (and therefore staged on disk) first.
+    """
+    if format_id == "best":
+        format_spec = "best[ext=mp4][vcodec!=none][acodec!=none]/best[vcodec!=none][acodec!=none]"
+    else:
+        format_spec = f"{format_id}[vcodec!=none][acodec!=none]"
+    return [
+        "yt-dlp",
+        "-f", format_spec,
+        "--no-playlist",
+        "--no-part",
+        "--quiet",
+        "--no-warnings",
+        *(["--proxy", proxy] if proxy else []),
+        *(["--cookies", cookiefile] if cookiefile else []),
+        "-o", "-",
+        url,
+    ]
+
+
+def sniff_container(head: bytes) -> tuple:
+    """Guess (extension, mime type) of a media stream from its first bytes."""
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return ".webm", "video/webm"
+    if head[4:8] == b"ftyp":
+        return ".mp4", "video/mp4"
+    if head[:3] == b"ID3" or head[:2] == b"\xff\xfb":
+        return ".mp3", "audio/mpeg"
+    return ".mp4", "video/mp4"
@@ -0,0 +1,94 @@
+"""
+Expiry index for temp files.
+
+Every artifact written to temp_downloads, temp_uploads or temp_outputs is
+registered in the Redis sorted set expiry:index (absolute path -> deadline).
+reap() pops only the entries whose deadline has passed, ZRANGEBYSCORE in
+batches, so cleanup costs O(k log n) for k expired files instead of a stat()
+of every file in every directory.
+
+Re-registering a path moves its deadline, which is how delivery leases are
+renewed. sweep_untracked() scans the directories every few minutes for files
+that were never registered (yt-dlp .part/.ytdl leftovers, outputs of failed
+jobs, files from a crashed process) and removes them after
+UNTRACKED_MAX_AGE, the same 30 minutes the old directory cleanup used.
+"""
+import logging
+import os
+import time
+from typing import Optional, Union
+
+from backend.services.redis_client import get_redis  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+INDEX_KEY = "expiry:index"
+TRACKED_DIRS = ("temp_downloads", "temp_uploads", "temp_outputs")
+ARTIFACT_TTL = int(os.getenv("ARTIFACT_TTL_SECONDS", "3600"))
+REAP_BATCH = 500
+# Unregistered files older than this are removed by sweep_untracked()
+UNTRACKED_MAX_AGE = int(os.getenv("UNTRACKED_MAX_AGE_SECONDS", "1800"))
+
+
+def register(path: Union[str, os.PathLike], ttl: Optional[int] = None) -> None:
+    """Schedule a file for deletion ttl seconds from now (moves the deadline if already registered)."""
+    try:
+        deadline = time.time() + (ttl if ttl is not None else ARTIFACT_TTL)
+        get_redis().zadd(INDEX_KEY, {os.path.abspath(path): deadline})
+    except Exception as e:
+        logger.warning(f"Could not register {path} for expiry: {e}")
+
+
+def _is_tracked(path: str) -> bool:
+    return os.path.basename(os.path.dirname(path)) in TRACKED_DIRS
+
+
+def reap(now: Optional[float] = None, batch: int = REAP_BATCH) -> int:
+    """Delete every registered file whose deadline has passed. Returns the number removed."""
+    r = get_redis()
+    now = now or time.time()
+    removed = 0
+    while True:
+        expired = r.zrangebyscore(INDEX_KEY, "-inf", now, start=0, num=batch)
+        if not expired:
+            return removed
+        for path in expired:
+            score = r.zscore(INDEX_KEY, path)
+            if score is not None and score > now:
+                continue  # lease renewed since we read the batch
+            if _is_tracked(path):
+                try:
+                    os.remove(path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"Could not remove expired file {path}: {e}")
+            r.zrem(INDEX_KEY, path)
+        if len(expired) < batch:
+            return removed
+
+
+def sweep_untracked(max_age: int = UNTRACKED_MAX_AGE) -> int:
+    """Remove old files that are missing from the index. Scans the directories."""
+    r = get_redis()
+    now = time.time()
+    removed = 0
+    for directory in TRACKED_DIRS:
+        if not os.path.isdir(directory):
+            continue
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+                if now - max(stat.st_atime, stat.st_mtime) <= max_age:
+                    continue
+                if r.zscore(INDEX_KEY, os.path.abspath(entry.path)) is not None:
+                    continue
+                try:
+                    os.remove(entry.path)
+                    removed += 1
+                except OSError:
+                    pass
+    return removed
@@ -0,0 +1,193 @@
+"""
+Per-client weighted fair scheduling for download jobs.
+
+Instead of going straight into the FIFO Celery queue, jobs wait in per-client
+virtual queues and are released to Celery in deficit-round-robin (DRR)
+order, at most FAIR_MAX_DISPATCHED at a time. One client flooding the API
+only grows its own queue; everyone else keeps getting turns.
+
+  fairq:client:<client>  list  job JSON, FIFO per client
+  fairq:clients          set   clients with queued jobs
+  fairq:active           list  round-robin order of those clients
+  fairq:deficit          hash  client -> DRR deficit counter
+  fairq:current          str   client whose turn is in progress
+  fairq:running          zset  dispatched task_id -> dispatch time
+
+dispatch() runs under a short Redis lock, from the API after submit() and
+from workers when a job ends.
+"""
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from backend.services.redis_client import get_redis  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+FAIR_SCHEDULING_ENABLED = os.getenv("FAIR_SCHEDULING_ENABLED", "1") != "0"
+FAIR_MAX_DISPATCHED = int(os.getenv("FAIR_MAX_DISPATCHED", "32"))
+DEFAULT_WEIGHT = float(os.getenv("FAIR_DEFAULT_WEIGHT", "1"))
+# Dispatched jobs that never report back (worker crash) stop counting after this
+RUNNING_TTL = int(os.getenv("FAIR_RUNNING_TTL", "3600"))
+
+QUEUE_PREFIX = "fairq:client:"
+CLIENTS_KEY = "fairq:clients"
+ACTIVE_KEY = "fairq:active"
+DEFICIT_KEY = "fairq:deficit"
+CURRENT_KEY = "fairq:current"
+RUNNING_KEY = "fairq:running"
+LOCK_KEY = "fairq:lock"
+
+# Drop a client from the active set only if its queue is still empty
+_RETIRE_SCRIPT = """
+if redis.call('llen', KEYS[1]) == 0 then
+    return redis.call('srem', KEYS[2], ARGV[1])
+end
+return 0
+"""
+
+_UNLOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def _parse_weights(raw: str) -> Dict[str, float]:
+    """FAIR_CLIENT_WEIGHTS="203.0.113.7=3,198.51.100.2=0.5" -> {client: weight}"""
+    weights: Dict[str, float] = {}
+    for item in raw.split(","):
+        client, sep, weight = item.strip().partition("=")
+        if sep:
+            try:
+                weights[client.strip()] = float(weight)
+            except ValueError:
+                logger.warning(f"Ignoring bad fair-scheduling weight: {item}")
+    return weights
+
+
+CLIENT_WEIGHTS = _parse_weights(os.getenv("FAIR_CLIENT_WEIGHTS", ""))
+
+
+def weight_for(client: str) -> float:
+    return CLIENT_WEIGHTS.get(client, DEFAULT_WEIGHT)
+
+
+def drr_schedule(
+    active: List[str],
+    pending: Dict[str, int],
+    deficits: Dict[str, float],
+    capacity: int,
+    current: Optional[str] = None,
+    weights: Optional[Dict[str, float]] = None,
+) -> Tuple[List[str], List[str], Dict[str, float], Optional[str]]:
+    """
+    One deficit-round-robin pass. Each job costs 1; a client's quantum is its
+    weight. Returns (picks, active, deficits, current) where picks lists the
+    client to take the next job from, in dispatch order. A turn cut short by
+    capacity resumes (without a new quantum) on the next call.
+    """
+    weights = weights or {}
+    active = list(active)
+    deficits = dict(deficits)
+    pending = dict(pending)
+    picks: List[str] = []
+
+    while capacity > 0 and active:
+        client = active[0]
+        if current != client:
+            deficits[client] = deficits.get(client, 0.0) + weights.get(client, DEFAULT_WEIGHT)
+            current = client
+        while deficits[client] >= 1 and pending.get(client, 0) > 0 and capacity > 0:
+            picks.append(client)
+            deficits[client] -= 1
+            pending[client] -= 1
+            capacity -= 1
+        if pending.get(client, 0) == 0:
+            # Idle clients don't bank credit
+            active.pop(0)
+            deficits.pop(client, None)
+            current = None
+        elif deficits[client] < 1:
+            active.append(active.pop(0))
+            current = None
+        else:
+            break
+    return picks, active, deficits, current
+
+
+def submit(client: str, job: Dict[str, Any]) -> None:
+    """Queue a job (must contain task_id) in the client's virtual queue."""
+    r = get_redis()
+    pipe = r.pipeline()
+    pipe.rpush(QUEUE_PREFIX + client, json.dumps(job))
+    pipe.sadd(CLIENTS_KEY, client)
+    pipe.execute()
+
+
+def job_done(task_id: str) -> None:
+    get_redis().zrem(RUNNING_KEY, task_id)
+
+
+def dispatch(send: Callable[[Dict[str, Any]], None]) -> int:
+    """Release queued jobs to Celery in DRR order. Returns how many were sent."""
+    r = get_redis()
+    token = uuid.uuid4().hex
+    if not r.set(LOCK_KEY, token, nx=True, px=10000):
+        return 0  # another process is dispatching
+    try:
+        now = time.time()
+        r.zremrangebyscore(RUNNING_KEY, 0, now - RUNNING_TTL)
+        capacity = FAIR_MAX_DISPATCHED - r.zcard(RUNNING_KEY)
+        if capacity <= 0:
+            return 0
+
+        clients = r.smembers(CLIENTS_KEY)
+        order = [c for c in r.lrange(ACTIVE_KEY, 0, -1) if c in clients]
+        order += sorted(clients - set(order))
+        if not order:
+            return 0
+        pending = {c: r.llen(QUEUE_PREFIX + c) for c in order}
+        deficits = {c: float(v) for c, v in r.hgetall(DEFICIT_KEY).items()}
+        current = r.get(CURRENT_KEY)
+
+        picks, active, deficits, current = drr_schedule(
+            order, pending, deficits, capacity, current, CLIENT_WEIGHTS
+        )
+
+        sent = 0
+        for client in picks:
+            raw = r.lpop(QUEUE_PREFIX + client)
+            if not raw:
+                continue
+            job = json.loads(raw)
+            try:
+                send(job)
+            except Exception as e:
+                # Put it back at the head of the client's queue and stop for now
+                r.lpush(QUEUE_PREFIX + client, raw)
+                logger.error(f"Fair scheduler could not dispatch {job.get('task_id')}: {e}")
+                break
+            r.zadd(RUNNING_KEY, {job["task_id"]: time.time()})
+            sent += 1
+
+        for client in order:
+            if client not in active:
+                r.eval(_RETIRE_SCRIPT, 2, QUEUE_PREFIX + client, CLIENTS_KEY, client)
+
+        pipe = r.pipeline()
+        pipe.delete(ACTIVE_KEY, DEFICIT_KEY, CURRENT_KEY)
+        if active:
+            pipe.rpush(ACTIVE_KEY, *active)
+        if deficits:
+            pipe.hset(DEFICIT_KEY, mapping=deficits)
+        if current:
+            pipe.set(CURRENT_KEY, current)
+        pipe.execute()
+        return sent
+    finally:
+        r.eval(_UNLOCK_SCRIPT, 1, LOCK_KEY, token)
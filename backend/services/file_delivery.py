@@ -0,0 +1,195 @@
+"""
+File delivery for finished downloads.
+
+RangeFileResponse serves a file with HTTP Range / If-Range support so browsers
+and download managers can resume or fetch in parallel chunks. When the ASGI
+server offers the zero-copy extension the body goes out via sendfile;
+otherwise it is streamed in chunks. With X_ACCEL_REDIRECT_PREFIX set, nginx
+serves the file instead (accel_redirect_response). RangeObjectResponse does
+the same for objects in a remote object store.
+
+Files are no longer deleted after the first response. Each read renews a
+lease: the file's deadline in the expiry index (and its atime; mtime is left
+alone so mtime-based ETags stay stable). scheduled_cleanup reaps files whose
+lease has expired.
+"""
+import os
+import time
+from email.utils import formatdate
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool  # type: ignore
+from starlette.responses import Response  # type: ignore
+
+from backend.services import expiry_index  # type: ignore
+
+FILE_LEASE_SECONDS = int(os.getenv("FILE_LEASE_SECONDS", "1800"))  # 30 minutes
+X_ACCEL_REDIRECT_PREFIX = os.getenv("X_ACCEL_REDIRECT_PREFIX", "")  # e.g. /protected-downloads/
+
+MEDIA_TYPES = {
+    ".mp4": "video/mp4",
+    ".mkv": "video/x-matroska",
+    ".webm": "video/webm",
+    ".mp3": "audio/mpeg",
+    ".m4a": "audio/mp4",
+    ".zip": "application/zip",
+}
+
+
+class RangeNotSatisfiable(Exception):
+    """The Range header does not overlap the file."""
+
+
+def media_type_for(path: str) -> str:
+    return MEDIA_TYPES.get(os.path.splitext(path)[1].lower(), "application/octet-stream")
+
+
+def content_disposition(filename: str) -> str:
+    """attachment header value that survives non-ASCII titles."""
+    return f"attachment; filename*=utf-8''{quote(filename)}"
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single "bytes=" range into an inclusive (start, end) pair.
+    Returns None when the whole file should be sent (no header, multiple
+    ranges or a unit we don't serve); raises RangeNotSatisfiable when the
+    range lies outside the file.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    spec = header[len("bytes="):].strip()
+    start_str, sep, end_str = spec.partition("-")
+    if not sep:
+        return None
+    try:
+        if start_str == "":
+            # Suffix range: last N bytes
+            length = int(end_str)
+            if length <= 0:
+                raise RangeNotSatisfiable()
+            return max(size - length, 0), size - 1
+        start = int(start_str)
+        end = int(end_str) if end_str else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+def renew_lease(path: str) -> None:
+    """Push back the cleanup deadline of a file that is being read."""
+    try:
+        os.utime(path, (time.time(), os.stat(path).st_mtime))
+    except OSError:
+        pass
+    expiry_index.register(path, FILE_LEASE_SECONDS)
+
+
+class RangeFileResponse(Response):
+    chunk_size = 256 * 1024
+
+    def __init__(self, path: str, request_headers, filename: str, media_type: Optional[str] = None,
+                 method: str = "GET"):
+        stat = os.stat(path)
+        self.path = path
+        self._prepare(stat.st_size, f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"', stat.st_mtime,
+                      request_headers, filename, media_type or media_type_for(path), method)
+
+    def _prepare(self, size: int, etag: str, mtime: float, request_headers, filename: str,
+                 media_type: str, method: str) -> None:
+        self.send_body = method != "HEAD"
+        last_modified = formatdate(mtime, usegmt=True)
+
+        super().__init__(content=None, status_code=200, media_type=media_type)
+        self.headers["accept-ranges"] = "bytes"
+        self.headers["etag"] = etag
+        self.headers["last-modified"] = last_modified
+        self.headers["content-disposition"] = content_disposition(filename)
+
+        range_header = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        if if_range and if_range not in (etag, last_modified):
+            # Resource changed since the client's partial copy: send it whole
+            range_header = None
+
+        self.start, self.length = 0, size
+        try:
+            byte_range = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            self.status_code = 416
+            self.headers["content-range"] = f"bytes */{size}"
+            self.headers["content-length"] = "0"
+            self.length = 0
+            return
+        if byte_range:
+            start, end = byte_range
+            self.status_code = 206
+            self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+            self.start, self.length = start, end - start + 1
+        self.headers["content-length"] = str(self.length)
+
+    async def __call__(self, scope, receive, send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        if not self.send_body or self.length == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        await self._send_range(scope, send)
+
+    async def _send_range(self, scope, send) -> None:
+        with open(self.path, "rb") as f:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": f,
+                    "offset": self.start,
+                    "count": self.length,
+                    "more_body": False,
+                })
+                return
+
+            await run_in_threadpool(f.seek, self.start)
+            remaining = self.length
+            while remaining > 0:
+                chunk = await run_in_threadpool(f.read, min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class RangeObjectResponse(RangeFileResponse):
+    """RangeFileResponse for an object in a remote store, proxied through the API."""
+
+    def __init__(self, store, key: str, stat: Tuple[int, str, float], request_headers, filename: str,
+                 media_type: Optional[str] = None, method: str = "GET"):
+        self.store = store
+        self.key = key
+        size, etag, mtime = stat
+        self._prepare(size, f'"{etag}"', mtime, request_headers, filename,
+                      media_type or media_type_for(key), method)
+
+    async def _send_range(self, scope, send) -> None:
+        async for chunk in iterate_in_threadpool(self.store.iter_range(self.key, self.start, self.length)):
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def accel_redirect_response(path: str, filename: str, media_type: Optional[str] = None) -> Response:
+    """Hand delivery to nginx (sendfile + ranges) via X-Accel-Redirect."""
+    return Response(
+        status_code=200,
+        media_type=media_type or media_type_for(path),
+        headers={
+            "X-Accel-Redirect": f"{X_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{os.path.basename(path)}",
+            "Content-Disposition": content_disposition(filename),
+        },
+    )
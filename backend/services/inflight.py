@@ -0,0 +1,109 @@
+"""
+Single-flight registry for download jobs.
+
+While a (video, format) download is running, later requests for the same pair
+attach to it instead of queueing their own Celery task:
+  inflight:<cache_key>           -> leader task_id (cleared when the job ends)
+  inflight:alias:<task_id>       -> leader task_id for attached clients
+Every client keeps its own task_id; the API resolves it to the leader's.
+"""
+import os
+from typing import Callable, Optional
+
+from backend.services.redis_client import get_redis  # type: ignore
+from backend.services.download_cache import cache_key  # type: ignore
+
+INFLIGHT_PREFIX = "inflight:"
+ALIAS_PREFIX = "inflight:alias:"
+INFLIGHT_TTL = int(os.getenv("INFLIGHT_TTL", "3600"))
+# Celery states of a leader that will never clear its claim itself
+STALE_STATES = ("SUCCESS", "FAILURE", "REVOKED")
+
+# Delete the claim only if it still belongs to this task
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Replace the claim only if it still names the stale leader
+_TAKEOVER_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    redis.call('set', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+
+def _key(url: str, format_id: str) -> str:
+    return INFLIGHT_PREFIX + cache_key(url, format_id)
+
+
+def claim(url: str, format_id: str, task_id: str) -> Optional[str]:
+    """
+    Register task_id as the running job for (url, format_id).
+    Returns None if task_id is now the leader, else the running leader's id.
+    """
+    r = get_redis()
+    key = _key(url, format_id)
+    for _ in range(2):
+        if r.set(key, task_id, nx=True, ex=INFLIGHT_TTL):
+            return None
+        leader = r.get(key)
+        if leader:
+            return leader
+        # The leader finished between SET and GET; try to claim again
+    return None
+
+
+def current_leader(url: str, format_id: str) -> Optional[str]:
+    """The running leader for (url, format_id), if any (read-only)."""
+    return get_redis().get(_key(url, format_id))
+
+
+def takeover(url: str, format_id: str, task_id: str, stale_id: str) -> bool:
+    """Replace a stale leader (crashed or already finished) with task_id, unless someone else already did."""
+    return bool(get_redis().eval(_TAKEOVER_SCRIPT, 1, _key(url, format_id), stale_id, task_id, INFLIGHT_TTL))
+
+
+def join(url: str, format_id: str, task_id: str, state_of: Callable[[str], str]) -> Optional[str]:
+    """
+    Lead (url, format_id) or attach task_id to the job already running it.
+    A leader whose state_of() is in STALE_STATES is taken over. Returns the
+    leader task_id was attached to, or None if task_id is now the leader.
+    """
+    for _ in range(3):
+        leader = claim(url, format_id, task_id)
+        if leader is None:
+            return None
+        if state_of(leader) not in STALE_STATES:
+            attach(task_id, leader)
+            return leader
+        if takeover(url, format_id, task_id, leader):
+            return None
+        # Another request replaced the stale leader first; join that one
+    return None
+
+
+def attach(task_id: str, leader_id: str) -> None:
+    """Make task_id an alias of the running leader job."""
+    get_redis().set(ALIAS_PREFIX + task_id, leader_id, ex=INFLIGHT_TTL)
+
+
+def resolve(task_id: str) -> str:
+    """Return the task that actually does the work for task_id."""
+    try:
+        return get_redis().get(ALIAS_PREFIX + task_id) or task_id
+    except Exception:
+        return task_id
+
+
+def finish(url: str, format_id: str, task_id: str) -> None:
+    """Clear the in-flight claim once the leader job has ended."""
+    try:
+        get_redis().eval(_RELEASE_SCRIPT, 1, _key(url, format_id), task_id)
+    except Exception as e:
+        print(f"[WARNING] Could not clear in-flight claim for {task_id}: {e}")
+
@@ -0,0 +1,56 @@
+"""
+Cache of raw yt-dlp info dicts, shared between /analyze and the worker.
+
+/analyze already does a full extraction; the sanitized info dict is stored
+zlib-compressed under info:<canonical video id>. The worker writes it out as
+an .info.json and has yt-dlp start from it (--load-info-json /
+download_with_info_file), skipping a second extraction. If the signed media
+URLs inside have expired, yt-dlp falls back to re-extracting from the
+webpage_url on its own.
+"""
+import json
+import logging
+import os
+import zlib
+from typing import Any, Dict, Optional
+
+from backend.services.redis_client import get_redis  # type: ignore
+from backend.services.validators import canonical_video_id  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+# Signed format URLs typically live for hours; stay well inside that
+INFO_CACHE_TTL = int(os.getenv("INFO_CACHE_TTL", "1800"))
+INFO_PREFIX = "info:"
+
+
+def _key(url: str) -> str:
+    return INFO_PREFIX + canonical_video_id(url)
+
+
+def store(url: str, info: Dict[str, Any]) -> None:
+    """Cache a sanitized (JSON-safe) info dict for url."""
+    try:
+        payload = zlib.compress(json.dumps(info).encode("utf-8"), 6)
+        get_redis(binary=True).set(_key(url), payload, ex=INFO_CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"Could not cache info dict for {url}: {e}")
+
+
+def load(url: str) -> Optional[Dict[str, Any]]:
+    try:
+        payload = get_redis(binary=True).get(_key(url))
+        return json.loads(zlib.decompress(payload)) if payload else None
+    except Exception as e:
+        logger.warning(f"Could not read cached info dict for {url}: {e}")
+        return None
+
+
+def write_info_file(url: str, path: str) -> Optional[str]:
+    """Write the cached info dict for url to path; returns path, or None on a cache miss."""
+    info = load(url)
+    if not info:
+        return None
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(info, f)
+    return path
@@ -0,0 +1,134 @@
+"""
+Codec probing and the remux-first policy for downloaded videos.
+
+Instead of re-encoding every non-YouTube download with libx264, the worker
+probes the finished file with ffprobe and only transcodes the streams that
+MP4 players can't handle (VP8/VP9/AV1 video, Opus/Vorbis audio). Everything
+else is stream-copied, which costs a fraction of the CPU.
+"""
+import json
+import logging
+import os
+import subprocess
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+TRANSCODE_VIDEO_CODECS = {"vp8", "vp9", "av1"}
+TRANSCODE_AUDIO_CODECS = {"opus", "vorbis"}
+
+# Same quality settings the unconditional re-encode used
+VIDEO_TRANSCODE_ARGS = ["-c:v", "libx264", "-preset", "fast", "-crf", "23"]
+AUDIO_TRANSCODE_ARGS = ["-c:a", "aac", "-b:a", "192k"]
+# Matches yt-dlp's --audio-format mp3 --audio-quality 0 (LAME VBR V0)
+MP3_EXTRACT_ARGS = ["-c:a", "libmp3lame", "-q:a", "0"]
+
+
+def _tool(ffmpeg_location: Optional[str], name: str) -> str:
+    return os.path.join(ffmpeg_location, name) if ffmpeg_location else name
+
+
+def probe_codecs(path: str, ffmpeg_location: Optional[str] = None) -> Optional[Dict[str, Optional[str]]]:
+    """Return {"vcodec": ..., "acodec": ...} for the first video/audio streams, or None."""
+    try:
+        result = subprocess.run(
+            [_tool(ffmpeg_location, "ffprobe"), "-v", "error",
+             "-show_entries", "stream=codec_type,codec_name", "-of", "json", path],
+            capture_output=True, text=True, timeout=30,
+        )
+        if result.returncode != 0:
+            logger.warning(f"ffprobe failed for {path}: {result.stderr[-300:]}")
+            return None
+        codecs: Dict[str, Optional[str]] = {"vcodec": None, "acodec": None}
+        for stream in json.loads(result.stdout or "{}").get("streams", []):
+            kind = stream.get("codec_type")
+            if kind == "video" and not codecs["vcodec"]:
+                codecs["vcodec"] = stream.get("codec_name")
+            elif kind == "audio" and not codecs["acodec"]:
+                codecs["acodec"] = stream.get("codec_name")
+        return codecs
+    except (OSError, ValueError, subprocess.TimeoutExpired) as e:
+        logger.warning(f"ffprobe unavailable for {path}: {e}")
+        return None
+
+
+def decide_codec_policy(path: str, codecs: Optional[Dict[str, Optional[str]]]) -> Dict[str, Any]:
+    """
+    Pick what to do with a downloaded video:
+      "none"      - already an MP4 with compatible codecs
+      "remux"     - compatible codecs in another container; stream-copy to MP4
+      "transcode" - re-encode only the incompatible stream(s)
+      "skipped"   - probe failed; the file is left untouched
+    """
+    if codecs is None:
+        return {"action": "skipped"}
+    vcodec, acodec = codecs.get("vcodec"), codecs.get("acodec")
+    transcode_video = (vcodec or "") in TRANSCODE_VIDEO_CODECS
+    transcode_audio = (acodec or "") in TRANSCODE_AUDIO_CODECS
+    if transcode_video or transcode_audio:
+        action = "transcode"
+    elif os.path.splitext(path)[1].lower() != ".mp4":
+        action = "remux"
+    else:
+        action = "none"
+    return {
+        "action": action,
+        "vcodec": vcodec,
+        "acodec": acodec,
+        "video": "libx264" if transcode_video else "copy",
+        "audio": "aac" if transcode_audio else "copy",
+    }
+
+
+def apply_codec_policy(path: str, policy: Dict[str, Any], ffmpeg_location: Optional[str] = None) -> str:
+    """Remux or transcode path to MP4 per policy. Returns the final file path."""
+    if policy.get("action") not in ("remux", "transcode"):
+        return path
+
+    final_path = f"{os.path.splitext(path)[0]}.mp4"
+    tmp_path = f"{os.path.splitext(path)[0]}.codec.mp4"
+    video_args = VIDEO_TRANSCODE_ARGS if policy["video"] != "copy" else ["-c:v", "copy"]
+    audio_args = AUDIO_TRANSCODE_ARGS if policy["audio"] != "copy" else ["-c:a", "copy"]
+    cmd = [
+        _tool(ffmpeg_location, "ffmpeg"), "-y", "-i", path,
+        "-map", "0:v:0?", "-map", "0:a:0?",
+        *video_args, *audio_args,
+        "-movflags", "+faststart",
+        tmp_path,
+    ]
+    logger.info(f"Codec policy {policy['action']} ({policy.get('vcodec')}/{policy.get('acodec')}) for {path}")
+    try:
+        subprocess.run(cmd, check=True, capture_output=True)
+    except subprocess.CalledProcessError as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise Exception(f"FFmpeg {policy['action']} failed: {e.stderr.decode(errors='replace')[-300:]}")
+
+    os.replace(tmp_path, final_path)
+    if final_path != path and os.path.exists(path):
+        os.remove(path)
+    return final_path
+
+
+def build_audio_extract_command(source: str, dest: str, ffmpeg_location: Optional[str] = None) -> list:
+    """ffmpeg arguments that take the first audio stream of a video and encode it as MP3."""
+    return [
+        _tool(ffmpeg_location, "ffmpeg"), "-y", "-i", source,
+        "-map", "0:a:0", "-vn",
+        *MP3_EXTRACT_ARGS,
+        dest,
+    ]
+
+
+def extract_audio(source: str, dest: str, ffmpeg_location: Optional[str] = None) -> str:
+    """Write the MP3 of a local video to dest (no network fetch). Returns dest."""
+    tmp_path = f"{os.path.splitext(dest)[0]}.extract{os.path.splitext(dest)[1]}"
+    logger.info(f"Extracting audio from {source}")
+    try:
+        subprocess.run(build_audio_extract_command(source, tmp_path, ffmpeg_location), check=True, capture_output=True)
+    except subprocess.CalledProcessError as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise Exception(f"FFmpeg audio extraction failed: {e.stderr.decode(errors='replace')[-300:]}")
+    os.replace(tmp_path, dest)
+    return dest
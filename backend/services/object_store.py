@@ -0,0 +1,214 @@
+"""
+Where finished artifacts live once a worker is done with them.
+
+  local  files stay in temp_downloads on a volume shared by API and workers
+         (the default; one host)
+  s3     workers upload to an S3-compatible bucket (AWS, MinIO, ...) with
+         multipart uploads; the API redirects to a presigned URL or streams
+         the object through itself. API and workers then share nothing but
+         Redis and the bucket, so workers can run on any node.
+
+Objects are addressed by key (the artifact's file name). In s3 mode old
+objects are removed by the bucket lifecycle rule set in ensure_bucket()
+(S3_EXPIRE_DAYS) instead of by the expiry index.
+"""
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import Iterator, Optional, Tuple
+
+try:
+    import boto3  # type: ignore
+    from boto3.s3.transfer import TransferConfig  # type: ignore
+    from botocore.exceptions import ClientError  # type: ignore
+    HAS_BOTO3 = True
+except ImportError:
+    HAS_BOTO3 = False
+
+from backend.services.file_delivery import content_disposition, media_type_for  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+OBJECT_STORE = os.getenv("OBJECT_STORE", "local").lower()  # "local" or "s3"
+LOCAL_STORE_DIR = os.getenv("LOCAL_STORE_DIR", "temp_downloads")
+
+S3_BUCKET = os.getenv("S3_BUCKET", "downloads")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None  # e.g. http://minio:9000
+# Endpoint the browser can reach, when it differs from the one workers use (MinIO in compose)
+S3_PUBLIC_ENDPOINT_URL = os.getenv("S3_PUBLIC_ENDPOINT_URL") or None
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+S3_PREFIX = os.getenv("S3_PREFIX", "artifacts/")
+S3_EXPIRE_DAYS = int(os.getenv("S3_EXPIRE_DAYS", "1"))
+S3_MULTIPART_THRESHOLD_MB = int(os.getenv("S3_MULTIPART_THRESHOLD_MB", "16"))
+S3_MULTIPART_CHUNK_MB = int(os.getenv("S3_MULTIPART_CHUNK_MB", "16"))
+S3_UPLOAD_CONCURRENCY = int(os.getenv("S3_UPLOAD_CONCURRENCY", "4"))
+# Redirect downloads to presigned URLs (else the API proxies the bytes)
+S3_PRESIGN = os.getenv("S3_PRESIGN", "1") != "0"
+S3_PRESIGN_EXPIRES = int(os.getenv("S3_PRESIGN_EXPIRES", "3600"))
+
+MB = 1024 * 1024
+CHUNK_SIZE = 256 * 1024
+
+
+class ObjectStore(ABC):
+    """Interface shared by the backends."""
+
+    remote = False
+
+    @abstractmethod
+    def put_file(self, path: str, key: str) -> str:
+        """Store the file at path under key. Returns the key."""
+
+    def local_path(self, key: str) -> Optional[str]:
+        """A path the API can read directly, if the object is on this host."""
+        return None
+
+    @abstractmethod
+    def stat(self, key: str) -> Optional[Tuple[int, str, float]]:
+        """(size, etag, mtime) of an object, or None if it doesn't exist."""
+
+    @abstractmethod
+    def iter_range(self, key: str, start: int, length: int) -> Iterator[bytes]:
+        """length bytes of an object from offset start, in chunks."""
+
+    def presigned_url(self, key: str, filename: str, expires: int = S3_PRESIGN_EXPIRES) -> Optional[str]:
+        """A URL the browser can fetch the object from directly, if the backend has one."""
+        return None
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove an object; a missing one is not an error."""
+
+
+class LocalStore(ObjectStore):
+    def __init__(self, root: str = LOCAL_STORE_DIR):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, os.path.basename(key))
+
+    def put_file(self, path: str, key: str) -> str:
+        target = self._path(key)
+        if os.path.abspath(path) != os.path.abspath(target):
+            os.makedirs(self.root, exist_ok=True)
+            os.replace(path, target)
+        return key
+
+    def local_path(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        return path if os.path.exists(path) else None
+
+    def stat(self, key: str) -> Optional[Tuple[int, str, float]]:
+        try:
+            st = os.stat(self._path(key))
+        except FileNotFoundError:
+            return None
+        return st.st_size, f"{st.st_mtime_ns:x}-{st.st_size:x}", st.st_mtime
+
+    def iter_range(self, key: str, start: int, length: int) -> Iterator[bytes]:
+        with open(self._path(key), "rb") as f:
+            f.seek(start)
+            while length > 0:
+                chunk = f.read(min(CHUNK_SIZE, length))
+                if not chunk:
+                    return
+                length -= len(chunk)
+                yield chunk
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3Store(ObjectStore):
+    remote = True
+
+    def __init__(self, bucket: str = S3_BUCKET, endpoint_url: Optional[str] = S3_ENDPOINT_URL,
+                 prefix: str = S3_PREFIX):
+        if not HAS_BOTO3:
+            raise RuntimeError("OBJECT_STORE=s3 requires boto3 (pip install boto3)")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client("s3", endpoint_url=endpoint_url, region_name=S3_REGION)
+        # Presigned URLs are signed for the host the browser will use
+        self.public_client = (boto3.client("s3", endpoint_url=S3_PUBLIC_ENDPOINT_URL, region_name=S3_REGION)
+                              if S3_PUBLIC_ENDPOINT_URL else self.client)
+        self.transfer_config = TransferConfig(
+            multipart_threshold=S3_MULTIPART_THRESHOLD_MB * MB,
+            multipart_chunksize=S3_MULTIPART_CHUNK_MB * MB,
+            max_concurrency=S3_UPLOAD_CONCURRENCY,
+        )
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key
+
+    def ensure_bucket(self) -> None:
+        """Create the bucket (MinIO in development) and its expiry rule if missing."""
+        try:
+            self.client.head_bucket(Bucket=self.bucket)
+        except ClientError:
+            self.client.create_bucket(Bucket=self.bucket)
+        self.client.put_bucket_lifecycle_configuration(Bucket=self.bucket, LifecycleConfiguration={
+            "Rules": [{
+                "ID": "expire-artifacts",
+                "Filter": {"Prefix": self.prefix},
+                "Status": "Enabled",
+                "Expiration": {"Days": S3_EXPIRE_DAYS},
+            }],
+        })
+
+    def put_file(self, path: str, key: str) -> str:
+        # upload_file switches to a parallel multipart upload above the threshold
+        self.client.upload_file(path, self.bucket, self._key(key), Config=self.transfer_config,
+                                ExtraArgs={"ContentType": media_type_for(path)})
+        return key
+
+    def stat(self, key: str) -> Optional[Tuple[int, str, float]]:
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError:
+            return None
+        return head["ContentLength"], head["ETag"].strip('"'), head["LastModified"].timestamp()
+
+    def iter_range(self, key: str, start: int, length: int) -> Iterator[bytes]:
+        if length <= 0:
+            return
+        body = self.client.get_object(Bucket=self.bucket, Key=self._key(key),
+                                      Range=f"bytes={start}-{start + length - 1}")["Body"]
+        try:
+            yield from body.iter_chunks(CHUNK_SIZE)
+        finally:
+            body.close()
+
+    def presigned_url(self, key: str, filename: str, expires: int = S3_PRESIGN_EXPIRES) -> Optional[str]:
+        if not S3_PRESIGN:
+            return None
+        return self.public_client.generate_presigned_url("get_object", Params={
+            "Bucket": self.bucket,
+            "Key": self._key(key),
+            "ResponseContentDisposition": content_disposition(filename),
+        }, ExpiresIn=expires)
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+
+_store: Optional[ObjectStore] = None
+
+
+def get_store() -> ObjectStore:
+    """The process-wide store selected by OBJECT_STORE."""
+    global _store
+    if _store is None:
+        if OBJECT_STORE == "s3":
+            s3 = S3Store()
+            try:
+                s3.ensure_bucket()
+            except Exception as e:
+                logger.warning(f"Could not set up bucket {S3_BUCKET}: {e}")
+            _store = s3
+        else:
+            _store = LocalStore()
+    return _store
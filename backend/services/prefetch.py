@@ -0,0 +1,111 @@
+"""
+Speculative prefetch of the format a user is most likely to pick after /analyze.
+
+When enabled, /analyze queues a low-priority download of PREFETCH_FORMAT on the
+prefetch queue. The job claims the in-flight slot for (video, format), so a
+user who asks for it while it runs attaches to it, and one who asks later hits
+the download cache.
+
+Speculation is only worth its bandwidth if users follow through, so hits are
+tracked per platform and a platform whose hit rate falls below
+PREFETCH_MIN_HIT_RATE is only explored occasionally. All speculative traffic
+shares one hourly byte budget.
+
+  prefetch:job:<cache_key>     str   platform; set when speculated, consumed by the first request
+  prefetch:stats:<platform>    hash  issued, hits (halved every PREFETCH_STATS_WINDOW issues)
+  prefetch:budget:<hour>       int   estimated bytes fetched speculatively this hour
+"""
+import os
+import random
+import time
+from typing import Optional
+
+from backend.services.download_cache import cache_key  # type: ignore
+from backend.services.redis_client import get_redis  # type: ignore
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "0") == "1"
+PREFETCH_QUEUE = os.getenv("PREFETCH_QUEUE", "prefetch")
+PREFETCH_FORMAT = os.getenv("PREFETCH_FORMAT", "best")
+PREFETCH_MIN_HIT_RATE = float(os.getenv("PREFETCH_MIN_HIT_RATE", "0.3"))
+PREFETCH_MIN_SAMPLES = int(os.getenv("PREFETCH_MIN_SAMPLES", "20"))
+PREFETCH_STATS_WINDOW = int(os.getenv("PREFETCH_STATS_WINDOW", "200"))
+# Share of speculations still attempted on a platform that is switched off
+PREFETCH_EXPLORE_RATE = float(os.getenv("PREFETCH_EXPLORE_RATE", "0.05"))
+PREFETCH_BUDGET_MB_PER_HOUR = int(os.getenv("PREFETCH_BUDGET_MB_PER_HOUR", "2048"))
+PREFETCH_MAX_MB = int(os.getenv("PREFETCH_MAX_MB", "500"))
+# Don't speculate while real downloads are waiting for a slot
+PREFETCH_MAX_BACKLOG = int(os.getenv("PREFETCH_MAX_BACKLOG", "0"))
+# A speculative job that hasn't started by then is dropped; a result unclaimed by then is a miss
+PREFETCH_EXPIRES = int(os.getenv("PREFETCH_EXPIRES", "300"))
+PREFETCH_HIT_WINDOW = int(os.getenv("PREFETCH_HIT_WINDOW", "1800"))
+
+MB = 1024 * 1024
+
+JOB_PREFIX = "prefetch:job:"
+STATS_PREFIX = "prefetch:stats:"
+BUDGET_PREFIX = "prefetch:budget:"
+
+
+def should_speculate(issued: int, hits: int, min_samples: int = PREFETCH_MIN_SAMPLES,
+                     min_hit_rate: float = PREFETCH_MIN_HIT_RATE,
+                     explore_rate: float = PREFETCH_EXPLORE_RATE, roll: Optional[float] = None) -> bool:
+    """Speculate until there are enough samples, then only while the hit rate pays off."""
+    if issued < min_samples or hits >= issued * min_hit_rate:
+        return True
+    return (random.random() if roll is None else roll) < explore_rate
+
+
+def hit_rate(platform: str) -> Optional[float]:
+    stats = get_redis().hgetall(STATS_PREFIX + platform)
+    issued = int(stats.get("issued", 0))
+    return int(stats.get("hits", 0)) / issued if issued else None
+
+
+def allowed(platform: str) -> bool:
+    stats = get_redis().hgetall(STATS_PREFIX + platform)
+    return should_speculate(int(stats.get("issued", 0)), int(stats.get("hits", 0)))
+
+
+def claim(url: str, format_id: str, platform: str) -> bool:
+    """Mark (video, format) as speculated. False if a speculation is already outstanding."""
+    return bool(get_redis().set(JOB_PREFIX + cache_key(url, format_id), platform,
+                                nx=True, ex=PREFETCH_HIT_WINDOW))
+
+
+def unclaim(url: str, format_id: str) -> None:
+    get_redis().delete(JOB_PREFIX + cache_key(url, format_id))
+
+
+def take_budget(size_bytes: int) -> bool:
+    """Charge size_bytes to this hour's speculative budget; False (and no charge) if it won't fit."""
+    r = get_redis()
+    key = f"{BUDGET_PREFIX}{int(time.time() // 3600)}"
+    used = r.incrby(key, size_bytes)
+    r.expire(key, 7200)
+    if used > PREFETCH_BUDGET_MB_PER_HOUR * MB:
+        r.decrby(key, size_bytes)
+        return False
+    return True
+
+
+def issued(platform: str) -> None:
+    r = get_redis()
+    key = STATS_PREFIX + platform
+    count = r.hincrby(key, "issued", 1)
+    if count >= PREFETCH_STATS_WINDOW:
+        # Halve both counters so the rate follows recent behaviour
+        hits = int(r.hget(key, "hits") or 0)
+        r.hset(key, mapping={"issued": count // 2, "hits": hits // 2})
+
+
+def record_request(url: str, format_id: str) -> bool:
+    """Called for every real download request; counts a hit if it was speculated."""
+    try:
+        r = get_redis()
+        platform = r.getdel(JOB_PREFIX + cache_key(url, format_id))
+        if not platform:
+            return False
+        r.hincrby(STATS_PREFIX + platform, "hits", 1)
+        return True
+    except Exception:
+        return False
@@ -0,0 +1,146 @@
+"""
+Push-based download progress over Redis pub/sub.
+
+Workers publish each progress event to progress:<task_id> and keep the latest
+one in progress:last:<task_id> for clients that connect mid-download. Each
+API process runs one ProgressHub: a single pub/sub connection that
+subscribes to a task's channel while at least one local websocket follows it,
+and fans messages out to those websockets' queues.
+
+Every event is also appended to the Redis Stream progress:stream:<task_id>
+(capped, with a TTL) so the SSE endpoint can replay what a reconnecting
+client missed, using the stream entry id as the SSE event id.
+
+Terminal events carry status "Finished" or "Error".
+"""
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, Optional, Set
+
+from backend.services.redis_client import get_redis, REDIS_URL  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "progress:"
+LAST_PREFIX = "progress:last:"
+STREAM_PREFIX = "progress:stream:"
+STREAM_MAXLEN = 500
+PROGRESS_TTL = int(os.getenv("PROGRESS_TTL", "3600"))
+TERMINAL_STATUSES = ("Finished", "Error")
+
+# Always-subscribed channel so the hub's connection exists before any task does
+_HUB_CHANNEL = "progress:__hub__"
+
+
+def publish(task_id: str, event: Dict[str, Any]) -> None:
+    """Record and broadcast a progress event (called from workers)."""
+    payload = json.dumps(event)
+    try:
+        pipe = get_redis().pipeline()
+        pipe.set(LAST_PREFIX + task_id, payload, ex=PROGRESS_TTL)
+        pipe.xadd(STREAM_PREFIX + task_id, {"data": payload}, maxlen=STREAM_MAXLEN, approximate=True)
+        pipe.expire(STREAM_PREFIX + task_id, PROGRESS_TTL)
+        pipe.publish(CHANNEL_PREFIX + task_id, payload)
+        pipe.execute()
+    except Exception as e:
+        print(f"[WARNING] Progress publish failed for {task_id}: {e}")
+
+
+def last(task_id: str) -> Optional[Dict[str, Any]]:
+    """Latest published event for a task, if any."""
+    raw = get_redis().get(LAST_PREFIX + task_id)
+    return json.loads(raw) if raw else None
+
+
+def is_terminal(event: Dict[str, Any]) -> bool:
+    return event.get("status") in TERMINAL_STATUSES
+
+
+class ProgressHub:
+    """One pub/sub listener per API process, fanned out to local subscribers."""
+
+    queue_size = 100
+
+    def __init__(self, redis_url: str = REDIS_URL):
+        self.redis_url = redis_url
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._client = None
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self._closed = False
+
+    async def _ensure_started(self) -> None:
+        if self._reader and not self._reader.done():
+            return
+        import redis.asyncio as aioredis  # type: ignore
+        # Restarting after the reader died: release the old connection first
+        await self._close_connection()
+        self._client = aioredis.from_url(self.redis_url, decode_responses=True)
+        self._pubsub = self._client.pubsub()
+        await self._pubsub.subscribe(_HUB_CHANNEL, *[CHANNEL_PREFIX + t for t in self._subscribers])
+        self._reader = asyncio.create_task(self._read_loop())
+
+    async def _read_loop(self) -> None:
+        while not self._closed:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Progress hub lost its Redis connection: {e}")
+                await asyncio.sleep(1.0)
+                continue
+            if not message or message.get("type") != "message":
+                continue
+            task_id = message["channel"][len(CHANNEL_PREFIX):]
+            try:
+                event = json.loads(message["data"])
+            except ValueError:
+                continue
+            for queue in list(self._subscribers.get(task_id, ())):
+                if queue.full():
+                    # Slow consumer: drop the oldest event, progress is cumulative
+                    queue.get_nowait()
+                queue.put_nowait(event)
+
+    async def subscribe(self, task_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        async with self._lock:
+            await self._ensure_started()
+            if task_id not in self._subscribers:
+                self._subscribers[task_id] = set()
+                await self._pubsub.subscribe(CHANNEL_PREFIX + task_id)
+            self._subscribers[task_id].add(queue)
+        return queue
+
+    async def unsubscribe(self, task_id: str, queue: asyncio.Queue) -> None:
+        async with self._lock:
+            queues = self._subscribers.get(task_id)
+            if queues is None:
+                return
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[task_id]
+                try:
+                    await self._pubsub.unsubscribe(CHANNEL_PREFIX + task_id)
+                except Exception as e:
+                    logger.warning(f"Progress hub unsubscribe failed for {task_id}: {e}")
+
+    async def _close_connection(self) -> None:
+        pubsub, client = self._pubsub, self._client
+        self._pubsub = self._client = None
+        for resource in (pubsub, client):
+            if resource is not None:
+                try:
+                    await resource.aclose()
+                except Exception:
+                    pass
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._reader:
+            self._reader.cancel()
+        await self._close_connection()
@@ -0,0 +1,197 @@
+"""
+Health-scored pool of outbound proxies for extraction and downloads.
+
+Proxies come from PROXY_URLS (comma-separated) or PROXY_LIST_FILE (one per
+line); the old single PROXY_URL still works as a pool of one. Each proxy's
+record is shared cluster-wide in Redis:
+
+  proxy:stats:<id>        hash  ok, fail, throttled (exponentially decayed),
+                                latency (EWMA seconds), streak, quarantines, ts
+  proxy:quarantine:<id>   str   set with a TTL while the proxy is benched
+
+choose() picks among the proxies that aren't quarantined, weighted by
+score(): a smoothed success rate, with 429s counting extra, divided by
+latency. A throttled proxy, or one that fails PROXY_QUARANTINE_FAILURES
+times in a row, sits out PROXY_QUARANTINE_SECONDS (doubling per repeat) so
+one blocked egress IP stops dragging the fleet down. Failures that aren't
+the proxy's fault (private video, bad format) are not counted.
+"""
+import hashlib
+import logging
+import os
+import random
+import re
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+from backend.services.redis_client import get_redis  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+PROXY_HALF_LIFE = float(os.getenv("PROXY_HALF_LIFE", "600"))
+PROXY_QUARANTINE_SECONDS = int(os.getenv("PROXY_QUARANTINE_SECONDS", "300"))
+PROXY_QUARANTINE_MAX_SECONDS = int(os.getenv("PROXY_QUARANTINE_MAX_SECONDS", "3600"))
+PROXY_QUARANTINE_FAILURES = int(os.getenv("PROXY_QUARANTINE_FAILURES", "3"))
+# A 429 weighs like this many plain failures
+THROTTLE_PENALTY = 3.0
+# Latency at which a proxy's weight is halved
+LATENCY_REFERENCE = 2.0
+LATENCY_ALPHA = 0.3
+
+STATS_PREFIX = "proxy:stats:"
+QUARANTINE_PREFIX = "proxy:quarantine:"
+
+# YouTube's bot wall ("Sign in to confirm you're not a bot") is an IP block; the age gate is not
+THROTTLE_MARKERS = ("429", "too many requests", "rate limit", "not a bot")
+FAILURE_MARKERS = ("403", "timed out", "timeout", "connection", "proxy", "unable to download webpage",
+                   "tunnel", "ssl", "network is unreachable")
+
+
+def _load_proxies() -> List[str]:
+    proxies = [p.strip() for p in os.getenv("PROXY_URLS", "").split(",") if p.strip()]
+    path = os.getenv("PROXY_LIST_FILE")
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            proxies += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    if not proxies and os.getenv("PROXY_URL"):
+        proxies = [os.getenv("PROXY_URL", "")]
+    return list(dict.fromkeys(proxies))
+
+
+PROXIES = _load_proxies()
+
+
+def proxy_id(proxy: str) -> str:
+    """Stable id that keeps credentials out of Redis keys and logs."""
+    return hashlib.sha1(proxy.encode("utf-8")).hexdigest()[:12]
+
+
+def redact(proxy: str) -> str:
+    parsed = urlparse(proxy)
+    if not parsed.hostname:
+        return proxy_id(proxy)
+    return f"{parsed.scheme}://{parsed.hostname}" + (f":{parsed.port}" if parsed.port else "")
+
+
+_CREDENTIALS = re.compile(r"(\w+://)[^/\s:@]+:[^/\s@]*@")
+
+
+def scrub(message: str) -> str:
+    """message with proxy credentials (scheme://user:pass@) masked, for logs and API errors."""
+    return _CREDENTIALS.sub(r"\1***@", message)
+
+
+def decayed(value: float, elapsed: float, half_life: float = PROXY_HALF_LIFE) -> float:
+    return value * 0.5 ** (max(0.0, elapsed) / half_life)
+
+
+def score(ok: float, fail: float, throttled: float, latency: Optional[float]) -> float:
+    """Selection weight: Laplace-smoothed success rate over latency."""
+    bad = fail + THROTTLE_PENALTY * throttled
+    rate = (ok + 1.0) / (ok + bad + 2.0)
+    return rate / (1.0 + (latency or 0.0) / LATENCY_REFERENCE)
+
+
+def classify(error: Optional[str]) -> Optional[str]:
+    """'throttled', 'failed', or None for errors that say nothing about the proxy."""
+    message = (error or "").lower()
+    if any(marker in message for marker in THROTTLE_MARKERS):
+        return "throttled"
+    if any(marker in message for marker in FAILURE_MARKERS):
+        return "failed"
+    return None
+
+
+def _stats(proxy: str, now: float) -> Dict[str, float]:
+    raw = get_redis().hgetall(STATS_PREFIX + proxy_id(proxy))
+    elapsed = now - float(raw.get("ts", now))
+    return {
+        "ok": decayed(float(raw.get("ok", 0)), elapsed),
+        "fail": decayed(float(raw.get("fail", 0)), elapsed),
+        "throttled": decayed(float(raw.get("throttled", 0)), elapsed),
+        "latency": float(raw["latency"]) if "latency" in raw else None,
+        "streak": int(raw.get("streak", 0)),
+        "quarantines": int(raw.get("quarantines", 0)),
+    }
+
+
+def _weight(stats: Dict[str, Any]) -> float:
+    return score(stats["ok"], stats["fail"], stats["throttled"], stats["latency"])
+
+
+def choose(exclude: Optional[str] = None) -> Optional[str]:
+    """A proxy for the next request (weighted by health), or None to connect directly."""
+    candidates = [p for p in PROXIES if p != exclude] or PROXIES
+    if not candidates:
+        return None
+    try:
+        r = get_redis()
+        pipe = r.pipeline()
+        for proxy in candidates:
+            pipe.pttl(QUARANTINE_PREFIX + proxy_id(proxy))
+        benched = dict(zip(candidates, pipe.execute()))
+        healthy = [p for p in candidates if benched[p] <= 0]
+        if not healthy:
+            # Everything is benched: use the proxy that comes back first
+            return min(candidates, key=lambda p: benched[p])
+        now = time.time()
+        weights = [_weight(_stats(p, now)) for p in healthy]
+        return random.choices(healthy, weights=weights)[0]
+    except Exception as e:
+        logger.warning(f"Proxy health unavailable, picking at random: {e}")
+        return random.choice(candidates)
+
+
+def egress_id(proxy: Optional[str]) -> Optional[str]:
+    """Rate-governor egress key for a proxy (None = this node's own IP)."""
+    return f"proxy-{proxy_id(proxy)}" if proxy else None
+
+
+def report(proxy: Optional[str], error: Optional[str] = None, latency: Optional[float] = None) -> None:
+    """Record the outcome of a request made through proxy (error None = success)."""
+    if not proxy:
+        return
+    outcome = "ok" if error is None else classify(error)
+    if outcome is None:
+        return
+    try:
+        now = time.time()
+        stats = _stats(proxy, now)
+        stats[outcome if outcome != "failed" else "fail"] += 1
+        if latency is not None and outcome == "ok":
+            stats["latency"] = latency if stats["latency"] is None else \
+                (1 - LATENCY_ALPHA) * stats["latency"] + LATENCY_ALPHA * latency
+        stats["streak"] = 0 if outcome == "ok" else stats["streak"] + 1
+
+        pid = proxy_id(proxy)
+        if outcome == "throttled" or stats["streak"] >= PROXY_QUARANTINE_FAILURES:
+            seconds = min(PROXY_QUARANTINE_SECONDS * 2 ** stats["quarantines"], PROXY_QUARANTINE_MAX_SECONDS)
+            get_redis().set(QUARANTINE_PREFIX + pid, outcome, ex=int(seconds))
+            stats["quarantines"] += 1
+            stats["streak"] = 0
+            logger.warning(f"Proxy {redact(proxy)} quarantined for {int(seconds)}s ({outcome})")
+        elif outcome == "ok":
+            stats["quarantines"] = 0
+
+        mapping: Dict[str, Any] = {k: v for k, v in stats.items() if v is not None}
+        mapping["ts"] = now
+        get_redis().hset(STATS_PREFIX + pid, mapping=mapping)
+    except Exception as e:
+        logger.warning(f"Could not record proxy outcome: {e}")
+
+
+def snapshot() -> List[Dict[str, Any]]:
+    """Per-proxy health (credentials redacted), for monitoring."""
+    r = get_redis()
+    now = time.time()
+    pool = []
+    for proxy in PROXIES:
+        stats = _stats(proxy, now)
+        pool.append({
+            "proxy": redact(proxy),
+            "score": round(_weight(stats), 3),
+            "quarantined_for": max(0, r.ttl(QUARANTINE_PREFIX + proxy_id(proxy))),
+            **{k: round(v, 2) if isinstance(v, float) else v for k, v in stats.items()},
+        })
+    return pool
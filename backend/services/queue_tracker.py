@@ -0,0 +1,133 @@
+"""
+Queue position and ETA tracking for download jobs.
+
+Jobs wait in lanes: one per client when fair scheduling is on (the DRR
+virtual queues, each served FIFO), else a single lane.
+
+  queue:pending                  zset  task_id -> enqueue time, every lane (backlog size)
+  queue:lane:<lane>              zset  task_id -> enqueue time, one lane
+  queue:lanes                    set   lanes that may have pending jobs
+  queue:platform                 hash  task_id -> platform
+  queue:job_lane                 hash  task_id -> lane
+  queue:started                  hash  task_id -> start time
+  queue:completions:<platform>   zset  task_id -> finish time, trimmed to a rolling window
+  queue:duration                 hash  platform -> EWMA of job run time in seconds
+
+Position is the ZRANK within the job's own lane (O(log n)). DRR gives every
+non-empty lane a turn per round, so a lane drains at roughly 1/N of the
+platform's recent completion rate; ETA = jobs ahead in the lane at that
+rate + the expected run time for the platform.
+"""
+import os
+import time
+from typing import Any, Dict, Optional
+
+from backend.services.redis_client import get_redis  # type: ignore
+
+PENDING_KEY = "queue:pending"
+LANE_PREFIX = "queue:lane:"
+LANES_KEY = "queue:lanes"
+PLATFORM_KEY = "queue:platform"
+JOB_LANE_KEY = "queue:job_lane"
+STARTED_KEY = "queue:started"
+COMPLETIONS_PREFIX = "queue:completions:"
+DURATION_KEY = "queue:duration"
+
+DEFAULT_LANE = "all"
+THROUGHPUT_WINDOW = int(os.getenv("QUEUE_THROUGHPUT_WINDOW", "300"))  # seconds
+EWMA_ALPHA = 0.2
+DEFAULT_JOB_SECONDS = 30.0
+# Used only until there is throughput history
+ETA_DOWNLOAD_SLOTS = int(os.getenv("ETA_DOWNLOAD_SLOTS", "4"))
+
+
+def eta_seconds(ahead: int, lanes: int, completed: int, job_seconds: float,
+                window: float = THROUGHPUT_WINDOW, slots: int = ETA_DOWNLOAD_SLOTS) -> int:
+    """ETA for a job with `ahead` jobs before it in its lane, sharing service with `lanes` lanes."""
+    lanes = max(1, lanes)
+    if completed:
+        wait = ahead * lanes / (completed / window)
+    else:
+        wait = ahead * lanes * job_seconds / slots
+    return int(wait + job_seconds)
+
+
+def enqueued(task_id: str, platform: str, lane: str = DEFAULT_LANE) -> None:
+    now = time.time()
+    pipe = get_redis().pipeline()
+    pipe.zadd(PENDING_KEY, {task_id: now})
+    pipe.zadd(LANE_PREFIX + lane, {task_id: now})
+    pipe.sadd(LANES_KEY, lane)
+    pipe.hset(PLATFORM_KEY, task_id, platform)
+    pipe.hset(JOB_LANE_KEY, task_id, lane)
+    pipe.execute()
+
+
+def _dequeue(pipe, task_id: str, lane: Optional[str]) -> None:
+    pipe.zrem(PENDING_KEY, task_id)
+    if lane:
+        pipe.zrem(LANE_PREFIX + lane, task_id)
+
+
+def started(task_id: str) -> None:
+    r = get_redis()
+    lane = r.hget(JOB_LANE_KEY, task_id)
+    pipe = r.pipeline()
+    _dequeue(pipe, task_id, lane)
+    pipe.hset(STARTED_KEY, task_id, time.time())
+    pipe.execute()
+
+
+def finished(task_id: str, succeeded: bool = True) -> None:
+    """Record a completion for the job's platform and fold its run time into the platform average."""
+    r = get_redis()
+    now = time.time()
+    platform = r.hget(PLATFORM_KEY, task_id)
+    lane = r.hget(JOB_LANE_KEY, task_id)
+    started_at = r.hget(STARTED_KEY, task_id)
+
+    pipe = r.pipeline()
+    _dequeue(pipe, task_id, lane)
+    pipe.hdel(PLATFORM_KEY, task_id)
+    pipe.hdel(JOB_LANE_KEY, task_id)
+    pipe.hdel(STARTED_KEY, task_id)
+    if platform:
+        completions = COMPLETIONS_PREFIX + platform
+        pipe.zadd(completions, {task_id: now})
+        pipe.zremrangebyscore(completions, 0, now - THROUGHPUT_WINDOW)
+        pipe.expire(completions, THROUGHPUT_WINDOW)
+    pipe.execute()
+
+    if succeeded and platform and started_at:
+        elapsed = now - float(started_at)
+        previous = r.hget(DURATION_KEY, platform)
+        average = elapsed if previous is None else (1 - EWMA_ALPHA) * float(previous) + EWMA_ALPHA * elapsed
+        r.hset(DURATION_KEY, platform, round(average, 2))
+
+
+def _active_lanes(r) -> int:
+    """Lanes with pending jobs; empty ones are dropped from the set."""
+    lanes = list(r.smembers(LANES_KEY))
+    pipe = r.pipeline()
+    for lane in lanes:
+        pipe.zcard(LANE_PREFIX + lane)
+    sizes = pipe.execute()
+    empty = [lane for lane, size in zip(lanes, sizes) if not size]
+    if empty:
+        r.srem(LANES_KEY, *empty)
+    return len(lanes) - len(empty)
+
+
+def estimate(task_id: str) -> Optional[Dict[str, Any]]:
+    """{"queue_position", "eta_seconds"} for a pending job, or None if it isn't queued."""
+    r = get_redis()
+    lane = r.hget(JOB_LANE_KEY, task_id)
+    rank = r.zrank(LANE_PREFIX + lane, task_id) if lane else None
+    if rank is None:
+        return None
+    now = time.time()
+
+    platform = r.hget(PLATFORM_KEY, task_id)
+    job_seconds = float(r.hget(DURATION_KEY, platform) or DEFAULT_JOB_SECONDS) if platform else DEFAULT_JOB_SECONDS
+    completed = r.zcount(COMPLETIONS_PREFIX + platform, now - THROUGHPUT_WINDOW, now) if platform else 0
+    return {"queue_position": rank + 1, "eta_seconds": eta_seconds(rank, _active_lanes(r), completed, job_seconds)}
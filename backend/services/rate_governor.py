@@ -0,0 +1,162 @@
+"""
+Cluster-wide request pacing for the platforms we extract from and download from.
+
+Every extraction and download start takes one token from two Redis token
+buckets: one per platform and one per egress (the node's IP, or the proxy in
+use). Both are checked and charged in a single Lua call, using Redis' own
+clock so nodes with skewed clocks share one bucket correctly. When either is
+empty the caller sleeps for the refill time plus jitter and tries again,
+instead of firing a burst that earns a 429.
+
+  ratelimit:platform:<name>   hash  tokens, ts
+  ratelimit:egress:<id>       hash  tokens, ts
+  ratelimit:stats:<platform>  hash  granted, waited, wait_ms, timeouts
+"""
+import logging
+import os
+import random
+import socket
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from backend.services.redis_client import get_redis  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+# Requests per second : burst
+DEFAULT_RATE_LIMITS = "youtube=2:10,tiktok=1:5,instagram=0.5:3,facebook=1:5,twitter=1:5,other=2:10"
+EGRESS_RATE = float(os.getenv("EGRESS_RATE", "5"))
+EGRESS_BURST = float(os.getenv("EGRESS_BURST", "20"))
+EGRESS_ID = os.getenv("EGRESS_ID") or os.getenv("NODE_NAME") or socket.gethostname()
+RATE_JITTER = float(os.getenv("RATE_JITTER", "0.3"))
+# Longest an API extraction waits for a token before giving up
+RATE_MAX_WAIT = float(os.getenv("RATE_MAX_WAIT", "10"))
+# Downloads are already queued jobs; they can wait longer
+RATE_MAX_WAIT_DOWNLOAD = float(os.getenv("RATE_MAX_WAIT_DOWNLOAD", "300"))
+BUCKET_TTL = 3600
+
+PLATFORM_PREFIX = "ratelimit:platform:"
+EGRESS_PREFIX = "ratelimit:egress:"
+STATS_PREFIX = "ratelimit:stats:"
+
+# KEYS: buckets; ARGV: rate1, burst1, rate2, burst2, ...
+# Takes a token from every bucket and returns 0, or takes nothing and returns the ms to wait.
+_TAKE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local wait = 0
+local levels = {}
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i - 1])
+    -- A bucket that can't hold one token would never grant
+    local burst = math.max(1, tonumber(ARGV[2 * i]))
+    local state = redis.call('hmget', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+    levels[i] = tokens
+    if tokens < 1 then
+        wait = math.max(wait, (1 - tokens) / rate)
+    end
+end
+for i, key in ipairs(KEYS) do
+    local tokens = levels[i]
+    if wait == 0 then
+        tokens = tokens - 1
+    end
+    redis.call('hset', key, 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('expire', key, ARGV[#ARGV])
+end
+return math.ceil(wait * 1000)
+"""
+
+
+def _parse_limits(raw: str) -> Dict[str, Tuple[float, float]]:
+    """RATE_LIMITS="youtube=2:10,tiktok=1:5" -> {platform: (per second, burst)}; burst is at least 1"""
+    limits: Dict[str, Tuple[float, float]] = {}
+    for item in raw.split(","):
+        platform, sep, spec = item.strip().partition("=")
+        if not sep:
+            continue
+        rate, _, burst = spec.partition(":")
+        try:
+            limits[platform.strip()] = (float(rate), max(1.0, float(burst or rate)))
+        except ValueError:
+            logger.warning(f"Ignoring bad rate limit: {item}")
+    return limits
+
+
+RATE_LIMITS = {**_parse_limits(DEFAULT_RATE_LIMITS), **_parse_limits(os.getenv("RATE_LIMITS", ""))}
+
+
+def limits_for(platform: str) -> Tuple[float, float]:
+    return RATE_LIMITS.get(platform) or RATE_LIMITS["other"]
+
+
+def acquire(platform: str, egress: Optional[str] = None, max_wait: float = RATE_MAX_WAIT,
+            on_wait: Optional[Callable[[], None]] = None) -> bool:
+    """
+    Block until both the platform's and the egress' bucket grant a token.
+    Returns False if that would take longer than max_wait (nothing is charged).
+    Fails open when Redis is unavailable.
+    """
+    r = get_redis()
+    rate, burst = limits_for(platform)
+    keys = [PLATFORM_PREFIX + platform, EGRESS_PREFIX + (egress or EGRESS_ID)]
+    args = [rate, burst, EGRESS_RATE, EGRESS_BURST, BUCKET_TTL]
+    stats = STATS_PREFIX + platform
+    deadline = time.time() + max_wait
+    waited_ms = 0
+    while True:
+        try:
+            wait_ms = int(r.eval(_TAKE_SCRIPT, len(keys), *keys, *args))
+        except Exception as e:
+            logger.warning(f"Rate governor unavailable, not pacing {platform}: {e}")
+            return True
+        if not wait_ms:
+            pipe = r.pipeline()
+            pipe.hincrby(stats, "granted", 1)
+            if waited_ms:
+                pipe.hincrby(stats, "waited", 1)
+                pipe.hincrby(stats, "wait_ms", waited_ms)
+            pipe.execute()
+            return True
+        if time.time() + wait_ms / 1000 > deadline:
+            r.hincrby(stats, "timeouts", 1)
+            return False
+        if not waited_ms and on_wait:
+            on_wait()
+        # Jitter so waiters on one bucket don't all wake at the same refill
+        delay = wait_ms * (1 + random.uniform(0, RATE_JITTER))
+        waited_ms += int(delay)
+        time.sleep(delay / 1000)
+
+
+def _level(key: str, rate: float, burst: float, now: float) -> float:
+    tokens, ts = get_redis().hmget(key, "tokens", "ts")
+    if tokens is None:
+        return burst
+    return min(burst, float(tokens) + max(0.0, now - float(ts)) * rate)
+
+
+def snapshot() -> Dict[str, Any]:
+    """Bucket levels and wait statistics per platform, plus this node's egress bucket."""
+    r = get_redis()
+    now = time.time()
+    platforms = {}
+    for platform, (rate, burst) in RATE_LIMITS.items():
+        platforms[platform] = {
+            "rate": rate,
+            "burst": burst,
+            "tokens": round(_level(PLATFORM_PREFIX + platform, rate, burst, now), 2),
+            **{k: int(v) for k, v in r.hgetall(STATS_PREFIX + platform).items()},
+        }
+    return {
+        "platforms": platforms,
+        "egress": {
+            "id": EGRESS_ID,
+            "rate": EGRESS_RATE,
+            "burst": EGRESS_BURST,
+            "tokens": round(_level(EGRESS_PREFIX + EGRESS_ID, EGRESS_RATE, EGRESS_BURST, now), 2),
+        },
+    }
@@ -0,0 +1,19 @@
+"""
+Shared Redis connections for service modules.
+API processes and Celery workers each get one lazily created client per mode.
+"""
+import os
+import redis  # type: ignore
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+_clients: dict = {}
+
+
+def get_redis(binary: bool = False):
+    """Return a process-wide Redis client (str responses unless binary=True)."""
+    client = _clients.get(binary)
+    if client is None:
+        client = redis.from_url(REDIS_URL, decode_responses=not binary)
+        _clients[binary] = client
+    return client
@@ -2,9 +2,13 @@ import yt_dlp  # type: ignore
 import os
 import logging
 import subprocess
-from typing import Dict, Any, Optional
+from typing import Dict, Any
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
 import random
+import time
+
+from backend.services import cookie_pool, info_cache, proxy_pool, rate_governor  # type: ignore
+from backend.services.validators import detect_platform  # type: ignore
 
 logger = logging.getLogger(__name__)
 
@@ -16,36 +20,6 @@ USER_AGENTS = [
 ]
 
 
-def get_platform_cookies(url: str) -> Optional[str]:
-    """Return appropriate cookie file based on platform"""
-    cookie_mapping = {
-        "facebook.com": "cookies_facebook.txt",
-        "fb.watch": "cookies_facebook.txt",
-        "fb.com": "cookies_facebook.txt",
-        "instagram.com": "cookies_instagram.txt",
-        "tiktok.com": "cookies_tiktok.txt",
-        "x.com": "cookies_x.txt",
-        "twitter.com": "cookies_x.txt",
-        "youtube.com": "cookies_youtube.txt",
-        "youtu.be": "cookies_youtube.txt",
-    }
-    
-    for platform, cookie_file in cookie_mapping.items():
-        if platform in url.lower():
-            cookie_path = os.path.join(os.getcwd(), cookie_file)
-            if os.path.exists(cookie_path):
-                logger.info(f"Using cookies for {platform}: {cookie_file}")
-                return cookie_path
-    
-    general_cookies = os.path.join(os.getcwd(), "cookies.txt")
-    if os.path.exists(general_cookies):
-        logger.info("Using general cookies.txt")
-        return general_cookies
-    
-    logger.warning("No cookies found - private/logged-in content may fail")
-    return None
-
-
 def _update_ytdlp() -> None:
     """Keep yt-dlp updated to avoid 'video not available' errors."""
     try:
@@ -92,7 +66,9 @@ def get_video_info(url: str) -> Dict[str, Any]:
     # Clean playlist/radio params from YouTube URLs
     url = _clean_youtube_url(url)
     
-    cookie_path = get_platform_cookies(url)
+    # Rotates through the platform's accounts; the outcome is reported back to the pool
+    jar = cookie_pool.choose(url)
+    cookie_path = jar.path if jar else None
     
     ydl_opts: Dict[str, Any] = {
         'quiet': True,
@@ -116,27 +92,39 @@ def get_video_info(url: str) -> Dict[str, Any]:
     if "tiktok.com" in url:
         ydl_opts['http_headers'] = {'Referer': 'https://www.tiktok.com/'}
 
-    # Proxy Support
-    proxy_url = os.getenv("PROXY_URL")
-    if proxy_url:
-        logger.info(f"Using proxy: {proxy_url}")
-        ydl_opts['proxy'] = proxy_url
+    # Proxy Support: the healthiest proxy from the pool (PROXY_URLS / PROXY_LIST_FILE / PROXY_URL)
+    proxy = proxy_pool.choose()
+    if proxy:
+        logger.info(f"Using proxy: {proxy_pool.redact(proxy)}")
+        ydl_opts['proxy'] = proxy
+    
+    # Pace extractions cluster-wide rather than bursting into a 429
+    if not rate_governor.acquire(detect_platform(url), egress=proxy_pool.egress_id(proxy)):
+        return {"error": "Rate limited. Please try again in a few minutes."}
     
     try:
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
             logger.info(f"Extracting info for: {url}")
+            started = time.time()
             info = ydl.extract_info(url, download=False)
+            proxy_pool.report(proxy, latency=time.time() - started)
+            cookie_pool.report(jar)
             
             if not info:
                 return {"error": "Could not extract video information"}
             
             # Handle playlists
-            if 'entries' in info:
+            is_playlist = 'entries' in info
+            if is_playlist:
                 logger.warning("URL is a playlist, using first video")
                 if not info['entries']:
                     return {"error": "Playlist is empty"}
                 info = info['entries'][0]
             
+            # Let the worker start from this extraction rather than repeating it
+            if not is_playlist:
+                info_cache.store(url, ydl.sanitize_info(info))
+            
             formats = []
             seen_heights = set()
             seen_combinations = set()
@@ -380,8 +368,10 @@ def get_video_info(url: str) -> Dict[str, Any]:
             return result
             
     except yt_dlp.utils.DownloadError as e:
-        error_msg = str(e)
+        error_msg = proxy_pool.scrub(str(e))
         logger.error(f"DownloadError for {url}: {error_msg}")
+        proxy_pool.report(proxy, error_msg)
+        cookie_pool.report(jar, error_msg)
         
         if "Private video" in error_msg:
             return {"error": "This video is private"}
@@ -419,3 +409,62 @@ def verify_ytdlp_installation() -> bool:
     except Exception as e:
         logger.error(f"yt-dlp verification failed: {e}")
         return False
+
+
+def get_playlist_entries(url: str, limit: int = 50) -> Dict[str, Any]:
+    """List the videos of a playlist/channel without resolving their formats (flat extraction)."""
+    jar = cookie_pool.choose(url)
+    cookie_path = jar.path if jar else None
+    
+    ydl_opts: Dict[str, Any] = {
+        'quiet': True,
+        'no_warnings': True,
+        'user_agent': random.choice(USER_AGENTS),
+        'extract_flat': 'in_playlist',
+        'playlistend': limit,
+        'no_color': True,
+        'retries': 3,
+        'socket_timeout': 30,
+        'nocheckcertificate': True,
+    }
+    if cookie_path:
+        ydl_opts['cookiefile'] = cookie_path
+    proxy = proxy_pool.choose()
+    if proxy:
+        ydl_opts['proxy'] = proxy
+    
+    if not rate_governor.acquire(detect_platform(url), egress=proxy_pool.egress_id(proxy)):
+        return {"error": "Rate limited. Please try again in a few minutes."}
+    
+    try:
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            logger.info(f"Expanding playlist: {url}")
+            started = time.time()
+            info = ydl.extract_info(url, download=False)
+            proxy_pool.report(proxy, latency=time.time() - started)
+            cookie_pool.report(jar)
+    except Exception as e:
+        error_msg = proxy_pool.scrub(str(e))
+        logger.error(f"Playlist extraction failed: {error_msg}")
+        proxy_pool.report(proxy, error_msg)
+        cookie_pool.report(jar, error_msg)
+        return {"error": error_msg}
+    
+    if not info or 'entries' not in info:
+        return {"error": "Not a playlist"}
+    
+    entries = []
+    for entry in info.get('entries') or []:
+        if not entry:
+            continue
+        entry_url = entry.get('url') or entry.get('webpage_url')
+        if entry_url and not entry_url.startswith('http') and entry.get('ie_key') == 'Youtube':
+            entry_url = f"https://www.youtube.com/watch?v={entry_url}"
+        if entry_url:
+            entries.append({"url": entry_url, "title": entry.get('title') or ""})
+        if len(entries) >= limit:
+            break
+    
+    if not entries:
+        return {"error": "Playlist is empty"}
+    return {"title": info.get('title') or "playlist", "entries": entries}
@@ -0,0 +1,183 @@
+"""
+Disk-quota-aware admission control for the temp directories.
+
+Every job that will write to temp_downloads, temp_uploads or temp_outputs
+reserves its estimated size here before it is accepted. A reservation is
+refused (StorageFull -> 503 with Retry-After) when it would push
+
+  - the filesystem past STORAGE_HIGH_WATERMARK (fraction of the disk used,
+    counting space already reserved but not yet written), or
+  - the directory past its own quota (STORAGE_QUOTA_<DIR>_MB, optional).
+
+  storage:reserved:<dir>  hash  reservation_id -> "<bytes>:<deadline>"
+
+Reservations carry a deadline so a crashed job can't pin space forever.
+A job's files are named after its reservation id (<id>.mp4, <id>.f137.mp4.part,
+...); what they already hold is on the disk and no longer counts as reserved.
+"""
+import os
+import shutil
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from backend.services.redis_client import get_redis  # type: ignore
+
+MB = 1024 * 1024
+
+TRACKED_DIRS = ("temp_downloads", "temp_uploads", "temp_outputs")
+STORAGE_HIGH_WATERMARK = float(os.getenv("STORAGE_HIGH_WATERMARK", "0.90"))
+STORAGE_RETRY_AFTER = int(os.getenv("STORAGE_RETRY_AFTER", "60"))
+RESERVATION_TTL = int(os.getenv("STORAGE_RESERVATION_TTL", "7200"))
+# Upload handlers finish (and release) within the request; this only covers crashes
+UPLOAD_RESERVATION_TTL = 900
+
+# Merging writes the video and audio parts and then the merged file
+VIDEO_ESTIMATE_FACTOR = 2.0
+DEFAULT_VIDEO_ESTIMATE_MB = 300
+MP3_BYTES_PER_SECOND = 320 * 1000 // 8
+DEFAULT_MP3_ESTIMATE_MB = 20
+
+RESERVED_PREFIX = "storage:reserved:"
+
+# KEYS[1] reservations hash; ARGV: id, bytes, allowed, now, deadline. 1 if reserved.
+_RESERVE_SCRIPT = """
+local reserved = 0
+local entries = redis.call('hgetall', KEYS[1])
+for i = 1, #entries, 2 do
+    local sep = string.find(entries[i + 1], ':')
+    if tonumber(string.sub(entries[i + 1], sep + 1)) < tonumber(ARGV[4]) then
+        redis.call('hdel', KEYS[1], entries[i])
+    else
+        reserved = reserved + tonumber(string.sub(entries[i + 1], 1, sep - 1))
+    end
+end
+if reserved + tonumber(ARGV[2]) > tonumber(ARGV[3]) then
+    return 0
+end
+redis.call('hset', KEYS[1], ARGV[1], ARGV[2] .. ':' .. ARGV[5])
+return 1
+"""
+
+
+class StorageFull(Exception):
+    """Raised when a reservation would cross a watermark; maps to 503 + Retry-After."""
+
+    status_code = 503
+
+    def __init__(self, directory: str, retry_after: int = STORAGE_RETRY_AFTER):
+        self.directory = directory
+        self.retry_after = retry_after
+        self.detail = "Server storage is busy. Please try again shortly."
+        super().__init__(f"{directory}: {self.detail}")
+
+
+def _quota_bytes(directory: str) -> Optional[int]:
+    raw = os.getenv(f"STORAGE_QUOTA_{directory.replace('temp_', '').upper()}_MB")
+    return int(raw) * MB if raw else None
+
+
+def _file_sizes(directory: str) -> Dict[str, int]:
+    """Bytes on disk per file stem (the name up to its first dot, i.e. the job id)."""
+    sizes: Dict[str, int] = {}
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False):
+                    stem = entry.name.split(".", 1)[0]
+                    sizes[stem] = sizes.get(stem, 0) + entry.stat(follow_symlinks=False).st_size
+    except FileNotFoundError:
+        pass
+    return sizes
+
+
+def _reservations(directory: str) -> Dict[str, int]:
+    """Live reservation_id -> reserved bytes."""
+    now = time.time()
+    live = {}
+    for reservation_id, value in get_redis().hgetall(RESERVED_PREFIX + directory).items():
+        size, _, deadline = value.partition(":")
+        if float(deadline) >= now:
+            live[reservation_id] = int(size)
+    return live
+
+
+def _written(reservations: Dict[str, int], sizes: Dict[str, int]) -> int:
+    """Part of the reservations their jobs have already written (and disk usage already counts)."""
+    return sum(min(size, sizes.get(reservation_id, 0)) for reservation_id, size in reservations.items())
+
+
+def reserved_bytes(directory: str) -> int:
+    """Space reserved in a directory and not yet written."""
+    reservations = _reservations(directory)
+    return sum(reservations.values()) - _written(reservations, _file_sizes(directory))
+
+
+def _allowed_bytes(directory: str) -> int:
+    """How many bytes may be reserved in total for this directory right now."""
+    os.makedirs(directory, exist_ok=True)
+    disk = shutil.disk_usage(directory)
+    sizes = _file_sizes(directory)
+    # The reserve script counts reservations in full; what they wrote is in disk.used already
+    written = _written(_reservations(directory), sizes)
+    # Space already reserved in the other dirs counts against the shared disk
+    others = sum(reserved_bytes(d) for d in TRACKED_DIRS if d != directory)
+    allowed = int(disk.total * STORAGE_HIGH_WATERMARK) - disk.used + written - others
+    quota = _quota_bytes(directory)
+    if quota is not None:
+        allowed = min(allowed, quota - sum(sizes.values()) + written)
+    return allowed
+
+
+def reserve(directory: str, size_bytes: int, reservation_id: Optional[str] = None,
+            ttl: int = RESERVATION_TTL) -> str:
+    """Reserve space for a job's output. Returns the reservation id; raises StorageFull."""
+    reservation_id = reservation_id or uuid.uuid4().hex
+    now = time.time()
+    ok = get_redis().eval(_RESERVE_SCRIPT, 1, RESERVED_PREFIX + directory, reservation_id,
+                          max(0, int(size_bytes)), _allowed_bytes(directory), now, now + ttl)
+    if not ok:
+        raise StorageFull(directory)
+    return reservation_id
+
+
+def release(directory: str, reservation_id: Optional[str]) -> None:
+    """Drop a reservation once the job's files are written (or abandoned)."""
+    if reservation_id:
+        get_redis().hdel(RESERVED_PREFIX + directory, reservation_id)
+
+
+def usage() -> Dict[str, Any]:
+    """Per-directory reserved bytes plus overall disk usage, for monitoring."""
+    disk = shutil.disk_usage(".")
+    return {
+        "disk_total": disk.total,
+        "disk_used": disk.used,
+        "high_watermark": STORAGE_HIGH_WATERMARK,
+        "reserved": {d: reserved_bytes(d) for d in TRACKED_DIRS},
+    }
+
+
+def estimate_download_bytes(meta: Optional[Dict[str, Any]], format_id: str) -> int:
+    """Peak disk use of a download, from the /analyze result (size_mb) when it is cached."""
+    meta = meta or {}
+    if format_id == "mp3":
+        duration = meta.get("duration")
+        return int(duration * MP3_BYTES_PER_SECOND * 1.2) if duration else DEFAULT_MP3_ESTIMATE_MB * MB
+
+    sizes = {f.get("id"): f.get("size_mb") for f in meta.get("formats", []) if f.get("size_mb")}
+    if format_id in sizes:
+        size_mb = sizes[format_id]
+    elif format_id == "best" and sizes:
+        size_mb = max(sizes.values())
+    else:
+        size_mb = DEFAULT_VIDEO_ESTIMATE_MB
+    return int(size_mb * MB * VIDEO_ESTIMATE_FACTOR)
+
+
+def upload_estimate(content_length: Optional[str], factor: float = 2.0) -> int:
+    """Uploads are saved and then converted/compressed next to the input: reserve both."""
+    try:
+        return int(int(content_length or 0) * factor)
+    except ValueError:
+        return 0
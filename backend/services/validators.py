@@ -1,5 +1,6 @@
 import re
-from urllib.parse import urlparse
+import hashlib
+from urllib.parse import parse_qsl, urlencode, urlparse
 
 # Strict regex patterns for supported platforms
 PATTERNS = {
@@ -23,6 +24,20 @@ def validate_url(url: str) -> bool:
             
     return False
 
+# Playlist / channel listings accepted by /download/batch
+PLAYLIST_PATTERNS = {
+    "youtube": r"(?:https?:\/\/)?(?:www\.|m\.)?youtube\.com\/(?:playlist\?(?:.*&)?list=[\w-]+|@[\w.-]+(?:\/(?:videos|shorts))?\/?$)",
+    "tiktok": r"(?:https?:\/\/)?(?:www\.)?tiktok\.com\/@[\w.-]+\/?$",
+}
+
+def validate_playlist_url(url: str) -> bool:
+    """
+    Validates if the URL is a playlist or channel listing we can expand.
+    """
+    if not url or len(url) > 500:
+        return False
+    return any(re.search(pattern, url) for pattern in PLAYLIST_PATTERNS.values())
+
 def sanitize_input(input_str: str) -> str:
     """
     Sanitizes string input to prevent XSS and injection attacks.
@@ -40,3 +55,49 @@ def sanitize_input(input_str: str) -> str:
     clean = re.sub(r'data:', '', clean, flags=re.IGNORECASE)
     
     return clean.strip()
+
+# Patterns that capture the platform's own video identifier
+VIDEO_ID_PATTERNS = {
+    "youtube": PATTERNS["youtube"],
+    "twitter": r"(?:twitter\.com|x\.com)\/\w+\/status\/(\d+)",
+    "tiktok": r"tiktok\.com\/@[\w.-]+\/video\/(\d+)",
+    "instagram": r"instagram\.com\/(?:p|reel|tv)\/([\w-]+)",
+    "facebook": r"(?:facebook\.com\/(?:.*\/)?(?:videos|reel)\/|[?&]v=)(\d+)",
+}
+
+# Query parameters that never change which video a URL points to
+TRACKING_PARAMS = {"si", "s", "t", "feature", "igsh", "igshid", "mibextid", "fbclid", "gclid",
+                   "ref", "ref_src", "ref_url", "is_from_webapp", "sender_device", "_r", "_t"}
+
+def detect_platform(url: str) -> str:
+    """
+    Returns the PATTERNS key for the URL's platform, or "other".
+    """
+    for platform, pattern in PATTERNS.items():
+        if re.search(pattern, url or ""):
+            return platform
+    return "other"
+
+def canonical_video_id(url: str) -> str:
+    """
+    Returns a stable "<platform>:<id>" identifier for a video URL.
+    Different URL spellings of the same video (youtu.be vs watch?v=, x.com vs
+    twitter.com, tracking params) map to the same id. Short links that cannot
+    be resolved offline fall back to a hash of the normalized URL, which keeps
+    every non-tracking query parameter.
+    """
+    platform = detect_platform(url)
+    pattern = VIDEO_ID_PATTERNS.get(platform)
+    if pattern:
+        match = re.search(pattern, url)
+        if match:
+            return f"{platform}:{match.group(1)}"
+
+    # The query can be what identifies the video (permalink.php?story_fbid=...): keep it, minus tracking params
+    parsed = urlparse(url.strip())
+    query = sorted((k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+                   if k.lower() not in TRACKING_PARAMS and not k.lower().startswith("utm_"))
+    normalized = f"{parsed.netloc.lower().removeprefix('www.')}{parsed.path.rstrip('/')}"
+    if query:
+        normalized += "?" + urlencode(query)
+    return f"{platform}:{hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]}"
@@ -0,0 +1,109 @@
+"""
+ZIP archives streamed straight into a response.
+
+zipfile writes to an unseekable sink, so each member is emitted with a data
+descriptor and the archive can be sent while it is being built, one chunk at
+a time, without ever existing on disk.
+
+Already-compressed media (video, audio, JPEG/PNG/WebP, Office/zip containers)
+is STORED; deflating it burns CPU for no gain. Everything else is DEFLATEd.
+Members are sized from the file before writing, so zipfile switches to ZIP64
+headers and descriptors for anything near 4 GiB, and for the central
+directory once the archive passes the classic limits.
+"""
+import io
+import os
+import time
+from typing import Iterable, Iterator, Tuple
+import zipfile
+
+CHUNK_SIZE = 256 * 1024
+
+STORED_EXTENSIONS = {
+    ".mp4", ".m4v", ".mkv", ".webm", ".mov", ".avi",
+    ".mp3", ".m4a", ".aac", ".ogg", ".opus", ".flac", ".wma",
+    ".jpg", ".jpeg", ".png", ".webp", ".gif",
+    ".zip", ".gz", ".7z", ".rar",
+    ".docx", ".xlsx", ".pptx", ".pdf",
+}
+
+
+def compression_for(name: str) -> int:
+    """ZIP_STORED for formats that are already compressed, ZIP_DEFLATED otherwise."""
+    if os.path.splitext(name)[1].lower() in STORED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+class _Sink(io.RawIOBase):
+    """Write-only, unseekable buffer that hands out what has been written so far."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+class ZipStream:
+    """Incrementally built archive: add_file() and close() yield the bytes to send."""
+
+    def __init__(self):
+        self._sink = _Sink()
+        self._zip = zipfile.ZipFile(self._sink, "w", allowZip64=True)
+        self._names = set()
+
+    def _unique_name(self, arcname: str) -> str:
+        stem, ext = os.path.splitext(arcname)
+        name, n = arcname, 1
+        while name in self._names:
+            n += 1
+            name = f"{stem} ({n}){ext}"
+        self._names.add(name)
+        return name
+
+    def add_file(self, path: str, arcname: str) -> Iterator[bytes]:
+        # from_file records file_size, which is what makes zipfile pick ZIP64 for large members
+        info = zipfile.ZipInfo.from_file(path, self._unique_name(arcname))
+        with open(path, "rb") as src:
+            yield from self._add(info, iter(lambda: src.read(CHUNK_SIZE), b""))
+
+    def add_stream(self, chunks: Iterable[bytes], arcname: str, size: int) -> Iterator[bytes]:
+        """Add a member from an iterable of bytes (e.g. an object-store download) of known size."""
+        info = zipfile.ZipInfo(self._unique_name(arcname), time.localtime()[:6])
+        info.file_size = size
+        info.external_attr = 0o644 << 16
+        yield from self._add(info, chunks)
+
+    def _add(self, info: zipfile.ZipInfo, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        info.compress_type = compression_for(info.filename)
+        with self._zip.open(info, "w") as dest:
+            for chunk in chunks:
+                dest.write(chunk)
+                data = self._sink.drain()
+                if data:
+                    yield data
+        data = self._sink.drain()
+        if data:
+            yield data
+
+    def close(self) -> bytes:
+        self._zip.close()
+        return self._sink.drain()
+
+
+def stream_zip(files: Iterable[Tuple[str, str]]) -> Iterator[bytes]:
+    """Yield a ZIP of (path, arcname) pairs chunk by chunk."""
+    archive = ZipStream()
+    for path, arcname in files:
+        yield from archive.add_file(path, arcname)
+    yield archive.close()
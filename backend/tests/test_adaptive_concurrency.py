@@ -0,0 +1,52 @@
+import pytest
+
+from backend.services import adaptive_concurrency
+from backend.services.adaptive_concurrency import aimd_step, is_throttle_error, retry_countdown
+
+
+def test_additive_increase_when_saturated():
+    assert aimd_step(4.0, 4, 8e6, 7e6, 2e6, 2e6, 0.0) == 5.0
+
+
+def test_hold_when_slots_not_full():
+    assert aimd_step(4.0, 2, 4e6, 4e6, 2e6, 2e6, 0.0) == 4.0
+
+
+def test_multiplicative_decrease_on_throttling():
+    assert aimd_step(8.0, 8, 8e6, 8e6, 1e6, 1e6, 0.25) == 4.0
+
+
+def test_decrease_when_per_job_speed_collapses():
+    assert aimd_step(8.0, 8, 6e6, 8e6, 0.5e6, 1e6, 0.0) == 4.0
+
+
+def test_limit_never_drops_below_minimum():
+    assert aimd_step(1.0, 1, 0, 0, 0, 0, 1.0) == 1.0
+
+
+def test_throttle_errors_detected():
+    assert is_throttle_error("ERROR: HTTP Error 429: Too Many Requests")
+    assert is_throttle_error("Read timed out")
+    assert not is_throttle_error("ERROR: Video unavailable")
+    assert not is_throttle_error(None)
+
+
+def test_retry_backoff_grows_and_is_capped():
+    assert 7.5 <= retry_countdown(0) <= 15
+    assert 30 <= retry_countdown(2) <= 60
+    assert retry_countdown(20) <= adaptive_concurrency.AIMD_RETRY_MAX
+
+
+def test_acquire_gives_up_when_node_is_full(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    r = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(adaptive_concurrency, "get_redis", lambda: r)
+    monkeypatch.setattr(adaptive_concurrency, "maybe_adjust", lambda: None)
+    monkeypatch.setattr(adaptive_concurrency, "current_limit", lambda: 1)
+    waits = []
+    assert adaptive_concurrency.acquire("a", max_wait=0)
+    assert not adaptive_concurrency.acquire("b", on_wait=lambda: waits.append(1), max_wait=0.2)
+    assert waits == [1]
+    adaptive_concurrency.release("a")
+    assert adaptive_concurrency.acquire("b", max_wait=0)
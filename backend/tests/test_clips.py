@@ -0,0 +1,36 @@
+import pytest
+
+from backend.services.clips import (
+    chapters_from_description, clip_fraction, parse_timestamp, resolve_clip, variant_id,
+)
+from backend.services.download_engine import build_cli_command, build_download_plan
+
+
+def test_parse_timestamp():
+    assert parse_timestamp("90") == 90
+    assert parse_timestamp("1:30") == 90
+    assert parse_timestamp("01:02:03.5") == 3723.5
+    assert parse_timestamp("") is None
+    with pytest.raises(ValueError):
+        parse_timestamp("1:xx")
+
+
+def test_chapter_from_description():
+    description = "Great talk\n0:00 Intro\n(2:15) The main part\n1:05:00 - Q&A\nthanks"
+    chapters = chapters_from_description(description)
+    assert [c["title"] for c in chapters] == ["Intro", "The main part", "Q&A"]
+    assert resolve_clip(chapter="main part", chapters=chapters) == (135, 3900)
+    assert resolve_clip(chapter="q&a", chapters=chapters) == (3900, None)
+    with pytest.raises(ValueError):
+        resolve_clip(chapter="outro", chapters=chapters)
+
+
+def test_clip_is_its_own_variant_and_section():
+    clip = resolve_clip("1:00", "1:30")
+    assert variant_id("best", clip) == "best@60-90"
+    assert variant_id("best", None) == "best"
+    assert clip_fraction(clip, 7200) == pytest.approx(30 / 7200)
+    cmd = build_cli_command(build_download_plan("https://youtu.be/dQw4w9WgXcQ", "best", "t/x.mp4", clip=clip))
+    assert cmd[cmd.index("--download-sections") + 1] == "*60-90"
+    with pytest.raises(ValueError):
+        resolve_clip("2:00", "1:00")
@@ -0,0 +1,52 @@
+import os
+import time
+
+from backend.services import cookie_pool
+from backend.services.cookie_pool import CookiePool, is_account_failure, platform_for
+
+HEADER = "# Netscape HTTP Cookie File\n"
+
+
+def _write_jar(path, name="SID", expires=None):
+    expires = int(time.time()) + 86400 if expires is None else expires
+    path.write_text(HEADER + f".youtube.com\tTRUE\t/\tTRUE\t{expires}\t{name}\tvalue\n")
+
+
+def _no_redis():
+    raise ConnectionError("redis down")
+
+
+def test_platform_for_hosts():
+    assert platform_for("https://youtu.be/dQw4w9WgXcQ") == "youtube"
+    assert platform_for("https://twitter.com/a/status/1") == "x"
+    assert platform_for("https://example.com/v") == "general"
+
+
+def test_only_account_errors_rest_a_jar():
+    assert is_account_failure("ERROR: [youtube] x: Sign in to confirm you're not a bot")
+    assert is_account_failure("ERROR: [instagram] x: Requested content is not available, rate-limit reached or login required")
+    assert is_account_failure("HTTP Error 429: Too Many Requests")
+    assert not is_account_failure("ERROR: [youtube] x: Private video. Sign in if you've been granted access to this video")
+    assert not is_account_failure("ERROR: [youtube] x: Sign in to confirm your age. This video may be inappropriate for some users.")
+    assert not is_account_failure("ERROR: [youtube] x: Video unavailable")
+    assert not is_account_failure(None)
+
+
+def test_pool_rotates_accounts_and_skips_expired_jars(tmp_path, monkeypatch):
+    monkeypatch.setattr(cookie_pool, "get_redis", _no_redis)
+    _write_jar(tmp_path / "cookies_youtube.txt")
+    _write_jar(tmp_path / "cookies_youtube_alt.txt")
+    _write_jar(tmp_path / "cookies_youtube_old.txt", expires=1)
+    pool = CookiePool(str(tmp_path))
+    picks = {pool.choose("https://youtu.be/dQw4w9WgXcQ").account for _ in range(4)}
+    assert picks == {"youtube:cookies_youtube", "youtube:cookies_youtube_alt"}
+
+
+def test_pool_reloads_new_accounts(tmp_path, monkeypatch):
+    monkeypatch.setattr(cookie_pool, "get_redis", _no_redis)
+    pool = CookiePool(str(tmp_path))
+    assert pool.choose("https://youtu.be/dQw4w9WgXcQ") is None
+    os.makedirs(tmp_path / "cookies" / "youtube")
+    _write_jar(tmp_path / "cookies" / "youtube" / "main.txt")
+    pool.reload(force=True)
+    assert pool.choose("https://youtu.be/dQw4w9WgXcQ").account == "youtube:main"
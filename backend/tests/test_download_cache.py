@@ -0,0 +1,94 @@
+import os
+
+import pytest
+
+from backend.services import download_cache
+
+URL = "https://youtu.be/dQw4w9WgXcQ"
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    r = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(download_cache, "get_redis", lambda: r)
+    monkeypatch.setattr(download_cache, "CACHE_DIR", tmp_path / "cache")
+    return r
+
+
+def _file(tmp_path, name, size=10):
+    path = tmp_path / name
+    path.write_bytes(b"x" * size)
+    return str(path)
+
+
+def test_missing_file_of_another_node_is_only_a_miss(cache, tmp_path):
+    key = download_cache.store(URL, "best", _file(tmp_path, "a.mp4"))
+    cache.hset(download_cache.ENTRY_PREFIX + key, "node", "other-node")
+    os.remove(cache.hget(download_cache.ENTRY_PREFIX + key, "path"))
+    assert download_cache.lookup(URL, "best") is None
+    # The owner's entry and byte count are left alone
+    assert cache.exists(download_cache.ENTRY_PREFIX + key)
+    assert int(cache.get(download_cache.BYTES_KEY)) == 10
+
+
+def test_missing_local_file_drops_the_entry(cache, tmp_path):
+    key = download_cache.store(URL, "best", _file(tmp_path, "a.mp4"))
+    os.remove(cache.hget(download_cache.ENTRY_PREFIX + key, "path"))
+    assert download_cache.lookup(URL, "best") is None
+    assert not cache.exists(download_cache.ENTRY_PREFIX + key)
+    assert int(cache.get(download_cache.BYTES_KEY)) == 0
+
+
+def test_store_keeps_the_first_writer(cache, tmp_path):
+    first = download_cache.store(URL, "best", _file(tmp_path, "a.mp4", 10))
+    # A second job finishing the same video/format loses the hsetnx claim
+    second = download_cache.store("https://www.youtube.com/watch?v=dQw4w9WgXcQ", "best", _file(tmp_path, "b.mp4", 20))
+    assert first == second
+    assert int(cache.get(download_cache.BYTES_KEY)) == 10
+    assert [p.name for p in (tmp_path / "cache").iterdir()] == [f"{first}.mp4"]
+
+
+def test_exists_does_not_count_a_hit(cache, tmp_path):
+    key = download_cache.store(URL, "best", _file(tmp_path, "a.mp4"))
+    assert download_cache.exists(URL, "best")
+    assert not download_cache.exists(URL, "mp3")
+    assert cache.hget(download_cache.ENTRY_PREFIX + key, "hits") == "0"
+    assert cache.zscore(download_cache.LFU_KEY, key) == 0
+
+
+def test_materialize_links_the_file_and_unpins(cache, tmp_path):
+    key = download_cache.store(URL, "best", _file(tmp_path, "a.mp4", 2048))
+    result = download_cache.materialize(URL, "best", str(tmp_path / "out" / "task"))
+    assert result["cached"] and result["path"].endswith("task.mp4")
+    assert os.path.getsize(result["path"]) == 2048
+    assert cache.hget(download_cache.ENTRY_PREFIX + key, "refs") == "0"
+    assert cache.hget(download_cache.ENTRY_PREFIX + key, "hits") == "1"
+    assert download_cache.materialize(URL, "mp3", str(tmp_path / "out" / "miss")) is None
+
+
+def test_acquire_pins_against_eviction(cache, tmp_path, monkeypatch):
+    monkeypatch.setattr(download_cache, "CACHE_MAX_BYTES", 15)
+    pinned = download_cache.store(URL, "best", _file(tmp_path, "a.mp4", 10))
+    download_cache.acquire(pinned)
+    download_cache.store(URL, "mp3", _file(tmp_path, "a.mp3", 10))
+    assert cache.exists(download_cache.ENTRY_PREFIX + pinned)
+    # The unpinned newcomer went instead
+    assert not download_cache.exists(URL, "mp3")
+    download_cache.release(pinned)
+    assert cache.hget(download_cache.ENTRY_PREFIX + pinned, "refs") == "0"
+
+
+@pytest.mark.parametrize("policy, evicted", [("lru", "popular"), ("lfu", "recent")])
+def test_evict_follows_the_policy(cache, tmp_path, monkeypatch, policy, evicted):
+    monkeypatch.setattr(download_cache, "CACHE_POLICY", policy)
+    download_cache.store(URL, "popular", _file(tmp_path, "p.mp4"))
+    download_cache.store(URL, "recent", _file(tmp_path, "r.mp4"))
+    for _ in range(3):
+        download_cache.lookup(URL, "popular")
+    download_cache.lookup(URL, "recent")
+    # LRU drops the least recently read entry, LFU the least read one
+    monkeypatch.setattr(download_cache, "CACHE_MAX_BYTES", 15)
+    assert download_cache.evict() == 1
+    assert not download_cache.exists(URL, evicted)
+    assert int(cache.get(download_cache.BYTES_KEY)) == 10
@@ -0,0 +1,45 @@
+from backend.services.download_engine import (
+    build_cli_command, build_download_plan, build_stream_command, build_ydl_options, limit_connections, plan_connections,
+)
+
+
+def test_youtube_plan_downloads_fragments_in_parallel():
+    plan = build_download_plan("https://youtu.be/dQw4w9WgXcQ", "best", "temp_downloads/x.mp4")
+    assert plan["concurrent_fragments"] == 8
+    assert build_ydl_options(plan)["concurrent_fragment_downloads"] == 8
+    cmd = build_cli_command(plan)
+    assert cmd[cmd.index("-N") + 1] == "8"
+
+
+def test_governor_budget_scales_plan_down():
+    plan = build_download_plan("https://youtu.be/dQw4w9WgXcQ", "mp3", "temp_downloads/x.mp3")
+    limit_connections(plan, 3)
+    assert plan_connections(plan) == 3
+
+
+def test_single_connection_plan_omits_fragment_flag():
+    plan = build_download_plan("https://www.tiktok.com/@a/video/123", "best", "temp_downloads/x.mp4")
+    assert plan["concurrent_fragments"] == 1
+    assert "-N" not in build_cli_command(plan)
+    assert "concurrent_fragment_downloads" not in build_ydl_options(plan)
+
+
+def test_cached_info_json_replaces_url():
+    plan = build_download_plan("https://youtu.be/dQw4w9WgXcQ", "best", "temp_downloads/x.mp4")
+    plan["info_json"] = "temp_downloads/x.info.json"
+    cmd = build_cli_command(plan)
+    assert cmd[cmd.index("--load-info-json") + 1] == "temp_downloads/x.info.json"
+    assert plan["url"] not in cmd
+
+
+def test_codec_check_only_for_non_youtube():
+    assert build_download_plan("https://youtu.be/dQw4w9WgXcQ", "313", "temp_downloads/x.mp4")["codec_check"] is False
+    assert build_download_plan("https://www.tiktok.com/@a/video/123", "best", "temp_downloads/x.mp4")["codec_check"]
+    assert build_download_plan("https://www.tiktok.com/@a/video/123", "mp3", "temp_downloads/x.mp3")["codec_check"] is False
+
+
+def test_stream_command_uses_cookie_jar():
+    cmd = build_stream_command("https://www.instagram.com/reel/Cabc_123/", "best", cookiefile="cookies_instagram.txt")
+    assert cmd[cmd.index("--cookies") + 1] == "cookies_instagram.txt"
+    assert cmd[-1] == "https://www.instagram.com/reel/Cabc_123/"
+    assert "--cookies" not in build_stream_command("https://youtu.be/dQw4w9WgXcQ", "best")
@@ -0,0 +1,61 @@
+import os
+import time
+
+import pytest
+
+from backend.services import expiry_index
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    r = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(expiry_index, "get_redis", lambda: r)
+    monkeypatch.chdir(tmp_path)
+    for directory in expiry_index.TRACKED_DIRS:
+        os.makedirs(directory)
+    return r
+
+
+def _touch(path, age=0):
+    with open(path, "wb") as f:
+        f.write(b"x")
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+    return path
+
+
+def test_register_moves_the_deadline(index):
+    path = _touch("temp_downloads/a.mp4")
+    expiry_index.register(path, ttl=10)
+    first = index.zscore(expiry_index.INDEX_KEY, os.path.abspath(path))
+    expiry_index.register(path, ttl=100)
+    assert index.zscore(expiry_index.INDEX_KEY, os.path.abspath(path)) > first + 80
+
+
+def test_reap_removes_only_expired_files(index):
+    old = _touch("temp_downloads/old.mp4")
+    fresh = _touch("temp_downloads/fresh.mp4")
+    expiry_index.register(old, ttl=-1)
+    expiry_index.register(fresh, ttl=3600)
+    assert expiry_index.reap(batch=1) == 1
+    assert not os.path.exists(old) and os.path.exists(fresh)
+    assert index.zcard(expiry_index.INDEX_KEY) == 1
+
+
+def test_reap_never_deletes_outside_tracked_dirs(index):
+    outside = _touch("keep.txt")
+    expiry_index.register(outside, ttl=-1)
+    assert expiry_index.reap() == 0
+    assert os.path.exists(outside)
+    assert index.zcard(expiry_index.INDEX_KEY) == 0
+
+
+def test_sweep_removes_old_unregistered_leftovers(index):
+    leftover = _touch("temp_downloads/x.mp4.part", age=3600)
+    leased = _touch("temp_downloads/leased.mp4", age=3600)
+    recent = _touch("temp_downloads/y.mp4.part", age=60)
+    expiry_index.register(leased, ttl=3600)
+    assert expiry_index.sweep_untracked(max_age=1800) == 1
+    assert not os.path.exists(leftover)
+    assert os.path.exists(leased) and os.path.exists(recent)
@@ -0,0 +1,28 @@
+from backend.services.fair_scheduler import _parse_weights, drr_schedule
+
+
+def test_drr_interleaves_clients():
+    picks, active, _, _ = drr_schedule(["a", "b"], {"a": 5, "b": 2}, {}, capacity=4)
+    assert picks == ["a", "b", "a", "b"]
+    assert active == ["a"]
+
+
+def test_drr_respects_weights():
+    picks, _, _, _ = drr_schedule(["a", "b"], {"a": 10, "b": 10}, {}, capacity=8, weights={"a": 3})
+    assert picks == ["a", "a", "a", "b", "a", "a", "a", "b"]
+
+
+def test_drr_resumes_interrupted_turn_without_new_quantum():
+    picks, active, deficits, current = drr_schedule(["a", "b"], {"a": 5, "b": 5}, {}, capacity=2, weights={"a": 3})
+    assert picks == ["a", "a"] and current == "a"
+    picks, _, _, _ = drr_schedule(active, {"a": 3, "b": 5}, deficits, capacity=2, current=current, weights={"a": 3})
+    assert picks == ["a", "b"]
+
+
+def test_drr_fractional_weight_accumulates():
+    picks, _, _, _ = drr_schedule(["a", "b"], {"a": 4, "b": 4}, {}, capacity=3, weights={"a": 0.5})
+    assert picks == ["b", "a", "b"]
+
+
+def test_parse_weights_skips_bad_entries():
+    assert _parse_weights("1.2.3.4=3, 5.6.7.8=x,junk") == {"1.2.3.4": 3.0}
@@ -0,0 +1,23 @@
+import pytest
+from backend.services.file_delivery import parse_range, RangeNotSatisfiable
+
+
+def test_no_range_sends_whole_file():
+    assert parse_range(None, 1000) is None
+    assert parse_range("bytes=0-10,20-30", 1000) is None
+    assert parse_range("items=0-10", 1000) is None
+
+def test_explicit_and_open_ranges():
+    assert parse_range("bytes=0-499", 1000) == (0, 499)
+    assert parse_range("bytes=500-", 1000) == (500, 999)
+    assert parse_range("bytes=900-5000", 1000) == (900, 999)
+
+def test_suffix_range():
+    assert parse_range("bytes=-100", 1000) == (900, 999)
+    assert parse_range("bytes=-5000", 1000) == (0, 999)
+
+def test_unsatisfiable_range():
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=1000-", 1000)
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=50-10", 1000)
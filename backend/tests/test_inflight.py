@@ -0,0 +1,56 @@
+import pytest
+
+from backend.services import inflight
+
+URL = "https://youtu.be/dQw4w9WgXcQ"
+
+
+@pytest.fixture
+def r(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(inflight, "get_redis", lambda: client)
+    return client
+
+
+def test_first_claim_leads_and_later_ones_see_the_leader(r):
+    assert inflight.claim(URL, "best", "a") is None
+    assert inflight.claim("https://www.youtube.com/watch?v=dQw4w9WgXcQ", "best", "b") == "a"
+    assert inflight.claim(URL, "mp3", "c") is None
+
+
+def test_attach_resolves_to_the_leader(r):
+    inflight.attach("b", "a")
+    assert inflight.resolve("b") == "a"
+    assert inflight.resolve("a") == "a"
+
+
+def test_finish_only_clears_its_own_claim(r):
+    inflight.claim(URL, "best", "a")
+    inflight.finish(URL, "best", "someone-else")
+    assert inflight.current_leader(URL, "best") == "a"
+    inflight.finish(URL, "best", "a")
+    assert inflight.current_leader(URL, "best") is None
+
+
+def test_join_attaches_to_a_running_leader(r):
+    inflight.claim(URL, "best", "a")
+    assert inflight.join(URL, "best", "b", lambda leader: "STARTED") == "a"
+    assert inflight.resolve("b") == "a"
+
+
+@pytest.mark.parametrize("state", ["FAILURE", "REVOKED", "SUCCESS"])
+def test_join_takes_over_from_an_ended_leader(r, state):
+    inflight.claim(URL, "best", "dead")
+    assert inflight.join(URL, "best", "b", lambda leader: state) is None
+    assert inflight.current_leader(URL, "best") == "b"
+    assert inflight.resolve("b") == "b"
+
+
+def test_takeover_loses_to_a_newer_leader(r):
+    inflight.claim(URL, "best", "dead")
+    assert inflight.takeover(URL, "best", "b", "dead")
+    # A second request that also saw "dead" must not replace "b"
+    assert not inflight.takeover(URL, "best", "c", "dead")
+    assert inflight.join(URL, "best", "c", lambda leader: "FAILURE" if leader == "dead" else "STARTED") == "b"
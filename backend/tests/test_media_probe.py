@@ -0,0 +1,10 @@
+from backend.services.media_probe import build_audio_extract_command
+
+
+def test_audio_extract_drops_video_and_encodes_mp3():
+    cmd = build_audio_extract_command("cache/abc.mp4", "temp_downloads/t.mp3", "/opt/ffmpeg/bin")
+    assert cmd[0] == "/opt/ffmpeg/bin/ffmpeg"
+    assert cmd[cmd.index("-map") + 1] == "0:a:0"
+    assert "-vn" in cmd
+    assert cmd[cmd.index("-c:a") + 1] == "libmp3lame"
+    assert cmd[-1] == "temp_downloads/t.mp3"
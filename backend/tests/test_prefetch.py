@@ -0,0 +1,11 @@
+from backend.services.prefetch import should_speculate
+
+
+def test_speculates_while_gathering_samples():
+    assert should_speculate(issued=5, hits=0, min_samples=20, roll=0.99)
+
+
+def test_stops_when_hit_rate_is_low_except_for_exploration():
+    assert should_speculate(issued=100, hits=40, min_hit_rate=0.3, roll=0.99)
+    assert not should_speculate(issued=100, hits=10, min_hit_rate=0.3, explore_rate=0.05, roll=0.5)
+    assert should_speculate(issued=100, hits=10, min_hit_rate=0.3, explore_rate=0.05, roll=0.01)
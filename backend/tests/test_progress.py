@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from backend.services import progress
+from backend.services.progress import ProgressHub
+
+
+@pytest.fixture
+def server(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    import redis.asyncio as aioredis
+
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(aioredis, "from_url", lambda url, **kw: fakeredis.FakeAsyncRedis(server=server, **kw))
+    monkeypatch.setattr(progress, "get_redis", lambda: fakeredis.FakeRedis(server=server, decode_responses=True))
+    return server
+
+
+async def _next(queue):
+    return await asyncio.wait_for(queue.get(), 2)
+
+
+def test_hub_fans_out_to_every_subscriber_of_a_task(server):
+    async def scenario():
+        hub = ProgressHub()
+        first, second = await hub.subscribe("t1"), await hub.subscribe("t1")
+        other = await hub.subscribe("t2")
+        progress.publish("t1", {"progress": 40})
+        assert await _next(first) == {"progress": 40}
+        assert await _next(second) == {"progress": 40}
+        assert other.empty()
+        await hub.unsubscribe("t1", first)
+        progress.publish("t1", {"progress": 80})
+        assert await _next(second) == {"progress": 80}
+        assert first.empty()
+        await hub.close()
+
+    asyncio.run(scenario())
+
+
+def test_hub_restart_resubscribes_and_closes_the_old_connection(server):
+    async def scenario():
+        hub = ProgressHub()
+        queue = await hub.subscribe("t1")
+        old_client, old_pubsub = hub._client, hub._pubsub
+        # The reader dies (e.g. cancelled on a broken connection); the next subscribe restarts it
+        hub._reader.cancel()
+        await asyncio.sleep(0)
+        await hub.subscribe("t2")
+        assert hub._pubsub is not old_pubsub and hub._client is not old_client
+        assert old_pubsub.connection is None
+        progress.publish("t1", {"progress": 10})
+        assert await _next(queue) == {"progress": 10}
+        await hub.close()
+        assert hub._pubsub is None
+
+    asyncio.run(scenario())
+
+
+def test_publish_keeps_latest_event_and_replay_stream(server):
+    progress.publish("t1", {"progress": 10})
+    progress.publish("t1", {"status": "Finished", "progress": 100})
+    assert progress.last("t1") == {"status": "Finished", "progress": 100}
+    assert progress.is_terminal(progress.last("t1"))
+    assert progress.get_redis().xlen(progress.STREAM_PREFIX + "t1") == 2
@@ -0,0 +1,29 @@
+import pytest
+
+from backend.services import queue_tracker
+from backend.services.queue_tracker import eta_seconds
+
+
+def test_eta_shares_throughput_between_lanes():
+    # 60 completions in 300 s = 0.2/s; with 3 lanes this lane drains at 1/15 per second
+    assert eta_seconds(2, 3, 60, 10.0, window=300) == 40
+    assert eta_seconds(2, 1, 60, 10.0, window=300) == 20
+    # No history yet: fall back to the platform's run time over the download slots
+    assert eta_seconds(4, 1, 0, 30.0, slots=4) == 60
+
+
+def test_position_is_within_the_clients_lane(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    r = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(queue_tracker, "get_redis", lambda: r)
+    for i in range(3):
+        queue_tracker.enqueued(f"flood-{i}", "youtube", "203.0.113.7")
+    queue_tracker.enqueued("mine", "tiktok", "198.51.100.2")
+    assert queue_tracker.estimate("mine")["queue_position"] == 1
+    assert queue_tracker.estimate("flood-2")["queue_position"] == 3
+
+    queue_tracker.started("flood-0")
+    queue_tracker.finished("flood-0")
+    assert queue_tracker.estimate("flood-2")["queue_position"] == 2
+    assert r.zcard("queue:completions:youtube") == 1
+    assert queue_tracker.estimate("flood-0") is None
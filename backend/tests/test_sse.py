@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+
+@pytest.fixture
+def app(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    from fastapi.testclient import TestClient
+
+    import backend.main as main
+    from backend.services import inflight, progress
+
+    server = fakeredis.FakeServer()
+    sync_r = fakeredis.FakeRedis(server=server, decode_responses=True)
+    monkeypatch.setattr(progress, "get_redis", lambda: sync_r)
+    monkeypatch.setattr(inflight, "get_redis", lambda: sync_r)
+    monkeypatch.setattr(main, "async_r", fakeredis.FakeAsyncRedis(server=server, decode_responses=True))
+    with TestClient(main.app) as client:
+        yield client, progress, sync_r
+
+
+def _events(body: str):
+    """(id, data) of every SSE event in a response body."""
+    parsed = []
+    for block in body.split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line and not line.startswith(":"))
+        if "data" in fields:
+            parsed.append((fields.get("id"), json.loads(fields["data"])))
+    return parsed
+
+
+def test_sse_replays_only_events_after_last_event_id(app):
+    client, progress, r = app
+    for event in ({"progress": 10}, {"progress": 50}, {"status": "Finished", "progress": 100}):
+        progress.publish("job-1", event)
+    first_id = r.xrange(progress.STREAM_PREFIX + "job-1")[0][0]
+
+    full = _events(client.get("/download/events/job-1").text)
+    assert [e["progress"] for _, e in full] == [10, 50, 100]
+
+    resumed = _events(client.get("/download/events/job-1", headers={"Last-Event-ID": first_id}).text)
+    assert [e["progress"] for _, e in resumed] == [50, 100]
+    assert resumed[-1][1]["task_id"] == "job-1"
+    assert all(event_id for event_id, _ in resumed)
@@ -0,0 +1,63 @@
+import time
+
+import pytest
+
+from backend.services.storage_accountant import MB, estimate_download_bytes, upload_estimate
+
+META = {
+    "duration": 100,
+    "formats": [
+        {"id": "18", "size_mb": 10.0},
+        {"id": "137", "size_mb": 50.0},
+        {"id": "mp3"},
+    ],
+}
+
+
+def test_estimate_uses_format_size_with_merge_headroom():
+    assert estimate_download_bytes(META, "18") == 20 * MB
+
+
+def test_best_uses_largest_listed_format():
+    assert estimate_download_bytes(META, "best") == 100 * MB
+
+
+def test_mp3_estimate_from_duration():
+    assert estimate_download_bytes(META, "mp3") == int(100 * 40000 * 1.2)
+
+
+def test_unknown_metadata_falls_back_to_default():
+    assert estimate_download_bytes(None, "best") > 0
+    assert estimate_download_bytes(None, "mp3") > 0
+
+
+def test_upload_estimate():
+    assert upload_estimate("1000") == 2000
+    assert upload_estimate(None) == 0
+    assert upload_estimate("junk") == 0
+
+
+def test_bytes_a_job_already_wrote_are_not_counted_twice(tmp_path, monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    from collections import namedtuple
+
+    from backend.services import storage_accountant
+    from backend.services.storage_accountant import StorageFull
+
+    r = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(storage_accountant, "get_redis", lambda: r)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(storage_accountant, "STORAGE_HIGH_WATERMARK", 0.9)
+    # 1000-byte disk; 600 used, 300 of it by job-1 which reserved 400 (100 still to come)
+    Usage = namedtuple("Usage", "total used free")
+    monkeypatch.setattr(storage_accountant.shutil, "disk_usage", lambda path: Usage(1000, 600, 400))
+    (tmp_path / "temp_downloads").mkdir()
+    (tmp_path / "temp_downloads" / "job-1.f137.mp4.part").write_bytes(b"x" * 300)
+    r.hset(storage_accountant.RESERVED_PREFIX + "temp_downloads", "job-1", f"400:{time.time() + 60}")
+
+    assert storage_accountant.reserved_bytes("temp_downloads") == 100
+    # 900 allowed - 600 used - 100 outstanding leaves 200
+    storage_accountant.reserve("temp_downloads", 150, reservation_id="job-2")
+    with pytest.raises(StorageFull):
+        storage_accountant.reserve("temp_downloads", 100, reservation_id="job-3")
@@ -0,0 +1,34 @@
+from backend.services.validators import canonical_video_id, detect_platform, validate_playlist_url
+
+
+def test_youtube_url_spellings_share_id():
+    assert canonical_video_id("https://www.youtube.com/watch?v=dQw4w9WgXcQ") == "youtube:dQw4w9WgXcQ"
+    assert canonical_video_id("https://youtu.be/dQw4w9WgXcQ?si=abc") == "youtube:dQw4w9WgXcQ"
+    assert canonical_video_id("https://youtube.com/shorts/dQw4w9WgXcQ") == "youtube:dQw4w9WgXcQ"
+
+def test_twitter_and_x_share_id():
+    assert canonical_video_id("https://twitter.com/user/status/12345") == "twitter:12345"
+    assert canonical_video_id("https://x.com/user/status/12345?s=20") == "twitter:12345"
+
+def test_short_links_fall_back_to_hash():
+    a = canonical_video_id("https://vm.tiktok.com/ZMabc123/")
+    b = canonical_video_id("https://vm.tiktok.com/ZMabc123")
+    assert a == b
+    assert a.startswith("tiktok:")
+
+def test_fallback_keeps_identifying_query_params():
+    a = canonical_video_id("https://www.facebook.com/permalink.php?story_fbid=111&id=9")
+    b = canonical_video_id("https://www.facebook.com/permalink.php?story_fbid=222&id=9")
+    assert a != b
+    # Parameter order and tracking parameters don't matter
+    assert a == canonical_video_id("https://facebook.com/permalink.php?id=9&story_fbid=111&fbclid=xyz&utm_source=share")
+
+def test_detect_platform():
+    assert detect_platform("https://www.instagram.com/reel/Cabc_123/") == "instagram"
+    assert detect_platform("https://example.com/video") == "other"
+
+
+def test_playlist_urls():
+    assert validate_playlist_url("https://www.youtube.com/playlist?list=PL590L5WQmH8fJ54F369BLDSqIwcs-TCfs")
+    assert validate_playlist_url("https://www.youtube.com/@somechannel/videos")
+    assert not validate_playlist_url("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
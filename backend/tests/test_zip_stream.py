@@ -0,0 +1,33 @@
+import io
+import zipfile
+
+from backend.services.zip_stream import stream_zip
+
+
+def test_streamed_zip_round_trips(tmp_path):
+    first = tmp_path / "a.mp4"
+    first.write_bytes(b"\x00" * 300_000)
+    second = tmp_path / "b.mp3"
+    second.write_bytes(b"ID3" + b"\x01" * 1000)
+
+    data = b"".join(stream_zip([(str(first), "video.mp4"), (str(second), "video.mp4")]))
+
+    archive = zipfile.ZipFile(io.BytesIO(data))
+    assert archive.testzip() is None
+    assert archive.namelist() == ["video.mp4", "video (2).mp4"]
+    assert archive.read("video.mp4") == first.read_bytes()
+
+
+def test_media_is_stored_and_documents_are_deflated(tmp_path):
+    video = tmp_path / "clip.mp4"
+    video.write_bytes(b"\x00" * 10_000)
+    text = tmp_path / "notes.txt"
+    text.write_bytes(b"hello " * 10_000)
+
+    data = b"".join(stream_zip([(str(video), video.name), (str(text), text.name)]))
+
+    archive = zipfile.ZipFile(io.BytesIO(data))
+    assert archive.getinfo("clip.mp4").compress_type == zipfile.ZIP_STORED
+    notes = archive.getinfo("notes.txt")
+    assert notes.compress_type == zipfile.ZIP_DEFLATED
+    assert notes.compress_size < notes.file_size
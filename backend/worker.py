@@ -10,10 +10,20 @@ except ImportError:
         pass  # Skip if not using Python 3.13
 
 from celery import Celery # type: ignore
+from celery.exceptions import Ignore, Retry # type: ignore
+from celery.signals import task_revoked, task_success, task_failure # type: ignore
 
 from dotenv import load_dotenv # type: ignore
 load_dotenv()
 
+from backend.services import adaptive_concurrency, batch, connection_governor, cookie_pool, download_cache, expiry_index, fair_scheduler, inflight, info_cache, object_store, prefetch, progress, proxy_pool, queue_tracker, rate_governor, storage_accountant # type: ignore
+from backend.services.download_engine import build_download_plan, limit_connections, plan_connections, run_download # type: ignore
+from backend.services.file_delivery import media_type_for, renew_lease # type: ignore
+from backend.services.clips import clip_fraction, variant_id # type: ignore
+from backend.services.redis_client import get_redis # type: ignore
+from backend.services.validators import detect_platform # type: ignore
+from backend.services.media_probe import probe_codecs, decide_codec_policy, apply_codec_policy, extract_audio # type: ignore
+
 # rnnoise-python is not on PyPI — we use FFmpeg's built-in arnndn filter instead
 # (same underlying RNNoise neural network, no extra Python dependencies needed)
 HAS_RNNOISE = True  # Always available via FFmpeg
@@ -42,6 +52,18 @@ celery = Celery('worker',
                 broker=os.getenv("REDIS_URL", "redis://localhost:6379/0"), 
                 backend=os.getenv("REDIS_URL", "redis://localhost:6379/0")) # type: ignore
 
+# Network-bound downloads and CPU-bound ffmpeg transcodes run on separate queues
+# so each can get its own worker pool, e.g.:
+#   celery -A worker.celery worker -Q download --concurrency=16
+#   celery -A worker.celery worker -Q postprocess --concurrency=$(nproc)
+# With PREFETCH_ENABLED=1, speculative downloads get a small pool of their own:
+#   celery -A worker.celery worker -Q prefetch --concurrency=2
+DOWNLOAD_QUEUE = os.getenv("DOWNLOAD_QUEUE", "download")
+POSTPROCESS_QUEUE = os.getenv("POSTPROCESS_QUEUE", "postprocess")
+
+# Jobs are long and uneven; don't let one slot hoard queued work
+celery.conf.worker_prefetch_multiplier = int(os.getenv("CELERY_PREFETCH_MULTIPLIER", "1"))
+
 def get_ffmpeg_location():
     """
     FIXED FOR DIGITAL OCEAN / LINUX HOSTING
@@ -79,127 +101,101 @@ def get_ffmpeg_location():
 # No longer runs pip install — uses yt-dlp's own self-update mechanism instead
 
 @celery.task(bind=True)
-def download_video_task(self, url: str, format_id: str, output_path: str):
+def download_video_task(self, url: str, format_id: str, output_path: str, with_audio: bool = False, clip=None,
+                        speculative: bool = False, derive_audio: bool = True):
     """
-    FIXED: Complete working version with proper return values
+    Network-bound stage of a download (download queue). Transcodes and MP3
+    encodes are handed off to postprocess_video_task on the postprocess queue.
+    with_audio also cuts the MP3 from the finished video into the cache; clip
+    ([start, end] seconds) fetches only that section. speculative marks a
+    prefetch, which only claims the in-flight slot once it actually starts.
+    derive_audio=False fetches an MP3 even if a cached video could be cut.
     """
+    handed_off = False
+    variant = variant_id(format_id, clip)
     try:
+        queue_tracker.started(self.request.id)
+        if speculative and inflight.claim(url, variant, self.request.id):
+            # A real request started this download while the prefetch was queued
+            prefetch.unclaim(url, format_id)
+            return {"status": "skipped"}
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         
-        self.update_state(state='PROGRESS', meta={'progress': 0, 'status': 'Starting'})
+        # Another user may have fetched the same video/format while we were queued
+        cached = download_cache.materialize(url, variant, os.path.splitext(output_path)[0])
+        if cached:
+            return _publish_artifact(cached)
         
-        ffmpeg_location = get_ffmpeg_location()
+        # MP3 of a video we already hold: cut the audio on the postprocess queue instead of fetching it again
+        if format_id == "mp3" and not clip and derive_audio and download_cache.find_video_source(url):
+            handed_off = True
+            return _hand_off(self, {"url": url, "format_id": format_id, "variant": variant,
+                                    "path": output_path, "derive_audio": True})
         
-        if format_id == "mp3":
-            # Audio extraction
-            cmd = [
-                "yt-dlp", 
-                "-f", "bestaudio/best", 
-                "--extract-audio", 
-                "--audio-format", "mp3", 
-                "--audio-quality", "0",
-                "--newline", 
-                "-o", output_path.replace('.mp3', '.%(ext)s'),
-                url
-            ]
-            if ffmpeg_location:
-                cmd.insert(1, "--ffmpeg-location")
-                cmd.insert(2, ffmpeg_location)
-        else:
-            # Video download — platform-aware format selection
-            url_lower = url.lower()
-            is_youtube = "youtube.com" in url_lower or "youtu.be" in url_lower
-            
-            if format_id == "best":
-                if is_youtube:
-                    # YouTube: prefer mp4/avc1 for compatibility
-                    format_spec = "bestvideo[height<=1080][ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best"
-                else:
-                    # Non-YouTube (FB/IG/X/TikTok): prefer H.264, flexible audio
-                    format_spec = "bestvideo[height<=1080][vcodec^=avc1]+bestaudio/bestvideo[height<=1080]+bestaudio/best"
-                cmd = [
-                    "yt-dlp", 
-                    "-f", format_spec, 
-                    "--merge-output-format", "mp4", 
-                    "--newline",
-                    "-o", output_path,
-                    url
-                ]
-            else:
-                if is_youtube:
-                    # YouTube specific format: trust the format_id, prefer m4a audio
-                    format_spec = f"{format_id}+bestaudio[ext=m4a]/bestaudio/best"
-                else:
-                    # Non-YouTube: use flexible audio matching (X/Twitter doesn't use m4a)
-                    format_spec = f"{format_id}+bestaudio/best"
-                
-                base_path = os.path.splitext(output_path)[0]
-                cmd = [
-                    "yt-dlp", 
-                    "-f", format_spec, 
-                    "--merge-output-format", "mp4",
-                    "--newline",
-                    "-o", f"{base_path}.%(ext)s",
-                    url
-                ]
-            
-            if ffmpeg_location:
-                cmd.insert(1, "--ffmpeg-location")
-                cmd.insert(2, ffmpeg_location)
-            
-            # Force H.264 video + AAC audio for non-YouTube to fix VP9 playback issues
-            if not is_youtube:
-                cmd.extend(["--postprocessor-args", "ffmpeg:-c:v libx264 -preset fast -crf 23 -c:a aac -b:a 192k"])
-            # YouTube: no postprocessor args needed — m4a audio is already AAC-compatible with MP4
+        # Node-wide download slots, widened/narrowed at runtime by the AIMD controller.
+        # A node that stays full gives the job back to the broker instead of holding this process.
+        if not adaptive_concurrency.acquire(
+            self.request.id,
+            on_wait=lambda: progress.publish(self.request.id, {'progress': 0, 'status': 'Waiting for slot'}),
+        ):
+            handed_off = True
+            raise self.retry(countdown=adaptive_concurrency.retry_countdown(self.request.retries),
+                             max_retries=adaptive_concurrency.AIMD_MAX_RETRIES)
+        # Cluster-wide pacing per platform and egress IP (the proxy, when the pool has one)
+        proxy = proxy_pool.choose()
+        if not rate_governor.acquire(
+            detect_platform(url),
+            egress=proxy_pool.egress_id(proxy),
+            max_wait=rate_governor.RATE_MAX_WAIT_DOWNLOAD,
+            on_wait=lambda: progress.publish(self.request.id, {'progress': 0, 'status': 'Waiting for rate limit'}),
+        ):
+            print(f"[WARNING] Rate limit wait exceeded for {url}; starting anyway")
+        progress.publish(self.request.id, {'progress': 0, 'status': 'Starting'})
         
-        self.update_state(state='PROGRESS', meta={'progress': 5, 'status': 'Downloading'})
+        ffmpeg_location = get_ffmpeg_location()
+        plan = build_download_plan(url, format_id, output_path, ffmpeg_location, clip)
+        plan["proxy"] = proxy
+        # Same account pool (and rotation) as the API's extractor
+        jar = cookie_pool.choose(url)
+        plan["cookiefile"] = jar.path if jar else None
+        # Reuse the info dict /analyze extracted instead of extracting again
+        plan["info_json"] = info_cache.write_info_file(url, f"{os.path.splitext(output_path)[0]}.info.json")
+        # Fragment parallelism within the node's shared connection budget
+        limit_connections(plan, connection_governor.acquire(self.request.id, plan_connections(plan)))
         
-        process = subprocess.Popen(
-            cmd, 
-            stdout=subprocess.PIPE, 
-            stderr=subprocess.STDOUT, 
-            text=True,
-            encoding='utf-8',
-            errors='replace'
-        )
+        progress.publish(self.request.id, {'progress': 5, 'status': 'Downloading'})
         
         last_progress: float = 0.0
+        last_bytes: int = 0
         
-        # Explicitly check and use stdout
-        stdout = process.stdout
-        if stdout:
-            for line in stdout:
-                if "[download]" in line and "%" in line:
-                    try:
-                        parts = line.split()
-                        for part in parts:
-                            if '%' in part:
-                                p_str = ''.join(c for c in part if c.isdigit() or c == '.')
-                                if p_str:
-                                    progress = float(p_str)
-                                    if progress - float(last_progress) >= 1.0 or progress == 100.0:
-                                        last_progress = float(progress)
-                                        self.update_state(
-                                            state='PROGRESS', 
-                                            meta={'progress': min(progress, 99.0), 'status': 'Downloading'}
-                                        )
-                                break
-                    except:
-                        pass
-                
-                if "[Merger]" in line or "Merging formats" in line:
-                    self.update_state(state='PROGRESS', meta={'progress': 95, 'status': 'Processing'})
-                
-                if "ExtractAudio" in line or "Converting" in line:
-                    self.update_state(state='PROGRESS', meta={'progress': 90, 'status': 'Converting'})
-
+        def on_progress(event: dict):
+            nonlocal last_progress, last_bytes
+            pct = float(event.get('progress', 0))
+            if event.get('status') == 'Downloading':
+                if pct - last_progress < 1.0 and pct != 100.0:
+                    return
+                last_progress = pct
+                downloaded = int(event.get('downloaded_bytes') or 0)
+                # Byte counts restart for each format (video, then audio)
+                adaptive_concurrency.record_bytes(downloaded - last_bytes if downloaded >= last_bytes else downloaded)
+                last_bytes = downloaded
+                event = {**event, 'progress': min(pct, 99.0)}
+            progress.publish(self.request.id, event)
         
-        process.wait()
+        succeeded = run_download(plan, on_progress)
+        proxy_pool.report(proxy, None if succeeded else (plan.get("error") or ""))
+        cookie_pool.report(jar, None if succeeded else (plan.get("error") or ""))
+        adaptive_concurrency.record_outcome(succeeded, throttled=adaptive_concurrency.is_throttle_error(plan.get("error")))
         
-        if process.returncode != 0:
+        if not succeeded:
             if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
                 # FIXED: Return success even if exit code is non-zero but file exists
-                return {"status": "success", "path": output_path, "size": os.path.getsize(output_path)}
+                # (cached and published like any other finished download)
+                if with_audio:
+                    handed_off = True
+                    return _hand_off(self, {"url": url, "format_id": format_id, "variant": variant,
+                                            "path": output_path, "with_audio": True})
+                return _finalize_download(url, variant, output_path, None)
             else:
                 raise Exception(f"Download failed. Check URL validity or age restrictions.")
         
@@ -209,6 +205,10 @@ def download_video_task(self, url: str, format_id: str, output_path: str):
             for ext in ['.mp4', '.webm', '.mkv', '.mp3', '.m4a']:
                 alt_path = f"{base_path}{ext}"
                 if os.path.exists(alt_path):
+                    if plan["codec_check"]:
+                        # Video in another container: the codec policy remuxes it
+                        output_path = alt_path
+                        break
                     try:
                         os.rename(alt_path, output_path)
                     except:
@@ -217,18 +217,37 @@ def download_video_task(self, url: str, format_id: str, output_path: str):
             else:
                 raise Exception("File not found after download")
         
-        # FIXED: Verify file size
-        if os.path.getsize(output_path) < 1024:
-            raise Exception("File too small, download may have failed")
+        # Remux-first: stream-copy compatible codecs, transcode only VP9/AV1/Opus
+        codec_policy = None
+        if plan["codec_check"]:
+            codec_policy = decide_codec_policy(output_path, probe_codecs(output_path, ffmpeg_location))
+            if codec_policy["action"] == "transcode":
+                # CPU-bound: hand off to the postprocess queue through the shared file store
+                handed_off = True
+                return _hand_off(self, {
+                    "url": url,
+                    "format_id": format_id,
+                    "variant": variant,
+                    "path": output_path,
+                    "codec_policy": codec_policy,
+                    "ffmpeg_location": ffmpeg_location,
+                    "with_audio": with_audio,
+                })
+            if codec_policy["action"] == "remux":
+                progress.publish(self.request.id, {'progress': 96, 'status': 'Processing'})
+                output_path = apply_codec_policy(output_path, codec_policy, ffmpeg_location)
         
-        # FIXED: MUST return success result for task to complete
-        return {
-            "status": "success", 
-            "path": output_path,
-            "size": os.path.getsize(output_path)
-        }
+        if with_audio:
+            # The bundle's MP3 encode is CPU work too
+            handed_off = True
+            return _hand_off(self, {"url": url, "format_id": format_id, "variant": variant, "path": output_path,
+                                    "codec_policy": codec_policy, "with_audio": True})
+        return _finalize_download(url, variant, output_path, codec_policy)
         
+    except (Ignore, Retry):
+        raise
     except Exception as e:
+        handed_off = False
         # Clean up failed downloads
         if os.path.exists(output_path):
             try:
@@ -236,28 +255,278 @@ def download_video_task(self, url: str, format_id: str, output_path: str):
             except:
                 pass
         raise Exception(f"Download failed: {str(e)}")
+    finally:
+        connection_governor.release(self.request.id)
+        adaptive_concurrency.release(self.request.id)
+        # Let the next request for this video/format start (or hit the cache)
+        if not handed_off:
+            inflight.finish(url, variant, self.request.id)
+
+
+def _hand_off(task, job: dict):
+    """
+    Continue a download on the postprocess queue through the shared file store.
+    The replacement task inherits task's id, so clients keep polling the same id.
+    """
+    progress.publish(task.request.id, {'progress': 96, 'status': 'Queued for conversion'})
+    return task.replace(postprocess_video_task.s(job).set(queue=POSTPROCESS_QUEUE))
+
+
+@celery.task(bind=True)
+def postprocess_video_task(self, job: dict):
+    """
+    CPU-bound stage of a download, on the postprocess queue under the
+    download's task_id: transcode the streams the codec policy flagged, cut
+    the MP3 of a with_audio bundle, or (derive_audio) cut a requested MP3
+    from a cached video of the same URL.
+    """
+    path = job["path"]
+    variant = job.get("variant", job["format_id"])
+    handed_off = False
+    try:
+        progress.publish(self.request.id, {'progress': 97, 'status': 'Converting'})
+        if job.get("derive_audio"):
+            derived = _derive_audio(job["url"], path)
+            if not derived:
+                # Source evicted or not on this node's disk: fetch the audio after all
+                handed_off = True
+                return self.replace(download_video_task.si(job["url"], job["format_id"], path, derive_audio=False)
+                                    .set(queue=DOWNLOAD_QUEUE))
+            return _finalize_download(job["url"], variant, derived, None)
+        codec_policy = job.get("codec_policy")
+        if codec_policy and codec_policy["action"] == "transcode":
+            path = apply_codec_policy(path, codec_policy, job.get("ffmpeg_location"))
+        return _finalize_download(job["url"], variant, path, codec_policy, job.get("with_audio", False))
+    except Ignore:
+        raise
+    except Exception as e:
+        handed_off = False
+        if os.path.exists(path):
+            try:
+                os.remove(str(path))
+            except:
+                pass
+        raise Exception(f"Download failed: {str(e)}")
+    finally:
+        if not handed_off:
+            inflight.finish(job["url"], variant, self.request.id)
+
+
+def _finalize_download(url: str, format_id: str, output_path: str, codec_policy, with_audio: bool = False) -> dict:
+    """Verify the finished file, add it to the shared cache and build the task result."""
+    # FIXED: Verify file size
+    if os.path.getsize(output_path) < 1024:
+        raise Exception("File too small, download may have failed")
+    
+    download_cache.store(url, format_id, output_path)
+    # Starts the delivery lease and registers the file in the expiry index
+    renew_lease(output_path)
+    
+    # FIXED: MUST return success result for task to complete
+    result = {
+        "status": "success", 
+        "path": output_path,
+        "mime": media_type_for(output_path),
+        "size": os.path.getsize(output_path),
+        "codec_policy": codec_policy,
+    }
+    if with_audio and format_id != "mp3" and _store_audio_variant(url, output_path):
+        # Served straight from the cache by a format_id=mp3 request
+        result["variants"] = ["mp3"]
+    return _publish_artifact(result)
+
+def _derive_audio(url: str, output_path: str):
+    """MP3 cut from a cached video of url into output_path, or None if there is none to cut from."""
+    source = download_cache.find_video_source(url)
+    if not source:
+        return None
+    download_cache.acquire(source["key"])
+    try:
+        return extract_audio(source["path"], output_path, get_ffmpeg_location())
+    except Exception as e:
+        print(f"[WARNING] Local audio extraction failed, fetching instead: {e}")
+        return None
+    finally:
+        download_cache.release(source["key"])
+
+def _store_audio_variant(url: str, video_path: str) -> bool:
+    """Cut the MP3 of a just-finished video into the cache (the video+audio bundle)."""
+    audio_path = f"{os.path.splitext(video_path)[0]}.audio.mp3"
+    try:
+        extract_audio(video_path, audio_path, get_ffmpeg_location())
+        return download_cache.store(url, "mp3", audio_path) is not None
+    except Exception as e:
+        print(f"[WARNING] Could not derive MP3 for {url}: {e}")
+        return False
+    finally:
+        if os.path.exists(audio_path):
+            os.remove(audio_path)
+
+def _publish_artifact(result: dict) -> dict:
+    """Put a finished file in the object store; the API finds it by result["object_key"]."""
+    path = result["path"]
+    store = object_store.get_store()
+    result["object_key"] = store.put_file(path, os.path.basename(path))
+    if store.remote:
+        # Uploaded (multipart for large files); the node's copy is no longer needed
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    return result
 
 @celery.task
 def scheduled_cleanup():
-    """Cleanup old files every 10 minutes"""
-    folder = "temp_downloads"
-    if not os.path.exists(folder):
-        return "Folder not found"
+    """Remove temp files whose deadline in the expiry index has passed (runs every minute)"""
+    return f"Cleaned {expiry_index.reap()} files"
+
+@celery.task
+def sweep_untracked_files():
+    """Every 10 minutes: remove unregistered leftovers (.part, .ytdl, failed outputs) older than 30 minutes"""
+    return f"Swept {expiry_index.sweep_untracked()} files"
+
+def _send_download(job: dict):
+    download_video_task.apply_async(args=[job["url"], job["format_id"], job["output_path"]],
+                                    kwargs={"with_audio": job.get("with_audio", False), "clip": job.get("clip")},
+                                    task_id=job["task_id"])
+
+@celery.task
+def dispatch_fair_queue():
+    """Release queued downloads in per-client fair order (also a safety net for missed dispatches)"""
+    return fair_scheduler.dispatch(_send_download)
+
+def submit_download(task_id: str, url: str, format_id: str, client: str, coalesce: bool = True,
+                    with_audio: bool = False, clip=None) -> dict:
+    """
+    Admit one download (shared by /download/start and batches): complete it from the
+    cache, attach it to an identical running job, or reserve disk space and queue it.
+    with_audio also produces the MP3 from the same fetch; clip ([start, end] seconds)
+    limits the download to that section. Raises StorageFull when the disk is past its
+    watermark.
+    """
+    # A clip is its own cache / in-flight entry; the bundle MP3 is only cut from whole videos
+    variant = variant_id(format_id, clip)
+    with_audio = with_audio and not clip
+    prefetch.record_request(url, variant)
+    # Cache hit: link the finished file into place and complete the task without queueing it.
+    # With a remote object store the API host's disk isn't shared, so a worker does this instead.
+    cached = None if object_store.get_store().remote else download_cache.materialize(url, variant, f"temp_downloads/{task_id}")
+    if cached:
+        download_video_task.backend.store_result(task_id, cached, "SUCCESS")
+        progress.publish(task_id, {"progress": 100, "status": "Finished"})
+        return {"task_id": task_id, "status": "completed", "cached": True}
     
-    now = time.time()
-    cleaned: int = 0
+    # FIXED: Proper extension handling
+    if format_id == "mp3":
+        output_path = f"temp_downloads/{task_id}.mp3"
+    else:
+        output_path = f"temp_downloads/{task_id}.mp4"
     
-    for f in os.listdir(folder):
-        f_path = os.path.join(folder, f)
-        if os.path.isfile(f_path):
-            if now - float(os.stat(f_path).st_mtime) > 1800:  # 30 minutes
-                try:
-                    os.remove(f_path)
-                    cleaned += 1  # type: ignore
-                except:
-                    pass
+    # Single-flight: attach to an identical job that is already running
+    if coalesce and inflight.join(url, variant, task_id, lambda leader_id: download_video_task.AsyncResult(leader_id).state):
+        return {"task_id": task_id, "status": "started", "coalesced": True}
+    
+    # Admission control: reserve the expected size (from a cached /analyze result) before queueing
+    meta = get_redis().get(f"meta:{url}")
+    meta = json.loads(meta) if meta else None
+    try:
+        storage_accountant.reserve(
+            "temp_downloads",
+            int(storage_accountant.estimate_download_bytes(meta, format_id)
+                * clip_fraction(clip, (meta or {}).get("duration"))),
+            reservation_id=task_id,
+        )
+    except storage_accountant.StorageFull:
+        inflight.finish(url, variant, task_id)
+        raise
+    
+    if fair_scheduler.FAIR_SCHEDULING_ENABLED:
+        # Position and ETA are per client lane, the order DRR serves jobs in
+        queue_tracker.enqueued(task_id, detect_platform(url), client)
+        # Per-client virtual queue; released to Celery in deficit-round-robin order
+        job = {"task_id": task_id, "url": url, "format_id": format_id, "output_path": output_path,
+               "with_audio": with_audio, "clip": clip}
+        fair_scheduler.submit(client, job)
+        dispatch_fair_queue()
+    else:
+        queue_tracker.enqueued(task_id, detect_platform(url))
+        download_video_task.apply_async(args=[url, format_id, output_path],
+                                        kwargs={"with_audio": with_audio, "clip": clip}, task_id=task_id)
+    return {"task_id": task_id, "status": "started"}
+
+def speculate(url: str, meta: dict) -> bool:
+    """
+    After /analyze: start a low-priority download of the format the user will most
+    likely pick, if the platform's hit rate, the bandwidth budget and the queue allow.
+    """
+    if not prefetch.PREFETCH_ENABLED:
+        return False
+    format_id = prefetch.PREFETCH_FORMAT
+    platform = detect_platform(url)
+    estimate = storage_accountant.estimate_download_bytes(meta, format_id)
+    wire_bytes = int(estimate / storage_accountant.VIDEO_ESTIMATE_FACTOR)
+    if wire_bytes > prefetch.PREFETCH_MAX_MB * prefetch.MB or not prefetch.allowed(platform):
+        return False
+    if get_redis().zcard(queue_tracker.PENDING_KEY) > prefetch.PREFETCH_MAX_BACKLOG:
+        return False
+    if download_cache.exists(url, format_id) or not prefetch.claim(url, format_id, platform):
+        return False
     
-    return f"Cleaned {cleaned} files"
+    task_id = f"prefetch-{uuid.uuid4()}"
+    if inflight.current_leader(url, format_id):
+        prefetch.unclaim(url, format_id)  # someone is already downloading it
+        return False
+    if not prefetch.take_budget(wire_bytes):
+        prefetch.unclaim(url, format_id)
+        return False
+    try:
+        storage_accountant.reserve("temp_downloads", estimate, reservation_id=task_id)
+    except storage_accountant.StorageFull:
+        prefetch.unclaim(url, format_id)
+        return False
+    
+    prefetch.issued(platform)
+    # The in-flight claim is taken when the task starts, so real requests never attach to a
+    # queued speculation; one still unstarted after PREFETCH_EXPIRES is revoked (see _release_revoked)
+    download_video_task.apply_async(
+        args=[url, format_id, f"temp_downloads/{task_id}.{'mp3' if format_id == 'mp3' else 'mp4'}"],
+        kwargs={"speculative": True}, task_id=task_id,
+        queue=prefetch.PREFETCH_QUEUE, expires=prefetch.PREFETCH_EXPIRES,
+    )
+    return True
+
+def fill_batch(batch_id: str):
+    """Admit pending batch items up to the batch's parallelism limit."""
+    meta = batch.info(batch_id)
+    if not meta:
+        return
+    urls = {item["task_id"]: item["url"] for item in batch.items(batch_id)}
+    while True:
+        task_id = batch.take_next(batch_id)
+        if not task_id:
+            return
+        try:
+            # Items are de-duplicated when the batch is created; no need to coalesce
+            admitted = submit_download(task_id, urls[task_id], meta["format_id"], meta["client"], coalesce=False)
+        except storage_accountant.StorageFull as e:
+            # The disk is busy, not the item broken: put it back and refill once space may have freed up
+            batch.requeue(batch_id, task_id)
+            progress.publish(task_id, {'progress': 0, 'status': 'Waiting for storage'})
+            if batch.schedule_resume(batch_id, e.retry_after):
+                resume_batch.apply_async(args=[batch_id], countdown=e.retry_after)
+            return
+        except Exception as e:
+            progress.publish(task_id, {'status': 'Error', 'message': str(e)})
+            batch.item_done(task_id, succeeded=False)
+            continue
+        if admitted["status"] == "completed":
+            batch.item_done(task_id)
+
+@celery.task
+def resume_batch(batch_id: str):
+    """Delayed refill of a batch whose next item was refused for lack of disk space"""
+    batch.resumed(batch_id)
+    fill_batch(batch_id)
 
 @celery.task
 def update_ytdlp_scheduled():
@@ -270,16 +539,85 @@ def update_ytdlp_scheduled():
 
 # Celery Beat schedule for periodic cleanup + daily yt-dlp update
 celery.conf.beat_schedule = {
-    'cleanup-every-10-minutes': {
+    'reap-expired-files': {
         'task': 'backend.worker.scheduled_cleanup',
+        'schedule': 60.0,
+    },
+    'sweep-untracked-files': {
+        'task': 'backend.worker.sweep_untracked_files',
         'schedule': 600.0,
     },
+    'dispatch-fair-queue': {
+        'task': 'backend.worker.dispatch_fair_queue',
+        'schedule': 30.0,
+    },
     'update-ytdlp-daily': {
         'task': 'backend.worker.update_ytdlp_scheduled',
         'schedule': 86400.0,
     },
 }
 
+# Terminal progress events and queue statistics. A download handed off to the postprocess queue
+# raises Ignore, so only the stage that actually ends the job reports here.
+@task_success.connect(sender=download_video_task)
+@task_success.connect(sender=postprocess_video_task)
+def _publish_finished(sender=None, result=None, **kwargs):
+    progress.publish(sender.request.id, {'progress': 100, 'status': 'Finished'})
+    queue_tracker.finished(sender.request.id)
+    storage_accountant.release("temp_downloads", sender.request.id)
+    _release_fair_slot(sender.request.id)
+    _advance_batch(sender.request.id, succeeded=True)
+
+@task_failure.connect(sender=download_video_task)
+@task_failure.connect(sender=postprocess_video_task)
+def _publish_failed(sender=None, task_id=None, exception=None, **kwargs):
+    progress.publish(task_id, {'status': 'Error', 'message': str(exception)})
+    queue_tracker.finished(task_id, succeeded=False)
+    storage_accountant.release("temp_downloads", task_id)
+    _release_fair_slot(task_id)
+    _advance_batch(task_id, succeeded=False)
+
+@task_revoked.connect(sender=download_video_task)
+@task_revoked.connect(sender=postprocess_video_task)
+def _release_revoked(sender=None, request=None, expired=False, **kwargs):
+    """A revoked or expired job never runs its finally block or fires task_failure: release what it held."""
+    task_id = request.id
+    args, options = list(getattr(request, "args", None) or []), getattr(request, "kwargs", None) or {}
+    try:
+        if sender is postprocess_video_task and args:
+            inflight.finish(args[0]["url"], args[0].get("variant") or args[0]["format_id"], task_id)
+        elif len(args) >= 2:
+            inflight.finish(args[0], variant_id(args[1], options.get("clip")), task_id)
+            if options.get("speculative"):
+                prefetch.unclaim(args[0], args[1])
+    except Exception as e:
+        print(f"[WARNING] Could not release in-flight claim of revoked {task_id}: {e}")
+    progress.publish(task_id, {'status': 'Error', 'message': 'Expired before it started' if expired else 'Cancelled'})
+    queue_tracker.finished(task_id, succeeded=False)
+    storage_accountant.release("temp_downloads", task_id)
+    _release_fair_slot(task_id)
+    _advance_batch(task_id, succeeded=False)
+
+def _release_fair_slot(task_id: str):
+    try:
+        fair_scheduler.job_done(task_id)
+        fair_scheduler.dispatch(_send_download)
+    except Exception as e:
+        print(f"[WARNING] Fair scheduler dispatch failed: {e}")
+
+def _advance_batch(task_id: str, succeeded: bool):
+    try:
+        batch_id = batch.item_done(task_id, succeeded)
+        if batch_id:
+            fill_batch(batch_id)
+    except Exception as e:
+        print(f"[WARNING] Batch refill failed for {task_id}: {e}")
+
+celery.conf.task_routes = {
+    download_video_task.name: {'queue': DOWNLOAD_QUEUE},
+    postprocess_video_task.name: {'queue': POSTPROCESS_QUEUE},
+}
+
 # --- Audio Processing Helpers ---
 
 def _to_wav(input_path: str, ffmpeg_cmd: str, sample_rate: int = 44100) -> str: